@@ -0,0 +1,103 @@
+"""
+Cold-start import benchmark.
+
+Imports main.py in fresh interpreters with `python -X importtime`, reports the
+median import time and the slowest modules, and fails when heavy clients are
+imported eagerly or the time regresses against a budget or a baseline.
+
+Usage:
+    python -m benchmarks.import_time --out import_time.json
+    python -m benchmarks.import_time --baseline import_time.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only load on the first GitHub call or analysis
+LAZY_MODULES = ["openai", "github", "tenacity", "backoff", "pydantic", "httpx"]
+
+# Startup work that does not belong in an import measurement
+IGNORED_ENV = ["PRELOAD_RESULTS", "CACHE_SNAPSHOT_PATH"]
+
+
+def import_once(module):
+    """Import `module` in a fresh interpreter. Returns ({module: (self_us, cumulative_us)}, loaded lazy modules)."""
+    env = {key: value for key, value in os.environ.items() if key not in IGNORED_ENV}
+    code = (f"import sys, json; import {module}; "
+            f"print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [part.strip() for part in line[len("import time:"):].split("|")]
+        if parts[0].isdigit():
+            timings[parts[2].strip()] = (int(parts[0]), int(parts[1]))
+    return timings, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(module, runs):
+    totals, slowest, eager = [], {}, set()
+    for _ in range(runs):
+        timings, loaded = import_once(module)
+        totals.append(timings[module][1] / 1000)
+        eager.update(loaded)
+        for name, (_, cumulative) in timings.items():
+            slowest[name] = min(slowest.get(name, cumulative), cumulative)
+    top = sorted(((name, us / 1000) for name, us in slowest.items() if name != module and "." not in name),
+                 key=lambda item: -item[1])[:10]
+    return {
+        "module": module,
+        "runs": runs,
+        "import_ms": round(statistics.median(totals), 1),
+        "min_ms": round(min(totals), 1),
+        "eager_modules": sorted(eager),
+        "slowest_packages_ms": {name: round(ms, 1) for name, ms in top},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import time of the GitGud app")
+    parser.add_argument("--module", default="main", help="Module to import")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to measure (median is used)")
+    parser.add_argument("--budget-ms", type=float, default=600, help="Fail above this median import time")
+    parser.add_argument("--out", help="Machine-readable results file")
+    parser.add_argument("--baseline", help="Previous results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    result = measure(args.module, args.runs)
+    result["created"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    print(f"import {args.module}: {result['import_ms']} ms median over {args.runs} runs (min {result['min_ms']} ms)")
+    for name, ms in result["slowest_packages_ms"].items():
+        print(f"  {name:<20} {ms:8.1f} ms")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {args.out}")
+
+    failures = []
+    if result["eager_modules"]:
+        failures.append(f"imported at startup: {', '.join(result['eager_modules'])}")
+    if result["import_ms"] > args.budget_ms:
+        failures.append(f"import time {result['import_ms']} ms exceeds budget {args.budget_ms} ms")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if result["import_ms"] > baseline["import_ms"] * (1 + args.tolerance):
+            failures.append(f"import time {baseline['import_ms']} ms -> {result['import_ms']} ms")
+    for message in failures:
+        print(f"REGRESSION {message}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+End-to-end pipeline benchmark.
+
+Generates synthetic users and repositories, serves them from the local
+utils.replay server, drives the real Flask routes through the test client and
+records wall time, GitHub and LLM calls, tokens, peak RSS and per-stage latency
+percentiles.
+
+Usage:
+    python -m benchmarks.pipeline --out bench_results.json
+    python -m benchmarks.pipeline --scenario view-1 --baseline bench_results.json
+"""
+import argparse
+import functools
+import json
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from benchmarks.synthetic import DEFAULT_LANGUAGE_MIX, generate_world, parse_language_mix
+from utils.replay import FakeAPIServer, SyntheticWorld
+
+# Each scenario: synthetic user shape plus the routes hit, in order
+SCENARIOS = {
+    "view-1": {"repos": 1, "steps": [("listing", None), ("repo_details", 1)]},
+    "report-50": {"repos": 50, "steps": [("listing", None), ("user_report", None), ("badge", None)]},
+    "org-500": {"repos": 500, "steps": [("listing", None), ("repo_details", 5), ("badge", None)]},
+}
+
+# main.py functions timed as pipeline stages
+STAGES = ["get_user_repos", "sample_repo_files", "analyze_repo",
+          "evaluate_security", "evaluate_efficiency", "evaluate_quality"]
+
+# Metrics compared against a baseline, all lower-is-better
+REGRESSION_METRICS = ["wall_time_s", "github_calls", "llm_calls", "prompt_tokens", "completion_tokens"]
+
+
+class StageTimer:
+    """Collects per-stage durations from wrapped functions"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.durations = defaultdict(list)
+
+    def wrap(self, name, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - start)
+        return timed
+
+    def record(self, name, seconds):
+        with self.lock:
+            self.durations[name].append(seconds)
+
+    def reset(self):
+        with self.lock:
+            self.durations.clear()
+
+    def summary(self):
+        with self.lock:
+            return {name: latency_summary(values) for name, values in sorted(self.durations.items())}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def latency_summary(values):
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p90_ms": round(percentile(values, 0.90) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(max(values) * 1000, 3),
+        "total_ms": round(sum(values) * 1000, 3),
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 1)
+
+
+def configure_environment(server, realistic_delays):
+    """Point the app at the local server before main.py is imported"""
+    os.environ.update(server.env())
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ.setdefault("ACCESS_TOKEN", "benchmark")
+    if not realistic_delays:
+        os.environ["LLM_CALL_DELAY"] = "0"
+        os.environ["REPO_ANALYSIS_DELAY"] = "0"
+        os.environ["GITHUB_SECONDS_BETWEEN_REQUESTS"] = "0"
+
+
+def instrument(main, timer):
+    for name in STAGES:
+        setattr(main, name, timer.wrap(name, getattr(main, name)))
+
+
+def run_step(client, step, count, username, timer):
+    if step == "listing":
+        paths = [f"/?username={username}"]
+    elif step == "repo_details":
+        paths = [f"/repo/{username}/repo-{index}" for index in range(count)]
+    elif step == "user_report":
+        paths = [f"/user-report/{username}"]
+    elif step == "badge":
+        paths = [f"/readme-badge/{username}"]
+    else:
+        raise ValueError(f"Unknown benchmark step: {step}")
+
+    for path in paths:
+        start = time.perf_counter()
+        response = client.get(path)
+        timer.record(f"route:{step}", time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {path} returned {response.status_code}")
+
+
+def run_scenario(name, spec, main, server, timer):
+    username = f"bench-{name}"
+    main.store.clear()
+    main.aggregation.clear()
+    server.reset_stats()
+    timer.reset()
+
+    client = main.app.test_client()
+    start = time.perf_counter()
+    for step, count in spec["steps"]:
+        run_step(client, step, count, username, timer)
+    wall_time = time.perf_counter() - start
+
+    stats = server.snapshot_stats()
+    return {
+        "scenario": name,
+        "repos": spec["repos"],
+        "wall_time_s": round(wall_time, 3),
+        "github_calls": stats["github_requests"],
+        "github_endpoints": stats["github_endpoints"],
+        "llm_calls": stats["openai_requests"],
+        "prompt_tokens": stats["prompt_tokens"],
+        "completion_tokens": stats["completion_tokens"],
+        "injected_rate_limits": stats["injected_rate_limits"],
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": timer.summary(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages against a previous results file"""
+    previous = {entry["scenario"]: entry for entry in baseline.get("results", [])}
+    regressions = []
+    for entry in results:
+        old = previous.get(entry["scenario"])
+        if not old:
+            continue
+        for metric in REGRESSION_METRICS:
+            if metric in old and old[metric] and entry[metric] > old[metric] * (1 + tolerance):
+                regressions.append(f"{entry['scenario']}: {metric} {old[metric]} -> {entry[metric]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end GitGud pipeline benchmark")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--files", type=int, default=12, help="Files per repository")
+    parser.add_argument("--depth", type=int, default=2, help="Maximum directory depth")
+    parser.add_argument("--lines", type=int, default=60, help="Average lines per file")
+    parser.add_argument("--languages", default=None,
+                        help="Language mix, e.g. python=0.6,javascript=0.4 (default: %s)" %
+                             ",".join(f"{k}={v}" for k, v in DEFAULT_LANGUAGE_MIX.items()))
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every API response")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds between streamed LLM chunks")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Inject a rate limit every Nth request")
+    parser.add_argument("--realistic-delays", action="store_true",
+                        help="Keep the app's built-in sleeps instead of zeroing them")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_results.json", help="Machine-readable results file")
+    parser.add_argument("--baseline", help="Previous results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    names = args.scenario or list(SCENARIOS)
+    language_mix = parse_language_mix(args.languages) if args.languages else None
+
+    users = {}
+    for name in names:
+        world = generate_world([f"bench-{name}"], repos_per_user=SCENARIOS[name]["repos"],
+                               files_per_repo=args.files, depth=args.depth, lines_per_file=args.lines,
+                               language_mix=language_mix, seed=args.seed)
+        users.update(world.users)
+
+    server = FakeAPIServer(mode="synthetic", world=SyntheticWorld(users), latency=args.latency,
+                           token_latency=args.token_latency, rate_limit_every=args.rate_limit_every,
+                           seed=args.seed).start()
+    configure_environment(server, args.realistic_delays)
+
+    import main as app_main
+    timer = StageTimer()
+    instrument(app_main, timer)
+
+    results = []
+    try:
+        for name in names:
+            print(f"Running {name}...")
+            result = run_scenario(name, SCENARIOS[name], app_main, server, timer)
+            results.append(result)
+            print(f"  {result['wall_time_s']}s, {result['github_calls']} GitHub calls, "
+                  f"{result['llm_calls']} LLM calls, {result['prompt_tokens']}+{result['completion_tokens']} tokens")
+    finally:
+        server.stop()
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Synthetic GitHub users and repositories for benchmarks.
+
+Builds a utils.replay.SyntheticWorld with a configurable number of repos per
+user, files per repo, directory depth, file length and language mix.
+"""
+import random
+
+from utils.replay import SyntheticWorld
+
+# Language -> (extension, GitHub language name)
+LANGUAGES = {
+    "python": (".py", "Python"),
+    "javascript": (".js", "JavaScript"),
+    "typescript": (".ts", "TypeScript"),
+    "java": (".java", "Java"),
+    "cpp": (".cpp", "C++"),
+    "c": (".c", "C"),
+    "dart": (".dart", "Dart"),
+    "html": (".html", "HTML"),
+    "css": (".css", "CSS"),
+}
+
+DEFAULT_LANGUAGE_MIX = {"python": 0.5, "javascript": 0.3, "html": 0.1, "css": 0.1}
+
+MODULE_NAMES = ["main", "app", "utils", "models", "views", "routes", "service", "helpers", "config",
+                "handlers", "storage", "client", "parser", "schema", "core", "api", "auth", "cache"]
+DIRECTORY_NAMES = ["src", "lib", "app", "core", "components", "services", "tests", "static", "pkg"]
+
+
+def _python_file(rng, name, imports, functions):
+    lines = [f"import {module}" for module in imports]
+    for index in range(functions):
+        lines += [
+            "",
+            f"def {name}_step_{index}(items, limit={rng.randint(5, 50)}):",
+            f'    """Process items for step {index}"""',
+            "    results = []",
+            "    for item in items:",
+            "        for other in items:",
+            "            if item != other and len(results) < limit:",
+            "                results.append((item, other))",
+            f"    return sorted(results)[:{rng.randint(1, 9)}]",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def _c_like_file(rng, name, imports, functions, language):
+    if language in ("javascript", "typescript"):
+        lines = [f"import {{ helper }} from './{module}';" for module in imports]
+    elif language in ("c", "cpp"):
+        lines = [f'#include "{module}.h"' for module in imports]
+    elif language == "java":
+        lines = [f"import app.{module};" for module in imports] + [f"public class {name.title()} {{"]
+    elif language == "dart":
+        lines = [f"import '{module}.dart';" for module in imports]
+    else:
+        lines = []
+    for index in range(functions):
+        lines += [
+            "",
+            f"function {name}Step{index}(items) {{" if language in ("javascript", "typescript")
+            else f"int {name}_step_{index}(int* items, int count) {{",
+            "  let total = 0;" if language in ("javascript", "typescript") else "  int total = 0;",
+            "  for (let i = 0; i < items.length; i++) {" if language in ("javascript", "typescript")
+            else "  for (int i = 0; i < count; i++) {",
+            f"    total += items[i] * {rng.randint(2, 9)};",
+            "  }",
+            "  return total;",
+            "}",
+        ]
+    if language == "java":
+        lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def _markup_file(rng, language, functions):
+    if language == "css":
+        return "\n".join(f".block-{i} {{ margin: {rng.randint(0, 20)}px; color: #{rng.randint(0, 0xFFFFFF):06x}; }}"
+                         for i in range(functions * 3)) + "\n"
+    body = "\n".join(f"    <div class=\"block-{i}\"><input name=\"field{i}\"></div>" for i in range(functions * 3))
+    return f"<html>\n  <body>\n{body}\n  </body>\n</html>\n"
+
+
+def generate_file(rng, language, name, imports, lines):
+    """Generate roughly `lines` lines of code in the given language"""
+    functions = max(1, lines // 8)
+    if language == "python":
+        return _python_file(rng, name, imports, functions)
+    if language in ("html", "css"):
+        return _markup_file(rng, language, functions)
+    return _c_like_file(rng, name, imports, functions, language)
+
+
+def generate_repo(rng, files, depth, lines_per_file, language_mix):
+    """Generate one repository: {"files": {path: code}, "languages": {name: bytes}, ...}"""
+    languages = list(language_mix)
+    weights = [language_mix[language] for language in languages]
+    repo_files = {}
+    language_bytes = {}
+    module_names = []
+
+    for index in range(files):
+        language = rng.choices(languages, weights)[0]
+        extension, language_name = LANGUAGES[language]
+        directories = [rng.choice(DIRECTORY_NAMES) for _ in range(rng.randint(0, depth))]
+        name = MODULE_NAMES[index % len(MODULE_NAMES)] + ("" if index < len(MODULE_NAMES) else str(index))
+        imports = rng.sample(module_names, min(len(module_names), rng.randint(0, 3)))
+        code = generate_file(rng, language, name, imports, rng.randint(lines_per_file // 2, lines_per_file * 2))
+
+        path = "/".join(directories + [name + extension])
+        repo_files[path] = code
+        module_names.append(name)
+        language_bytes[language_name] = language_bytes.get(language_name, 0) + len(code)
+
+    return {
+        "files": repo_files,
+        "languages": dict(sorted(language_bytes.items(), key=lambda item: -item[1])),
+        "description": "Synthetic benchmark repository",
+        "stargazers_count": rng.randint(0, 200),
+        "size": sum(len(code) for code in repo_files.values()) // 1024,
+        "fork": False,
+    }
+
+
+def generate_world(users, repos_per_user=1, files_per_repo=10, depth=2, lines_per_file=60,
+                   language_mix=None, seed=0):
+    """Generate a SyntheticWorld with `users` users named bench-user-<n> (or the given names)"""
+    rng = random.Random(seed)
+    language_mix = language_mix or DEFAULT_LANGUAGE_MIX
+    names = users if isinstance(users, (list, tuple)) else [f"bench-user-{i}" for i in range(users)]
+    world = {}
+    for login in names:
+        world[login] = {"repos": {
+            f"repo-{index}": generate_repo(rng, files_per_repo, depth, lines_per_file, language_mix)
+            for index in range(repos_per_user)
+        }}
+    return SyntheticWorld(world)
+
+
+def parse_language_mix(text):
+    """Parse 'python=0.6,javascript=0.4' into a weight dict"""
+    mix = {}
+    for part in text.split(","):
+        language, _, weight = part.partition("=")
+        language = language.strip().lower()
+        if language not in LANGUAGES:
+            raise ValueError(f"Unknown language '{language}', expected one of {', '.join(LANGUAGES)}")
+        mix[language] = float(weight or 1)
+    return mix
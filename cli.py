@@ -0,0 +1,188 @@
+"""
+Headless batch runner for nightly jobs.
+
+Usage:
+    python cli.py analyze --users users.txt --out results.jsonl --workers 4
+    python cli.py analyze --users users.txt --out results.jsonl --resume
+
+users.txt holds one GitHub username or owner/repo per line (# starts a comment).
+Listings and repository analyses run in a process pool with the same
+get_user_repos/analyze_repo code as the web app. Each result is appended to
+the JSONL output as soon as it finishes, so the file doubles as the checkpoint
+that --resume continues from. A summary is printed and written next to the
+output. Start the web app with PRELOAD_RESULTS=results.jsonl to serve the
+results from its caches.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from utils import aggregation, batches
+
+_app = None  # main.py, imported once per worker process
+
+
+def _init_worker():
+    global _app
+    os.environ.pop("PRELOAD_RESULTS", None)  # Workers start with empty caches
+    import main
+    _app = main
+    # Nightly jobs leave the interactive share of every token's budget to the web app
+    _app.github_pool.set_default_priority(_app.github_pool.BULK)
+
+
+def list_user(username):
+    with _app.ledger.scope(username=username) as run:
+        repos = _app.get_user_repos(username, timeout=300)
+    if not repos:
+        raise RuntimeError(f"No repositories found for user {username}")
+    return {"type": "user", "username": username, "repos": repos, "usage": run.as_dict()}
+
+
+def analyze_repo(username, repo):
+    with _app.ledger.scope(username=username, repo=f"{username}/{repo['name']}") as run:
+        _app.tracing.sleep(_app.REPO_ANALYSIS_DELAY, "repo_analysis_delay")
+        result = _app.analyze_repo(username, repo)
+    return {"type": "repo", "username": username, "repo": result, "usage": run.as_dict()}
+
+
+def analyze_single_repo(owner, name):
+    """owner/repo entries: fetch the repository's metadata, then analyze it"""
+    repo = _app.github_tokens().run(lambda: _app.repo_summary(_app.github_client().get_repo(f"{owner}/{name}")))
+    return analyze_repo(owner, repo)
+
+
+def read_entries(path):
+    with open(path, encoding="utf-8") as f:
+        lines = [line.split("#", 1)[0].strip() for line in f]
+    return batches.parse_entries([line for line in lines if line], max_entries=None)
+
+
+def read_results(path):
+    """Yield the records of a results file, skipping a line cut off by an interrupted run"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def read_checkpoint(path):
+    """Listed users and analyzed (username, repo) pairs from an earlier run.
+
+    A partial last line is truncated so appended records start on a fresh line.
+    """
+    listed, done = {}, set()
+    if not os.path.exists(path):
+        return listed, done
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    for record in read_results(path):
+        if record.get("type") == "user":
+            listed[record["username"]] = record["repos"]
+        elif record.get("type") == "repo":
+            done.add((record["username"], record["repo"]["name"]))
+    return listed, done
+
+
+def summarize(path, elapsed):
+    """Totals and per-user averages over every record in the results file"""
+    users, scores, usage, errors = {}, {}, {}, 0
+    for record in read_results(path):
+        kind = record.get("type")
+        if kind == "user":
+            users[record["username"]] = len(record["repos"])
+        elif kind == "repo":
+            scores.setdefault(record["username"], []).append(record["repo"].get("overall_score"))
+        elif kind == "error":
+            errors += 1
+        for field, amount in (record.get("usage") or {}).items():
+            usage[field] = usage.get(field, 0) + amount
+    return {
+        "users": len(users),
+        "repos_analyzed": sum(len(values) for values in scores.values()),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 1),
+        "usage": {field: round(amount, 2) for field, amount in usage.items()},
+        "overall": {username: aggregation.mean_score(values) for username, values in sorted(scores.items())},
+    }
+
+
+def run_analyze(args):
+    keys = read_entries(args.users)
+    if args.resume:
+        listed, done = read_checkpoint(args.out)
+        print(f"Resuming: {len(listed)} users listed and {len(done)} repositories analyzed already")
+    else:
+        listed, done = {}, set()
+        open(args.out, "w").close()
+
+    start = time.perf_counter()
+    counts = {"user": 0, "repo": 0, "error": 0}
+    with open(args.out, "a", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        pending = {}
+
+        def submit_repos(username, repos):
+            for repo in repos:
+                if (username, repo["name"]) not in done:
+                    done.add((username, repo["name"]))
+                    pending[pool.submit(analyze_repo, username, repo)] = ("repo", username, repo["name"])
+
+        for key in keys:
+            if key[0] == "user" and key[1] in listed:
+                submit_repos(key[1], listed[key[1]])
+            elif key[0] == "user":
+                pending[pool.submit(list_user, key[1])] = key
+            elif (key[1], key[2]) not in done:
+                done.add((key[1], key[2]))
+                pending[pool.submit(analyze_single_repo, key[1], key[2])] = key
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                key = pending.pop(future)
+                try:
+                    record = future.result()
+                except Exception as e:
+                    # Errors are not checkpointed, so --resume retries them
+                    record = {"type": "error", "key": "/".join(key[1:]), "error": str(e)}
+                out.write(json.dumps(record, default=str, separators=(",", ":")) + "\n")
+                out.flush()
+                counts[record["type"]] += 1
+                if record["type"] == "user":
+                    submit_repos(record["username"], record["repos"])
+                print(f"[{counts['repo']} repos, {len(pending)} queued] {record['type']} {'/'.join(key[1:])}"
+                      + (f": {record['error']}" if record["type"] == "error" else ""))
+
+    summary = summarize(args.out, time.perf_counter() - start)
+    summary_path = args.summary or f"{os.path.splitext(args.out)[0]}.summary.json"
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    print(json.dumps({key: value for key, value in summary.items() if key != "overall"}))
+    print(f"Results written to {args.out}, summary to {summary_path}")
+    return 1 if counts["error"] else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GitGud headless batch runner")
+    commands = parser.add_subparsers(dest="command", required=True)
+    analyze = commands.add_parser("analyze", help="Analyze every repository of the listed users")
+    analyze.add_argument("--users", required=True, help="File with one username or owner/repo per line")
+    analyze.add_argument("--out", default="results.jsonl", help="JSONL results file, also the checkpoint")
+    analyze.add_argument("--summary", help="Summary JSON path (default: <out>.summary.json)")
+    analyze.add_argument("--workers", type=int, default=4, help="Worker processes")
+    analyze.add_argument("--resume", action="store_true", help="Skip work already recorded in --out")
+    args = parser.parse_args()
+    sys.exit(run_analyze(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,59 @@
 import os
 import sys
-from flask import Flask, render_template, request, redirect, url_for, jsonify
-from github import Github
-from openai import OpenAI
+import functools
+from flask import Flask, Response, abort, render_template, request, redirect, url_for, jsonify, send_file
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 import time
 import json
-import asyncio
 from collections import defaultdict
 import threading
 from queue import Queue
-import random
 
 # Load API keys
 load_dotenv()
 APIKEY = os.getenv("OPENAI_API_KEY")
-GITHUB_TOKEN = os.getenv("ACCESS_TOKEN")
-g = Github(GITHUB_TOKEN)
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")  # Point at utils/replay.py to run offline
+GITHUB_SECONDS_BETWEEN_REQUESTS = float(os.getenv("GITHUB_SECONDS_BETWEEN_REQUESTS", "0.25"))
+
+from utils import (aggregation, api, badges, batches, blobs, cache_backends, cache_snapshot, cascade, chunking,
+                   deadlines, github_pool, ledger, metrics, packing, prefetch, snapshots, tracing)
+
+GITHUB_RETRIES = 3  # Connection retries per request; rate-limit errors go back to the token pool instead
+
+# PyGithub is imported and its clients built on first use to keep serverless cold starts short
+_github_pool = None
+_github_lock = threading.Lock()
+
+def make_github_client(token):
+    from github import Github
+    # An integer retry keeps PyGithub from sleeping through a rate-limit reset on its own
+    return Github(token, base_url=GITHUB_API_URL, retry=GITHUB_RETRIES,
+                  seconds_between_requests=GITHUB_SECONDS_BETWEEN_REQUESTS)
+
+def github_tokens():
+    """Return the shared token pool, creating it on first use"""
+    global _github_pool
+    if _github_pool is None:
+        with _github_lock:
+            if _github_pool is None:
+                # Count and time GitHub calls for /metrics (must run before a client is created)
+                metrics.install_github_instrumentation()
+                pool = github_pool.TokenPool(github_pool.GITHUB_TOKENS, make_github_client)
+                metrics.GITHUB_RESPONSE_HOOKS.append(pool.observe)
+                _github_pool = pool
+    return _github_pool
+
+def github_client():
+    """PyGithub client of the token with the most budget left for the current priority"""
+    return github_tokens().client()
 
 # Import utility functions
 from utils.quality import evaluate_quality
 from utils.security import evaluate_security
 from utils.efficiency import evaluate_efficiency
+from utils.sampling import select_files, compute_fan_in
+from utils.store import ResultStore
 
 # Initialize Flask App with static and template folders
 app = Flask(
@@ -30,19 +62,148 @@ app = Flask(
     template_folder="templates"    # Path to your HTML templates
 )
 
-# Add a simple cache for repository analysis results
-repo_cache = {}
-user_cache = {}
+# Quotas key on the client IP, which behind a proxy comes from X-Forwarded-For (Vercel runs behind one)
+TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "1" if os.getenv("VERCEL") else "0"))  # Proxies that set it
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+
+# Repository listings and analysis results, indexed by (user, repo), language and score
+store = ResultStore()
 
 # Global processing queue to limit concurrent API requests
 api_request_queue = Queue()
 MAX_CONCURRENT_REQUESTS = 1  # Only process one request at a time
 RATE_LIMIT_DELAY = 2  # Delay between API requests in seconds
+REPO_ANALYSIS_DELAY = float(os.getenv("REPO_ANALYSIS_DELAY", "5"))  # Delay between repository analyses in seconds
+
+# File sampling
+REPO_MAX_FILES = 15  # Files analyzed per repository unless a quota downgrades the run
+PRELOAD_RESULTS = os.getenv("PRELOAD_RESULTS")  # JSONL written by cli.py, loaded into the store at startup
+CHURN_COMMIT_SAMPLE = int(os.getenv("CHURN_COMMIT_SAMPLE", "0"))  # Recent commits inspected for churn, one GitHub call each
+SAMPLE_SHORTLIST_FACTOR = int(os.getenv("SAMPLE_SHORTLIST_FACTOR", "2"))  # Candidates ranked by fan-in per sampled file
+ANALYZED_EXTENSIONS = (".py", ".js", ".java", ".cpp", ".c", ".ts", ".dart", ".swift", ".kt", ".html", ".css", ".m",
+                       ".h", ".cs", ".lua")
+
+# Optional cache shared by every worker; the store above stays the per-process index
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "")  # memory://, sqlite:///path.db or redis://host:port/db shared by workers
+shared_cache = cache_backends.from_url(CACHE_BACKEND) if CACHE_BACKEND else None
+SHARED_CAS_ATTEMPTS = 3  # Compare-and-set retries when another worker writes the same record
 
 # Flag to track if the queue processor is running
 queue_processor_running = False
+metrics.QUEUE_DEPTH.set_function(api_request_queue.qsize)
+
+analysis_progress = {}  # { (username, repo_name): current_file } while an analysis runs
+deferred_reports = {}  # { username: unix time the deferred analysis runs }
+DEBUG_ENDPOINTS = os.getenv("DEBUG_ENDPOINTS", "0") == "1"  # /debug pages show client IPs, usernames and token budgets
+
+# Tracing: one trace per sampled request, forced with ?trace=1 or an X-GitGud-Trace header
+@app.before_request
+def start_request_trace():
+    force = request.args.get('trace') == '1' or request.headers.get('X-GitGud-Trace') == '1'
+    if request.path.startswith(('/static/', '/debug/traces', '/metrics')):
+        return
+    handle = tracing.start_trace(f"{request.method} {request.path}", force=force, method=request.method,
+                                  path=request.path, endpoint=request.endpoint or '')
+    if handle is not None:
+        request.environ["gitgud.trace"] = handle
+
+@app.teardown_request
+def finish_request_trace(error=None):
+    handle = request.environ.pop("gitgud.trace", None)
+    if handle is not None:
+        tracing.finish_trace(handle, error=str(error) if error else '')
+
+def metered(view):
+    """Charge a route's GitHub calls, LLM tokens and wall time to its username and client IP"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        username = kwargs.get('username') or request.values.get('username')
+        with ledger.scope(username=username, ip=request.remote_addr) as run:
+            request.environ["gitgud.usage"] = run
+            return view(*args, **kwargs)
+    return wrapper
 
-analysis_progress = {}  # { (username, repo_name): current_file }
+def quota_error(admission):
+    """Error page for a run that was rejected or deferred by the ledger"""
+    when = time.strftime('%Y-%m-%d %H:%M UTC', time.gmtime(admission.retry_at))
+    if admission.action == 'defer':
+        message = f"{admission.reason}. Results will be ready after {when}."
+    else:
+        message = f"{admission.reason}. Try again after {when}."
+    return render_template('error.html', error=message), 429
+
+def schedule_deferred_report(username, ip, run_at):
+    """Run a user's pending analyses off-peak to warm the caches"""
+    if username in deferred_reports:
+        return
+    deferred_reports[username] = run_at
+    timer = threading.Timer(max(0, run_at - time.time()), run_deferred_report, args=(username, ip))
+    timer.daemon = True
+    timer.start()
+    print(f"Deferred analysis for {username} until {time.strftime('%H:%M UTC', time.gmtime(run_at))}")
+
+@github_pool.bulk_work
+def run_deferred_report(username, ip):
+    try:
+        with ledger.scope(username=username, ip=ip):
+            repos = get_user_repos(username, timeout=300)
+            pending = [repo for repo in repos if not repo.get('analyzed', False)]
+            admission = ledger.admit(username, ip, len(pending), REPO_MAX_FILES)
+            if not admission.allowed:
+                print(f"Deferred analysis for {username} is still over quota, skipping")
+                return
+            analyze_repos(username, pending, admission.max_files)
+    except Exception as e:
+        print(f"Error in deferred analysis for {username}: {e}")
+    finally:
+        deferred_reports.pop(username, None)
+
+@github_pool.bulk_work
+def run_batch_work(key, batch):
+    """Batch planner handler: list a user's repositories or analyze one repository"""
+    if key[0] == 'user':
+        username = key[1]
+        with ledger.scope(username=username, ip=batch.ip):
+            repos = get_user_repos(username, timeout=300)
+        if not repos:
+            return {'type': 'user', 'username': username, 'error': "No repositories found"}, []
+        return ({'type': 'user', 'username': username, 'repo_count': len(repos)},
+                [('repo', username, repo['name']) for repo in repos])
+    
+    _, owner, name = key
+    record = store.get(owner, name)
+    with ledger.scope(username=owner, ip=batch.ip, repo=f"{owner}/{name}"):
+        if record is None:
+            try:
+                store.put(owner, github_tokens().run(
+                    lambda: repo_summary(github_client().get_repo(f"{owner}/{name}"))))
+            except Exception as e:
+                if github_pool.is_rate_limit(e):
+                    raise
+                print(f"Error fetching repository {owner}/{name}: {e}")
+            record = store.get(owner, name)
+        if record is None:
+            return {'type': 'repo', 'username': owner, 'repo': name, 'error': "Repository not found"}, []
+        
+        cached = record.analyzed
+        if not cached:
+            admission = ledger.admit(owner, batch.ip, 1, REPO_MAX_FILES)
+            if not admission.allowed:
+                return {'type': 'repo', 'username': owner, 'repo': name, 'error': admission.reason}, []
+            # One analysis at a time across all batches, paced like the interactive routes
+            tracing.sleep(REPO_ANALYSIS_DELAY, "repo_analysis_delay")
+            analyze_repo(owner, record.to_dict(), max_files=admission.max_files)
+            record = store.get(owner, name)
+    
+    result = {'type': 'repo', 'username': owner, 'repo': name, 'cached': cached,
+              'overall_score': record.overall_score}
+    for dimension in aggregation.DIMENSIONS:
+        result[dimension] = record.score(dimension)
+    return result, []
+
+# Every batch shares one planner thread, so bulk work is deduplicated and globally paced
+batch_planner = batches.Planner(run_batch_work)
 
 # Function to process the API request queue
 def process_api_queue():
@@ -81,6 +242,7 @@ def enqueue_api_request(func, *args, callback=None, **kwargs):
     return True  # Acknowledge the request was queued
 
 @app.route('/', methods=['GET', 'POST'])
+@metered
 def index():
     if request.method == 'POST':
         username = request.form['username']
@@ -99,9 +261,12 @@ def analyze_and_display_repos(username):
         if not repos:
             return render_template('index.html', error=f"No repositories found for user {username}")
         
-        # Create lightweight results without analysis
+        # Show stored analysis results; other repos get a lightweight placeholder
         results = []
         for repo in repos:
+            if repo.get('analyzed', False):
+                results.append(repo)
+                continue
             # Create a placeholder result with basic info
             repo_result = {
                 'name': repo['name'],
@@ -116,84 +281,233 @@ def analyze_and_display_repos(username):
             }
             results.append(repo_result)
         
-        # Cache these basic results
-        user_cache[username] = results
+        results = filter_repos(username, results, request.values.get('language'), request.values.get('sort'))
+        
+        # Warm the likely clicks while the user reads the listing, unless GitHub budget is short
+        if github_tokens().available(github_pool.BULK):
+            prefetcher.schedule(username, repos, REPO_MAX_FILES)
         
         return render_template('index.html', results=results, username=username)
+    except github_pool.RateLimitExhausted:
+        raise  # Answered with 503 and the reset time by github_rate_limit_error
     except Exception as e:
         return render_template('index.html', error=f"Error: {str(e)}")
 
+def filter_repos(username, repos, language=None, sort=None):
+    """Optional language filter and score ordering, answered from the store's indexes"""
+    if language:
+        matching = {record.name for record in store.query(username=username, language=language)}
+        repos = [repo for repo in repos if repo['name'] in matching]
+    if sort == 'score':
+        ranked = {record.name: rank for rank, record in
+                  enumerate(store.top(len(repos), username=username, language=language))}
+        repos = sorted(repos, key=lambda repo: ranked.get(repo['name'], len(ranked)))
+    return repos
+
+@metrics.timed("get_user_repos")
+@tracing.traced("get_user_repos")
 def get_user_repos(username, timeout=30, limit=None):
     """Get all public repositories for a GitHub user"""
     try:
         # Check if we have cached data for this username
-        if username in user_cache:
+        cached_repos = store.user_repos(username)
+        metrics.record_cache("user_cache", cached_repos is not None)
+        if cached_repos is not None:
             print(f"Using cached repository list for {username}")
-            cached_repos = user_cache[username]
             # If limit is specified, return only that many repos
             if limit and len(cached_repos) > limit:
                 return cached_repos[:limit]
             return cached_repos
         
         print(f"Fetching repositories for {username}")
+        # A rate-limited listing is retried on another token or parked until the reset
+        with deadlines.scope(timeout):
+            return github_tokens().run(functools.partial(fetch_user_repos, username, limit))
+    except Exception as e:
+        if github_pool.is_rate_limit(e):
+            raise  # Shown as a rate-limit error with its reset time, not as "No repositories found"
+        print(f"Error getting repositories for {username}: {e}")
+        return []
+
+def fetch_user_repos(username, limit):
+    """List a user's non-empty repositories from GitHub and cache them"""
+    user = github_client().get_user(username)
+    repos = []
+    
+    # Get repository data
+    for repo in user.get_repos():
+        if deadlines.expired():
+            print(f"Timeout exceeded for {username}, returning partial results")
+            if repos:
+                # Cache the partial results we have
+                cache_user_repos(username, repos)
+                return repos
+            break
         
-        # Fetch from GitHub API if not in cache
-        start_time = time.time()
-        user = g.get_user(username)
-        repos = []
-        
-        # Get repository data
-        for repo in user.get_repos():
-            if time.time() - start_time > timeout:
-                print(f"Timeout exceeded for {username}, returning partial results")
-                if repos:
-                    # Cache the partial results we have
-                    user_cache[username] = repos
-                    return repos
-                break
+        try:
+            repo_data = repo_summary(repo)
             
-            try:
-                # Get programming languages
-                languages = repo.get_languages()
-                
-                # Only include non-empty repositories with code
-                if languages:  # Skip empty repos
-                    repo_data = {
-                        'name': repo.name,
-                        'description': repo.description,
-                        'url': repo.html_url,
-                        'languages': languages,
-                        'size': repo.size,
-                        'fork': repo.fork,
-                        'stargazers_count': repo.stargazers_count,
-                        # Initialize metrics structures
-                        'security': {'score': 'N/A', 'concerns': []},
-                        'efficiency': {'score': 'N/A', 'concerns': []},
-                        'quality': {'score': 'N/A', 'concerns': []},
-                        'analyzed': False  # Mark as not yet analyzed
-                    }
-                    repos.append(repo_data)
-                    if limit and len(repos) >= limit:
-                        break
-            except Exception as e:
-                print(f"Error processing repository {repo.name}: {e}")
-                continue
-        
-        # Cache the results if we got any
-        if repos:
-            user_cache[username] = repos
-        
-        return repos
+            # Only include non-empty repositories with code
+            if repo_data['languages']:  # Skip empty repos
+                repos.append(repo_data)
+                if limit and len(repos) >= limit:
+                    break
+        except Exception as e:
+            if github_pool.is_rate_limit(e):
+                raise
+            print(f"Error processing repository {repo.name}: {e}")
+            continue
+    
+    # Cache the results if we got any
+    if repos:
+        cache_user_repos(username, repos)
+    
+    return repos
+
+def repo_summary(repo):
+    """Listing entry for a PyGithub repository, not yet analyzed"""
+    return {
+        'name': repo.name,
+        'description': repo.description,
+        'url': repo.html_url,
+        'languages': repo.get_languages(),
+        'size': repo.size,
+        'fork': repo.fork,
+        'stargazers_count': repo.stargazers_count,
+        'pushed_at': repo.pushed_at.isoformat() if repo.pushed_at else None,
+        # Initialize metrics structures
+        'security': {'score': 'N/A', 'concerns': []},
+        'efficiency': {'score': 'N/A', 'concerns': []},
+        'quality': {'score': 'N/A', 'concerns': []},
+        'analyzed': False  # Mark as not yet analyzed
+    }
+
+@tracing.traced("tree_walk")
+def list_repo_files(repo_obj, file_extensions):
+    """List candidate source files with a single recursive tree call"""
+    tree = repo_obj.get_git_tree(repo_obj.default_branch, recursive=True)
+    if tree.truncated:
+        # GitHub caps recursive trees (100,000 entries / 7 MB); rank what was returned
+        print(f"Tree of {repo_obj.full_name} is truncated, ranking {len(tree.tree)} of its entries")
+        span = tracing.current_span()
+        if span is not None:
+            span.set(truncated=True)
+    return [
+        {'path': element.path, 'size': element.size or 0, 'sha': element.sha}
+        for element in tree.tree
+        if element.type == "blob" and element.path.endswith(file_extensions)
+    ]
+
+@tracing.traced("commit_churn")
+def get_commit_churn(repo_obj, max_commits=CHURN_COMMIT_SAMPLE):
+    """Count how often each file changed in the most recent commits"""
+    churn = defaultdict(int)
+    if not max_commits:
+        return churn
+    try:
+        for index, commit in enumerate(repo_obj.get_commits()):
+            if index >= max_commits or deadlines.expired():
+                break
+            for changed in commit.files:
+                churn[changed.filename] += 1
     except Exception as e:
-        print(f"Error getting repositories for {username}: {e}")
+        if github_pool.is_rate_limit(e):
+            raise
+        print(f"Error getting commit churn for {repo_obj.full_name}: {e}")
+    return churn
+
+@metrics.timed("sample_repo_files")
+@tracing.traced("sample_repo_files")
+def sample_repo_files(repo_obj, languages, file_extensions, max_files, max_per_ext=None):
+    """Pick the most important files of a repository and fetch their contents.
+
+    Candidates are ranked on cheap metadata and a shortlist of SAMPLE_SHORTLIST_FACTOR
+    times the sample size is kept. The top of the shortlist is fetched first; the
+    imports in those files give every shortlisted file its fan-in, and files that
+    rank into the final pick because of it are fetched in place of the ones they
+    displace. Returns a list of (path, code) tuples.
+    """
+    deadlines.check("tree_walk")
+    candidates = list_repo_files(repo_obj, file_extensions)
+    if not candidates:
         return []
 
-def analyze_repo(username, repo):
+    churn = get_commit_churn(repo_obj)
+    factor = max(1, SAMPLE_SHORTLIST_FACTOR)
+    shortlist = select_files(candidates, max_files * factor, languages, churn=churn,
+                             max_per_ext=max_per_ext * factor if max_per_ext else None)
+
+    first = select_files(shortlist, max_files, languages, churn=churn, max_per_ext=max_per_ext)
+    sources = fetch_files(repo_obj, first)
+    fan_in = compute_fan_in(sources, targets=[candidate['path'] for candidate in shortlist])
+    picked = select_files(shortlist, max_files, languages, fan_in=fan_in, churn=churn, max_per_ext=max_per_ext)
+    sources.update(fetch_files(repo_obj, [candidate for candidate in picked if candidate['path'] not in sources]))
+    return [(candidate['path'], sources[candidate['path']]) for candidate in picked if candidate['path'] in sources]
+
+def fetch_files(repo_obj, candidates):
+    """Contents of candidate files as {path: code}, from the blob cache when possible"""
+    sources = {}
+    for candidate in candidates:
+        if deadlines.expired():
+            print(f"Deadline reached after fetching {len(sources)} of {len(candidates)} files")
+            break
+        # Identical blobs (forks, template copies) are fetched once
+        cached = blobs.get(candidate.get('sha'))
+        metrics.record_cache("blob_cache", cached is not None)
+        if cached is not None:
+            sources[candidate['path']] = cached
+            continue
+        try:
+            with tracing.span("file_fetch", path=candidate['path'], size=candidate['size']):
+                file_content = repo_obj.get_contents(candidate['path'])
+                sources[candidate['path']] = file_content.decoded_content.decode("utf-8")
+            blobs.put(candidate.get('sha'), sources[candidate['path']])
+        except Exception as decode_error:
+            if github_pool.is_rate_limit(decode_error):
+                raise
+            print(f"Error decoding {candidate['path']}: {decode_error}")
+    return sources
+
+def fetch_sample(username, repo, max_files):
+    """Crawl a repository and return its sampled (path, code) files"""
+    def crawl():
+        repo_obj = github_client().get_repo(f"{username}/{repo['name']}")
+        try:
+            # Sample files: rank candidates by importance and keep a diverse top set
+            return sample_repo_files(repo_obj, repo.get('languages', {}), ANALYZED_EXTENSIONS, max_files,
+                                     max_per_ext=min(3, max_files))
+        except Exception as e:
+            if "Git Repository is empty" not in str(e):
+                raise
+            print(f"Repository {repo['name']} is empty. Skipping analysis.")
+            return []
+    return github_tokens().run(crawl)
+
+def prefetch_sample(username, repo, max_files):
+    """Speculative crawls are bulk work: they stop before the interactive reserve"""
+    with github_pool.priority(github_pool.BULK):
+        return fetch_sample(username, repo, max_files)
+
+# Speculative crawls of the repositories a listing's viewer is likely to open
+prefetcher = prefetch.Prefetcher(prefetch_sample)
+
+@metrics.timed("analyze_repo")
+@tracing.traced("analyze_repo")
+def analyze_repo(username, repo, max_files=REPO_MAX_FILES):
     """Synchronous version of analyze_repo"""
     # Check if we already have cached results for this repo
-    if username in repo_cache and repo['name'] in repo_cache[username]:
+    record = store.get(username, repo['name'])
+    cached = record is not None and record.analyzed
+    metrics.record_cache("repo_cache", cached)
+    if cached:
         print(f"Using cached analysis for {username}/{repo['name']}")
-        return repo_cache[username][repo['name']]
+        return record.to_dict()
+    
+    # Another worker may have analyzed it already
+    shared = fetch_shared_repo(username, repo['name'])
+    if shared is not None and shared.get('analyzed', False):
+        print(f"Using shared analysis for {username}/{repo['name']}")
+        return save_repo_data(username, repo['name'], shared)
 
     repo_results = {
         'name': repo['name'],
@@ -205,191 +519,108 @@ def analyze_repo(username, repo):
         'url': repo.get('url', '')
     }
     
+    sample_files, file_results = None, {}
     try:
-        # Get repo contents with timeout protection
-        repo_obj = g.get_repo(f"{username}/{repo['name']}")
+        # A speculative prefetch may have crawled this repository already
+        sample_files = prefetcher.take(username, repo['name'], max_files, wait=deadlines.cap(prefetch.PREFETCH_WAIT))
+        metrics.record_cache("prefetch", sample_files is not None)
+        if sample_files is None:
+            with prefetcher.foreground_work():
+                sample_files = fetch_sample(username, repo, max_files)
+        ledger.charge(files=len(sample_files))
         
-        try:
-            contents = repo_obj.get_contents("")
-        except Exception as e:
-            if "Git Repository is empty" in str(e):
-                print(f"Repository {repo['name']} is empty. Skipping analysis.")
-                return repo_results
-            raise
+        # Analyze sampled files
+        if sample_files:
+            evaluators = (('security', evaluate_security), ('efficiency', evaluate_efficiency),
+                          ('quality', evaluate_quality))
+            results = {dimension: [] for dimension, _ in evaluators}
+            weights = {dimension: [] for dimension, _ in evaluators}
             
-        # Sample files: collect up to 5 files of each supported type
-        sample_files = []
-        directories = []
-        file_extensions = (".py", ".js", ".java", ".cpp", ".c", ".ts", ".dart", ".swift", ".kt", ".html", ".css", ".m", ".h", ".cs", ".lua")
-        
-        # Files per extension counter
-        extension_counts = {ext: 0 for ext in file_extensions}
-        max_files_per_ext = 3
-        max_total_files = 15
-        
-        # Safety counter to prevent infinite loop
-        safety_counter = 0
-        max_iterations = 2000
-        
-        while contents and len(sample_files) < max_total_files and safety_counter < max_iterations:
-            safety_counter += 1
-            file_content = contents.pop(0)
+            file_results = {path: {} for path, _ in sample_files}
+            # Files are ranked by importance; the top ones skip the cheap model tier
+            important = {path for path, _ in sample_files[:cascade.CASCADE_IMPORTANT_FILES]}
             
-            if file_content.type == "dir":
-                try:
-                    # Get directory contents
-                    directories.append(file_content.path)
-                    if len(directories) <= 10:
-                        dir_contents = repo_obj.get_contents(file_content.path)
-                        if isinstance(dir_contents, list):
-                            contents.extend(dir_contents[:10])
-                except Exception as dir_error:
-                    print(f"Error exploring directory {file_content.path}: {dir_error}")
-            elif file_content.path.endswith(file_extensions):
-                ext = next((e for e in file_extensions if file_content.path.endswith(e)), None)
-                if ext and extension_counts[ext] < max_files_per_ext:
+            # Small files share one request per analyzer
+            packs, singles = packing.plan(sample_files)
+            for pack in packs:
+                if deadlines.expired():
+                    break
+                analysis_progress[(username, repo['name'])] = pack[0][0]  # Update progress
+                for dimension, evaluate in evaluators:
                     try:
-                        code_content = file_content.decoded_content.decode("utf-8")
-                        sample_files.append((file_content.path, code_content))
-                        extension_counts[ext] += 1
-                    except Exception as decode_error:
-                        print(f"Error decoding {file_content.path}: {decode_error}")
-        
-        # Analyze sampled files
-        if sample_files:
-            security_results = []
-            efficiency_results = []
-            quality_results = []
+                        for path, result in cascade.evaluate_pack(dimension, evaluate, pack, important).items():
+                            file_results[path][dimension] = result
+                    except Exception as e:
+                        print(f"Error in {dimension} analysis: {e}")
             
-            for path, content in sample_files:
+            for path, content in singles:
+                if deadlines.expired():
+                    break
                 analysis_progress[(username, repo['name'])] = path  # Update progress
+                tiered = [(dimension, functools.partial(cascade.evaluate, dimension, evaluate,
+                                                        important=path in important))
+                          for dimension, evaluate in evaluators]
+                if chunking.is_large(content):
+                    # Large files are scored chunk by chunk on what they actually contain
+                    file_results[path] = chunking.analyze(content, path, tiered)
+                    continue
                 # Run each analysis type
-                try:
-                    security_result = evaluate_security(content, path)
-                    security_results.append(security_result)
-                except Exception as e:
-                    print(f"Error in security analysis: {e}")
-                
-                try:
-                    efficiency_result = evaluate_efficiency(content, path)
-                    efficiency_results.append(efficiency_result)
-                except Exception as e:
-                    print(f"Error in efficiency analysis: {e}")
-                
-                try:
-                    quality_result = evaluate_quality(content, path)
-                    quality_results.append(quality_result)
-                except Exception as e:
-                    print(f"Error in quality analysis: {e}")
-            
-            # Process security results
-            if security_results:
-                # Aggregate all concerns
-                all_concerns = []
-                for result in security_results:
-                    if isinstance(result, dict) and 'concerns' in result:
-                        all_concerns.extend(result.get('concerns', []))
-                    
-                # Get unique concerns (limit to top 5)
-                unique_concerns = []
-                for concern in all_concerns:
-                    if concern not in unique_concerns and concern not in ["Unable to analyze code", "Analysis timed out", "No specific concerns identified"]:
-                        unique_concerns.append(concern)
-                        if len(unique_concerns) >= 5:
-                            break
-                
-                # Calculate average score
-                scores = []
-                for result in security_results:
-                    if isinstance(result, dict) and 'score' in result:
-                        try:
-                            score = float(result['score'])
-                            scores.append(score)
-                        except (ValueError, TypeError):
-                            pass
-                
-                avg_score = sum(scores) / len(scores) if scores else 50
-                repo_results['security'] = {
-                    'score': str(avg_score),
-                    'concerns': unique_concerns
-                }
+                for dimension, evaluate in tiered:
+                    try:
+                        file_results[path][dimension] = evaluate(content, path)
+                    except Exception as e:
+                        print(f"Error in {dimension} analysis: {e}")
             
-            # Process efficiency results
-            if efficiency_results:
-                # Aggregate all concerns
-                all_concerns = []
-                for result in efficiency_results:
-                    if isinstance(result, dict) and 'concerns' in result:
-                        all_concerns.extend(result.get('concerns', []))
-                    
-                # Get unique concerns (limit to top 5)
-                unique_concerns = []
-                for concern in all_concerns:
-                    if concern not in unique_concerns and concern not in ["Unable to analyze code", "Analysis timed out", "No specific concerns identified"]:
-                        unique_concerns.append(concern)
-                        if len(unique_concerns) >= 5:
-                            break
-                
-                # Calculate average score
-                scores = []
-                for result in efficiency_results:
-                    if isinstance(result, dict) and 'score' in result:
-                        try:
-                            score = float(result['score'])
-                            scores.append(score)
-                        except (ValueError, TypeError):
-                            pass
-                
-                avg_score = sum(scores) / len(scores) if scores else 50
-                repo_results['efficiency'] = {
-                    'score': str(avg_score),
-                    'concerns': unique_concerns
-                }
+            for path, content in sample_files:
+                for dimension, result in file_results[path].items():
+                    results[dimension].append(result)
+                    weights[dimension].append(aggregation.file_weight(content))
             
-            # Process quality results
-            if quality_results:
-                # Aggregate all concerns
-                all_concerns = []
-                for result in quality_results:
-                    if isinstance(result, dict) and 'concerns' in result:
-                        all_concerns.extend(result.get('concerns', []))
-                    
-                # Get unique concerns (limit to top 5)
-                unique_concerns = []
-                for concern in all_concerns:
-                    if concern not in unique_concerns and concern not in ["Unable to analyze code", "Analysis timed out", "No specific concerns identified"]:
-                        unique_concerns.append(concern)
-                        if len(unique_concerns) >= 5:
-                            break
-                
-                # Calculate average score
-                scores = []
-                for result in quality_results:
-                    if isinstance(result, dict) and 'score' in result:
-                        try:
-                            score = float(result['score'])
-                            scores.append(score)
-                        except (ValueError, TypeError):
-                            pass
-                
-                avg_score = sum(scores) / len(scores) if scores else 50
-                repo_results['quality'] = {
-                    'score': str(avg_score),
-                    'concerns': unique_concerns
-                }
+            with tracing.span("aggregate", files=len(sample_files)):
+                for dimension, _ in evaluators:
+                    if results[dimension]:
+                        repo_results[dimension] = aggregation.combine(results[dimension], weights[dimension])
     
+    except deadlines.DeadlineExceeded as e:
+        print(f"Analysis of {repo['name']} stopped: {e}")
     except Exception as e:
+        if github_pool.is_rate_limit(e):
+            raise  # Leave the repository unanalyzed so it is retried after the reset
         print(f"Error analyzing repository {repo['name']}: {e}")
+    finally:
+        analysis_progress.pop((username, repo['name']), None)  # The run is over, finished or not
     
-    # Cache the results
-    if username not in repo_cache:
-        repo_cache[username] = {}
-    repo_cache[username][repo['name']] = repo_results
+    repo_results['analyzed'] = True
+    repo_results['overall_score'] = aggregation.overall_score(repo_results)
     
-    return repo_results
+    if deadlines.cut_short():
+        # Best aggregate so far: shown to this request, never cached, so the next visit finishes the job
+        sampled = sample_files or []
+        analyzed = sum(1 for path, _ in sampled
+                       if len(file_results.get(path, {})) == len(aggregation.DIMENSIONS)
+                       and all(result.get('score') != 'N/A' for result in file_results[path].values()))
+        repo_results['partial'] = {'files_analyzed': analyzed, 'files_sampled': len(sampled)}
+        metrics.PARTIAL_ANALYSES.inc(stage='analysis' if sampled else 'crawl')
+        print(f"Returning partial analysis of {username}/{repo['name']}: {analyzed} of {len(sampled)} files")
+        return repo_results
+    
+    # Cache the results
+    return save_repo_data(username, repo['name'], repo_results)
+
+def analyze_repos(username, repos, max_files=REPO_MAX_FILES):
+    """Analyze repositories sequentially, charging each one to its own ledger key"""
+    results = {}
+    for repo in repos:
+        # Add delay between repository analyses
+        tracing.sleep(REPO_ANALYSIS_DELAY, "repo_analysis_delay")
+        with ledger.scope(repo=f"{username}/{repo['name']}"):
+            result = analyze_repo(username, repo, max_files=max_files)
+        result['analyzed'] = True  # Mark as analyzed
+        results[repo['name']] = result
+    return results
 
 def download_repo_contents(username, repo_name):
-    repo = g.get_repo(f"{username}/{repo_name}")
+    repo = github_client().get_repo(f"{username}/{repo_name}")
 
     # Get all files recursively
     try:
@@ -431,44 +662,23 @@ def download_repo_contents(username, repo_name):
 
     print(f"Analyzed {repo_name} successfully without downloading files.")
 
-def analyze_repo_concurrently(username, repo_name):
+def analyze_repo_concurrently(username, repo_name, max_files=5):
     """Synchronous version of concurrent repository analysis"""
     try:
-        repo = g.get_repo(f"{username}/{repo_name}")
-        contents = repo.get_contents("")
-        files_to_analyze = []
-
-        # First collect all files to analyze
-        while contents:
-            file_content = contents.pop(0)
-            if file_content.type == "dir":
-                try:
-                    contents.extend(repo.get_contents(file_content.path))
-                except Exception as e:
-                    print(f"Error accessing directory {file_content.path}: {e}")
-                    continue
-            elif file_content.path.endswith((".py", ".js", ".java", ".cpp", ".c", ".ts")):
-                files_to_analyze.append(file_content)
-        
-        # Cost-aware sampling: If there are too many files, analyze a representative sample
-        MAX_FILES_TO_ANALYZE = 5
-        if len(files_to_analyze) > MAX_FILES_TO_ANALYZE:
-            print(f"Repository has {len(files_to_analyze)} files. Sampling {MAX_FILES_TO_ANALYZE} for analysis.")
-            # Sample with bias toward larger files as they might be more important
-            files_to_analyze.sort(key=lambda x: x.size, reverse=True)
-            # Take some top files and some random files
-            top_files = files_to_analyze[:MAX_FILES_TO_ANALYZE//2]
-            random_files = random.sample(files_to_analyze[MAX_FILES_TO_ANALYZE//2:], 
-                                         min(MAX_FILES_TO_ANALYZE//2, len(files_to_analyze)-MAX_FILES_TO_ANALYZE//2))
-            files_to_analyze = top_files + random_files
+        repo = github_client().get_repo(f"{username}/{repo_name}")
+        
+        # Cost-aware sampling: analyze only the most important files
+        files_to_analyze = sample_repo_files(repo, repo.get_languages(), (".py", ".js", ".java", ".cpp", ".c", ".ts"),
+                                             max_files)
+        ledger.charge(files=len(files_to_analyze))
         
         results = []
         
         # Analyze each file with proper rate limiting between calls
-        for file_content in files_to_analyze:
+        for path, code_content in files_to_analyze:
             # Add delay between API calls to avoid rate limits
-            time.sleep(5)
-            result = analyze_file_concurrently(file_content, username, repo_name)
+            tracing.sleep(REPO_ANALYSIS_DELAY, "repo_analysis_delay")
+            result = analyze_file_concurrently(path, code_content, username, repo_name)
             results.append(result)
         
         return results
@@ -480,53 +690,47 @@ def analyze_repo_concurrently(username, repo_name):
             print(f"Error analyzing repository {repo_name}: {e}")
             return []
 
-def analyze_file_concurrently(file_content, username, repo_name):
+def analyze_file_concurrently(file_path, code_content, username, repo_name):
     """Analyze a single file concurrently for security, efficiency, and quality."""
     try:
-        code_content = file_content.decoded_content.decode("utf-8")
-        
         # Include username in file path for special case handling
-        file_path_with_user = f"{username}/{file_content.path}"
-        
-        # COST-AWARE SAMPLING: For large files, analyze only portions of the file
-        if len(code_content) > 10000:  # If file is larger than ~10KB
-            lines = code_content.split('\n')
-            # Get the first 100 lines, last 50 lines, and some random lines from the middle
-            begin = '\n'.join(lines[:100])
-            end = '\n'.join(lines[-50:])
-            
-            # Sample from the middle
-            if len(lines) > 150:
-                middle_lines = random.sample(lines[100:-50], min(100, len(lines)-150))
-                middle = '\n'.join(middle_lines)
-                code_content = f"{begin}\n# ... (code trimmed for analysis) ...\n{middle}\n# ... (code trimmed for analysis) ...\n{end}"
+        file_path_with_user = f"{username}/{file_path}"
+        
+        # Large files: map-reduce over chunks of whole definitions instead of sampled lines
+        if chunking.is_large(code_content):
+            evaluators = [(dimension, functools.partial(cascade.evaluate, dimension, evaluate))
+                          for dimension, evaluate in (("security", evaluate_security),
+                                                      ("efficiency", evaluate_efficiency),
+                                                      ("quality", evaluate_quality))]
+            return {"file_path": file_path, **chunking.analyze(code_content, file_path_with_user, evaluators)}
         
         # SECURITY ANALYSIS
-        security_score = evaluate_security(code_content, file_path=file_path_with_user)
+        security_score = cascade.evaluate("security", evaluate_security, code_content, file_path_with_user)
 
         # EFFICIENCY ANALYSIS
-        efficiency_score = evaluate_efficiency(code_content, file_path=file_path_with_user)
+        efficiency_score = cascade.evaluate("efficiency", evaluate_efficiency, code_content, file_path_with_user)
 
         # QUALITY ANALYSIS
         # Using the synchronous version to avoid coroutine never awaited error
-        quality_score = evaluate_quality(code_content, file_path=file_path_with_user)
+        quality_score = cascade.evaluate("quality", evaluate_quality, code_content, file_path_with_user)
 
         return {
-            "file_path": file_content.path,
+            "file_path": file_path,
             "security": security_score,
             "efficiency": efficiency_score,
             "quality": quality_score
         }
     except Exception as e:
-        print(f"Error analyzing file {file_content.path}: {e}")
+        print(f"Error analyzing file {file_path}: {e}")
         return {
-            "file_path": file_content.path,
+            "file_path": file_path,
             "security": {"score": "Error", "concerns": [f"Failed to analyze: {str(e)}"]},
             "efficiency": {"score": "Error", "concerns": [f"Failed to analyze: {str(e)}"]},
             "quality": {"score": "Error", "concerns": [f"Failed to analyze: {str(e)}"]}
         }
 
 @app.route('/analyze', methods=['POST'])
+@metered
 def analyze():
     username = request.form['username']
     repos = get_user_repos(username)
@@ -535,13 +739,17 @@ def analyze():
     # PRIORITY QUEUES: Only analyze repositories in sequence to avoid overwhelming the API
     # Process at most 3 repositories to avoid rate limits
     repos_to_analyze = repos[:min(3, len(repos))]
+    admission = ledger.admit(username, request.remote_addr, len(repos_to_analyze), 5)
+    if not admission.allowed:
+        return quota_error(admission)
     
     for repo in repos_to_analyze:
         try:
             # Add a delay between repository processing
-            time.sleep(5)
+            tracing.sleep(REPO_ANALYSIS_DELAY, "repo_analysis_delay")
             
-            results = analyze_repo_concurrently(username, repo['name'])
+            with ledger.scope(repo=f"{username}/{repo['name']}"):
+                results = analyze_repo_concurrently(username, repo['name'], admission.max_files)
             # Format results for display
             formatted_results = {
                 'name': repo['name'],
@@ -552,31 +760,9 @@ def analyze():
             
             # Calculate averages if there are results
             if results:
-                security_scores = []
-                efficiency_scores = []
-                quality_scores = []
-                
-                for result in results:
-                    try:
-                        sec_score = result.get('security', {}).get('score', 'N/A')
-                        if sec_score != 'N/A' and sec_score != 'Error':
-                            security_scores.append(float(sec_score))
-                            
-                        eff_score = result.get('efficiency', {}).get('score', 'N/A')
-                        if eff_score != 'N/A' and eff_score != 'Error':
-                            efficiency_scores.append(float(eff_score))
-                            
-                        qual_score = result.get('quality', {}).get('score', 'N/A')
-                        if qual_score != 'N/A' and qual_score != 'Error':
-                            quality_scores.append(float(qual_score))
-                    except (ValueError, TypeError) as e:
-                        print(f"Error processing scores: {e}")
-                        continue
-                
-                # Calculate final scores
-                formatted_results['security'] = sum(security_scores) / len(security_scores) if security_scores else 'N/A'
-                formatted_results['efficiency'] = sum(efficiency_scores) / len(efficiency_scores) if efficiency_scores else 'N/A'
-                formatted_results['quality'] = sum(quality_scores) / len(quality_scores) if quality_scores else 'N/A'
+                for dimension in aggregation.DIMENSIONS:
+                    formatted_results[dimension] = aggregation.mean_score(
+                        [aggregation.dimension_score(result, dimension) for result in results])
             
             all_results.append(formatted_results)
         except Exception as e:
@@ -592,74 +778,42 @@ def analyze():
 
 @app.route('/repo/<username>/<repo_name>')
 @app.route('/repo_details/<username>/<repo_name>')
+@metered
 def repo_details(username, repo_name):
     """Route to display detailed repository analysis - performs on-demand analysis when accessed"""
     try:
-        # Check if this repo is already in the cache and has been analyzed
-        if username in user_cache:
-            cached_results = user_cache[username]
-            for repo in cached_results:
-                if repo['name'] == repo_name:
-                    # Check if this repo has already been analyzed
-                    if repo.get('analyzed', False):
-                        print(f"Using cached analysis for {username}/{repo_name}")
-                        return render_template('repo_details.html', repo=repo, username=username)
-                    else:
-                        # We need to analyze this repo
-                        break
-        
-        # Get the repository data if not in cache or not analyzed
-        repo = None
-        if username in user_cache:
-            for r in user_cache[username]:
-                if r['name'] == repo_name:
-                    repo = r
-                    break
-                    
-        if repo is None:
-            repos = get_user_repos(username)
-            repo = next((r for r in repos if r['name'] == repo_name), None)
-            
-        if not repo:
-            return render_template('error.html', error=f"Repository {repo_name} not found")
-        
-        # Show loading message to user
-        print(f"Analyzing repository {username}/{repo_name}...")
-        
-        # Analyze the repository using the synchronous version
-        result = analyze_repo(username, repo)
+        # Every stage below shares one deadline, so the page answers in time with whatever is ready
+        with deadlines.scope(deadlines.REPO_DETAILS_DEADLINE):
+            # Check if this repo is already in the store and has been analyzed
+            record = store.get(username, repo_name)
+            if record is not None and record.analyzed:
+                print(f"Using cached analysis for {username}/{repo_name}")
+                return render_template('repo_details.html', repo=record.to_dict(), username=username)
         
-        # Mark as analyzed
-        result['analyzed'] = True
+            # Get the repository data if not listed yet
+            repo = record.to_dict() if record is not None else None
+            if repo is None:
+                get_user_repos(username)
+                repo = store.get_dict(username, repo_name)
+            
+            if not repo:
+                return render_template('error.html', error=f"Repository {repo_name} not found")
         
-        # Calculate overall score
-        scores = []
-        for metric in ['security', 'efficiency', 'quality']:
-            try:
-                if result[metric]['score'] not in ['N/A', 'Error', 'Click to analyze']:
-                    scores.append(float(result[metric]['score']))
-            except (ValueError, KeyError):
-                pass
+            # Show loading message to user
+            print(f"Analyzing repository {username}/{repo_name}...")
         
-        if scores:
-            result['overall_score'] = sum(scores) / len(scores)
-        else:
-            result['overall_score'] = 'N/A'
-        
-        # Update the cache
-        if username in user_cache:
-            # Update the specific repository in the cache
-            for i, cached_repo in enumerate(user_cache[username]):
-                if cached_repo['name'] == repo_name:
-                    user_cache[username][i] = result
-                    break
+            admission = ledger.admit(username, request.remote_addr, 1, REPO_MAX_FILES)
+            if not admission.allowed:
+                return quota_error(admission)
         
-        # Also update repo_cache for individual repo analysis
-        if username not in repo_cache:
-            repo_cache[username] = {}
-        repo_cache[username][repo_name] = result
+            # Analyze the repository using the synchronous version
+            # analyze_repo marks the result analyzed, scores it and updates the store
+            with ledger.scope(repo=f"{username}/{repo_name}"):
+                result = analyze_repo(username, repo, max_files=admission.max_files)
         
-        return render_template('repo_details.html', repo=result, username=username, just_analyzed=True)
+            return render_template('repo_details.html', repo=result, username=username, just_analyzed=True)
+    except github_pool.RateLimitExhausted:
+        raise  # Answered with 503 and the reset time by github_rate_limit_error
     except Exception as e:
         return render_template('error.html', error=f"Error analyzing repository: {str(e)}")
 
@@ -668,68 +822,62 @@ def generate_readme_badge(username):
     """Generate a GitHub README badge with GitGud scores"""
     try:
         # Check if user is in cache
-        if username not in user_cache:
+        if not store.has_user(username):
             return render_template('error.html', error=f"User {username} not found. Please analyze their repositories first.")
         
-        results = user_cache[username]
-        
-        # Calculate average scores across all repositories
-        security_scores = []
-        efficiency_scores = []
-        quality_scores = []
-        overall_scores = []
-        
-        for repo in results:
-            try:
-                # Check if the repo has the necessary attributes before accessing them
-                if isinstance(repo, dict) and 'security' in repo and isinstance(repo['security'], dict) and 'score' in repo['security']:
-                    if repo['security']['score'] not in ['N/A', 'Error', 'Click to analyze']:
-                        security_scores.append(float(repo['security']['score']))
-                
-                if isinstance(repo, dict) and 'efficiency' in repo and isinstance(repo['efficiency'], dict) and 'score' in repo['efficiency']:
-                    if repo['efficiency']['score'] not in ['N/A', 'Error', 'Click to analyze']:
-                        efficiency_scores.append(float(repo['efficiency']['score']))
-                
-                if isinstance(repo, dict) and 'quality' in repo and isinstance(repo['quality'], dict) and 'score' in repo['quality']:
-                    if repo['quality']['score'] not in ['N/A', 'Error', 'Click to analyze']:
-                        quality_scores.append(float(repo['quality']['score']))
-                
-                if repo.get('overall_score') not in ['N/A', 'Error', 'Click to analyze']:
-                    overall_scores.append(float(repo['overall_score']))
-            except (ValueError, KeyError, TypeError) as e:
-                print(f"Error processing repo scores: {e}")
-                continue
-        
-        # Calculate averages
-        avg_security = sum(security_scores) / len(security_scores) if security_scores else 'N/A'
-        avg_efficiency = sum(efficiency_scores) / len(efficiency_scores) if efficiency_scores else 'N/A'
-        avg_quality = sum(quality_scores) / len(quality_scores) if quality_scores else 'N/A'
-        avg_overall = sum(overall_scores) / len(overall_scores) if overall_scores else 'N/A'
+        # Running averages maintained as repositories finish
+        stats = aggregation.rounded(aggregation.user_stats(username))
         
         # Prepare data for the template
-        badge_data = {
-            'username': username,
-            'security': round(avg_security) if avg_security != 'N/A' else 'N/A',
-            'efficiency': round(avg_efficiency) if avg_efficiency != 'N/A' else 'N/A',
-            'quality': round(avg_quality) if avg_quality != 'N/A' else 'N/A',
-            'overall': round(avg_overall) if avg_overall != 'N/A' else 'N/A',
-        }
+        badge_data = {'username': username, **{column: stats[column] for column in aggregation.COLUMNS}}
         
         return render_template('readme_badge.html', badge=badge_data)
         
     except Exception as e:
         return render_template('error.html', error=f"Error generating README badge: {str(e)}")
 
+def badge_response(label, stats, metric):
+    """SVG badge with a strong ETag; answers 304 when the client's copy is current"""
+    if metric not in aggregation.COLUMNS:
+        metric = 'overall'
+    score = stats[metric] if stats else 'not analyzed'
+    if metric != 'overall':
+        label = f"{label} {metric}"
+    body, etag = badges.score_badge(label, score)
+    response = Response(body, mimetype='image/svg+xml')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = badges.cache_control(score)
+    return response.make_conditional(request)
+
+@app.route('/badge/<username>.svg')
+def user_badge_svg(username):
+    """Embeddable README badge served from the user's running score aggregates"""
+    store.has_user(username)  # Restores a warm-start user before their aggregates are read
+    return badge_response("GitGud", aggregation.find_user_stats(username), request.args.get('metric', 'overall'))
+
+@app.route('/badge/<username>/<repo_name>.svg')
+def repo_badge_svg(username, repo_name):
+    """Embeddable badge for a single repository"""
+    store.has_user(username)  # Restores a warm-start user before their aggregates are read
+    return badge_response(repo_name, aggregation.repo_stats(username, repo_name), request.args.get('metric', 'overall'))
+
 @app.route('/user-report/<username>')
+@metered
 def user_report(username):
     """Generate a comprehensive GitHub report with stats, common errors, and recommendations.
     This performs full analysis on all the user's repositories."""
     try:
+        # Serve the published snapshot while none of the user's results changed
+        if snapshots.enabled() and request.args.get('refresh') != '1':
+            response = snapshot_response(username)
+            if response is not None:
+                return response
+        
         # Check if we need to analyze repositories
         analyze_all = True
-        if username in user_cache:
+        if store.has_user(username):
             # Check if all repositories have been analyzed
-            all_analyzed = all(repo.get('analyzed', False) for repo in user_cache[username])
+            all_analyzed = all(record.analyzed for record in store.user_records(username))
             if all_analyzed:
                 analyze_all = False
                 print(f"Using cached analysis for all repos of {username}")
@@ -744,11 +892,8 @@ def user_report(username):
                 return render_template('error.html', error=f"No repositories found for user {username}")
                 
             # First, check if we have any cached repositories that have already been analyzed
-            processed_repos = {}
-            if username in user_cache:
-                for repo in user_cache[username]:
-                    if repo.get('analyzed', False):
-                        processed_repos[repo['name']] = repo
+            processed_repos = {record.name: record.to_dict()
+                               for record in store.user_records(username) if record.analyzed}
             
             # Prepare list of repositories that need analysis
             repos_to_analyze = []
@@ -756,13 +901,17 @@ def user_report(username):
                 if repo['name'] not in processed_repos:
                     repos_to_analyze.append(repo)
                 
+            # Check the run fits the user's and client's quotas before spending tokens
+            admission = ledger.admit(username, request.remote_addr, len(repos_to_analyze), REPO_MAX_FILES)
+            if not admission.allowed:
+                if admission.action == 'defer':
+                    schedule_deferred_report(username, request.remote_addr, admission.retry_at)
+                return quota_error(admission)
+            if admission.action == 'downgrade':
+                print(admission.reason)
+                
             # Analyze repositories sequentially
-            for repo in repos_to_analyze:
-                # Add delay between repository analyses
-                time.sleep(5)
-                result = analyze_repo(username, repo)
-                result['analyzed'] = True  # Mark as analyzed
-                processed_repos[repo['name']] = result
+            processed_repos.update(analyze_repos(username, repos_to_analyze, admission.max_files))
             
             # Combine all results
             results = list(processed_repos.values())
@@ -776,124 +925,433 @@ def user_report(username):
                     repo['quality']['score'] = "Click to analyze"
                     repo['overall_score'] = "Click to analyze"
                 elif not repo.get('overall_score') or repo['overall_score'] == 'Click to analyze':
-                    scores = []
-                    for metric in ['security', 'efficiency', 'quality']:
-                        try:
-                            if repo[metric]['score'] not in ['N/A', 'Error', 'Click to analyze']:
-                                scores.append(float(repo[metric]['score']))
-                        except (ValueError, KeyError):
-                            pass
-                    
-                    # Set overall score
-                    if scores:
-                        repo['overall_score'] = sum(scores) / len(scores)
-                    else:
-                        repo['overall_score'] = 'N/A'
+                    repo['overall_score'] = aggregation.overall_score(repo)
             
             # Store in cache
-            user_cache[username] = results
+            cache_user_repos(username, results)
         else:
             # Use cached results
-            results = user_cache[username]
-        
-        # Calculate overall statistics
-        security_scores = []
-        efficiency_scores = []
-        quality_scores = []
-        overall_scores = []
-        
-        for repo in results:
-            try:
-                # Check if the repo has the necessary attributes before accessing them
-                if isinstance(repo, dict) and 'security' in repo and isinstance(repo['security'], dict) and 'score' in repo['security']:
-                    if repo['security']['score'] not in ['N/A', 'Error', 'Click to analyze']:
-                        security_scores.append(float(repo['security']['score']))
-                
-                if isinstance(repo, dict) and 'efficiency' in repo and isinstance(repo['efficiency'], dict) and 'score' in repo['efficiency']:
-                    if repo['efficiency']['score'] not in ['N/A', 'Error', 'Click to analyze']:
-                        efficiency_scores.append(float(repo['efficiency']['score']))
-                
-                if isinstance(repo, dict) and 'quality' in repo and isinstance(repo['quality'], dict) and 'score' in repo['quality']:
-                    if repo['quality']['score'] not in ['N/A', 'Error', 'Click to analyze']:
-                        quality_scores.append(float(repo['quality']['score']))
-                
-                if repo.get('overall_score') not in ['N/A', 'Error', 'Click to analyze']:
-                    overall_scores.append(float(repo['overall_score']))
-            except (ValueError, KeyError, TypeError) as e:
-                print(f"Error processing repo scores: {e}")
-                continue
+            results = store.user_repos(username)
         
-        # Calculate averages
-        avg_security = sum(security_scores) / len(security_scores) if security_scores else 'N/A'
-        avg_efficiency = sum(efficiency_scores) / len(efficiency_scores) if efficiency_scores else 'N/A'
-        avg_quality = sum(quality_scores) / len(quality_scores) if quality_scores else 'N/A'
-        avg_overall = sum(overall_scores) / len(overall_scores) if overall_scores else 'N/A'
+        # Running averages maintained as repositories finish
+        stats = aggregation.user_stats(username)
         
         # Prepare data for badges
-        badge_data = {
-            'username': username,
-            'security': round(avg_security) if avg_security != 'N/A' else 'N/A',
-            'efficiency': round(avg_efficiency) if avg_efficiency != 'N/A' else 'N/A',
-            'quality': round(avg_quality) if avg_quality != 'N/A' else 'N/A',
-            'overall': round(avg_overall) if avg_overall != 'N/A' else 'N/A'
-        }
+        badge_stats = aggregation.rounded(stats)
+        badge_data = {'username': username, **{column: badge_stats[column] for column in aggregation.COLUMNS}}
         
         # Prepare report data
+        report_stats = aggregation.rounded(stats, 1)
         report_data = {
             'username': username,
             'repos': results,
             'stats': {
-                'security': round(avg_security,1) if avg_security != 'N/A' else 'N/A',
-                'efficiency': round(avg_efficiency,1) if avg_efficiency != 'N/A' else 'N/A',
-                'quality': round(avg_quality,1) if avg_quality != 'N/A' else 'N/A',
-                'overall': round(avg_overall,1) if avg_overall != 'N/A' else 'N/A',
+                **{column: report_stats[column] for column in aggregation.COLUMNS},
                 'repo_count': len(results)
-            }
+            },
+            # Paraphrased concerns grouped across every repository, most frequent and severe first
+            'common_concerns': aggregation.common_concerns(results),
         }
         
-        return render_template('user_report.html', report=report_data, badge=badge_data)
+        if snapshots.enabled():
+            publish_report_snapshot(username, report_data, badge_data)
+        
+        budget = ledger.budget(username, run=request.environ.get("gitgud.usage"))
+        return render_template('user_report.html', report=report_data, badge=badge_data, budget=budget)
         
+    except github_pool.RateLimitExhausted:
+        raise  # Answered with 503 and the reset time by github_rate_limit_error
     except Exception as e:
         return render_template('error.html', error=f"Error generating user report: {str(e)}")
 
+def publish_report_snapshot(username, report_data, badge_data):
+    """Write the rendered report (without the per-run budget line) and a JSON sidecar to disk"""
+    html = render_template('user_report.html', report=report_data, badge=badge_data, budget=None)
+    repo_fields = ('name', 'description', 'url', 'languages', 'overall_score', 'security', 'efficiency', 'quality')
+    data = {
+        'stats': report_data['stats'],
+        'badge': badge_data,
+        'repos': [{field: repo.get(field) for field in repo_fields} for repo in report_data['repos']],
+        'common_concerns': report_data['common_concerns'],
+    }
+    snapshots.publish(username, html, data)
+
+def snapshot_response(username):
+    """Serve a published report snapshot, gzip-encoded when the client accepts it.
+    Each encoding gets its own ETag, as in utils/api.py."""
+    meta = snapshots.load(username)
+    if meta is None:
+        return None
+    try:
+        if 'gzip' in request.accept_encodings:
+            response = send_file(os.path.abspath(snapshots.html_path(username)), mimetype='text/html',
+                                 etag=f"{meta['etag']}-gzip", max_age=snapshots.SNAPSHOT_MAX_AGE, conditional=True)
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(snapshots.read_html(username), mimetype='text/html')
+            response.set_etag(meta['etag'])
+            response.cache_control.max_age = snapshots.SNAPSHOT_MAX_AGE
+            response = response.make_conditional(request)
+    except OSError as e:
+        print(f"Error serving report snapshot for {username}: {e}")
+        snapshots.invalidate(username)
+        return None
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.route('/snapshots/<username>/report.html')
+def report_snapshot(username):
+    """CDN-friendly path for a published report"""
+    response = snapshot_response(username)
+    if response is None:
+        return render_template('error.html', error=f"No published report for {username}"), 404
+    return response
+
+@app.route('/snapshots/<username>/report.json')
+def report_snapshot_json(username):
+    """JSON sidecar with the scores behind a published report"""
+    meta = snapshots.load(username)
+    if meta is None:
+        return jsonify({'error': f"No published report for {username}"}), 404
+    return send_file(os.path.abspath(snapshots.json_path(username)), mimetype='application/json',
+                     etag=meta['etag'], max_age=snapshots.SNAPSHOT_MAX_AGE, conditional=True)
+
 # Add these helper functions for cache management
 def get_cached_repo_data(username, repo_name):
     """Get repository data from cache if available"""
-    if username in user_cache:
-        for repo in user_cache[username]:
-            if repo['name'] == repo_name:
-                return repo
-    
-    if username in repo_cache and repo_name in repo_cache[username]:
-        return repo_cache[username][repo_name]
-    
-    return None
+    return store.get_dict(username, repo_name)
 
 def get_cached_username_data(username):
     """Get all data for a username from cache if available"""
-    if username in user_cache:
-        return {'repos': user_cache[username]}
-    return None
+    repos = store.user_repos(username)
+    return {'repos': repos} if repos is not None else None
+
+def cache_user_repos(username, repos):
+    """Record a user's repository listing and rebuild their score table"""
+    store.set_listing(username, repos)
+    if shared_cache is not None:
+        publish_listing(username)
+    aggregation.sync(username, store.user_repos(username))
 
 def save_repo_data(username, repo_name, repo_data):
-    """Save repo data to both caches"""
-    # Update user_cache
-    if username in user_cache:
-        for i, repo in enumerate(user_cache[username]):
-            if repo['name'] == repo_name:
-                user_cache[username][i] = repo_data
-                break
+    """Save repo data to the store and the shared cache. Returns the result to show,
+    which is another worker's analysis when that one was published first."""
+    snapshots.invalidate(username)  # Published reports no longer match this repo's result
+    record = store.put(username, repo_data)
+    if shared_cache is not None:
+        winner = publish_repo(username, record)
+        if winner is not None:
+            record = store.put(username, winner)
+            repo_data = winner
+    # Keep the running score aggregates of listed repositories current
+    if store.is_listed(username, repo_name):
+        aggregation.record_repo(username, repo_data)
+    return repo_data
+
+# Shared cache: gitgud:user:<username> holds the listing's repo names, gitgud:repo:<username>/<repo> a record.
+# Backend failures are logged and the worker carries on with its own store.
+def shared_key(kind, *parts):
+    return f"gitgud:{kind}:" + "/".join(parts)
+
+def shared_call(operation, *args, default=None):
+    try:
+        return getattr(shared_cache, operation)(*args)
+    except cache_backends.CacheBackendError as e:
+        print(f"Shared cache {operation} failed: {e}")
+        return default
+
+def fetch_shared_repo(username, repo_name):
+    if shared_cache is None:
+        return None
+    value = shared_call('get', shared_key('repo', username, repo_name))
+    metrics.record_cache("shared_cache", value is not None)
+    return json.loads(value) if value is not None else None
+
+def load_shared_user(username):
+    """A user's listing and records from the shared cache, in the cache snapshot's format"""
+    listing = shared_call('get', shared_key('user', username))
+    if listing is None:
+        return None
+    names = json.loads(listing)
+    values = shared_call('get_many', [shared_key('repo', username, name) for name in names], default=[])
+    return {'listing': names, 'records': [json.loads(value) for value in values if value is not None]}
+
+def publish_repo(username, record):
+    """Compare-and-set a record into the shared cache. The first analysis of a repository wins:
+    returns that analysis when it is not ours, otherwise None."""
+    key = shared_key('repo', username, record.name)
+    value = record.encode()
+    for _ in range(SHARED_CAS_ATTEMPTS):
+        current = shared_call('get', key)
+        if current is not None:
+            existing = json.loads(current)
+            if existing.get('analyzed', False):
+                return existing if current != value else None
+            if not record.analyzed:
+                return None  # Both are unanalyzed listing entries
+        # A failed write is not a win: retry, and keep our own result if the backend stays down
+        if shared_call('compare_and_set', key, current, value, default=False):
+            return None
+    return None
+
+def publish_listing(username):
+    """Share a user's listing; repositories other workers analyzed already are adopted"""
+    records = store.user_records(username)
+    shared_call('set', shared_key('user', username), json.dumps([record.name for record in records]).encode())
+    keys = [shared_key('repo', username, record.name) for record in records]
+    for key, record, current in zip(keys, records, shared_call('get_many', keys, default=[None] * len(keys))):
+        if current is None:
+            shared_call('compare_and_set', key, None, record.encode())
+        elif not record.analyzed:
+            existing = json.loads(current)
+            if existing.get('analyzed', False):
+                store.put(username, existing)
+
+# JSON API for dashboards and bots: the data behind the HTML pages without the rendering
+@app.errorhandler(api.ApiError)
+def api_error(error):
+    return api.json_response(error.to_dict(), request, status=error.status)
+
+@app.errorhandler(github_pool.RateLimitExhausted)
+def github_rate_limit_error(error):
+    """Every GitHub token is spent: say when to come back instead of reporting missing data"""
+    retry_after = str(max(1, int(error.reset_at - time.time())))
+    if request.path.startswith('/api/'):
+        retry_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(error.reset_at))
+        response = api.json_response({'error': str(error), 'retry_at': retry_at}, request, status=503)
+    else:
+        response = app.make_response((render_template('error.html', error=str(error)), 503))
+    response.headers['Retry-After'] = retry_after
+    return response
+
+def api_quota_error(admission):
+    retry_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(admission.retry_at))
+    return api.ApiError(admission.reason, 429, action=admission.action, retry_at=retry_at)
+
+@app.route('/api/v1/users/<username>')
+def api_user(username):
+    """Score aggregates for a listed user"""
+    if not store.has_user(username):
+        raise api.ApiError(f"User {username} not found. List their repositories first.", 404)
+    payload = {
+        'username': username,
+        'stats': aggregation.rounded(aggregation.user_stats(username), 1),
+        'languages': store.languages(username),
+    }
+    return api.json_response(api.select_fields(payload, api.parse_fields(request.args.get('fields'))), request)
+
+@app.route('/api/v1/users/<username>/repos')
+@metered
+def api_user_repos(username):
+    """Paginated repository listing; supports ?cursor=, ?limit=, ?fields=, ?language= and ?sort=score"""
+    repos = get_user_repos(username)
+    if not repos:
+        raise api.ApiError(f"No repositories found for user {username}", 404)
+    repos = filter_repos(username, repos, request.args.get('language'), request.args.get('sort'))
+    limit = api.page_size(request.args.get('limit'))
+    page, next_cursor = api.paginate(repos, request.args.get('cursor'), limit)
+    fields = api.parse_fields(request.args.get('fields'))
+    payload = {
+        'data': [api.select_fields(repo, fields) for repo in page],
+        'next_cursor': next_cursor,
+        'total': len(repos),
+    }
+    headers = None
+    if next_cursor:
+        query = {key: value for key, value in request.args.items() if key not in ('cursor', 'username')}
+        next_url = url_for('api_user_repos', username=username, **query, cursor=next_cursor, _external=True)
+        headers = {'Link': f'<{next_url}>; rel="next"'}
+    return api.json_response(payload, request, headers=headers)
+
+@app.route('/api/v1/users/<username>/repos/<repo_name>', methods=['GET', 'POST'])
+@metered
+def api_repo(username, repo_name):
+    """A repository's analysis. POST analyzes it first if it has not been analyzed yet."""
+    record = store.get(username, repo_name)
+    if record is None:
+        get_user_repos(username)
+        record = store.get(username, repo_name)
+    if record is None:
+        raise api.ApiError(f"Repository {repo_name} not found", 404)
     
-    # Update repo_cache
-    if username not in repo_cache:
-        repo_cache[username] = {}
-    repo_cache[username][repo_name] = repo_data
+    if request.method == 'POST' and not record.analyzed:
+        admission = ledger.admit(username, request.remote_addr, 1, REPO_MAX_FILES)
+        if not admission.allowed:
+            raise api_quota_error(admission)
+        with ledger.scope(repo=f"{username}/{repo_name}"):
+            analyze_repo(username, record.to_dict(), max_files=admission.max_files)
+        record = store.get(username, repo_name)
+    
+    return api.json_response(api.select_fields(record.to_dict(), api.parse_fields(request.args.get('fields'))),
+                             request)
+
+@app.route('/api/v1/users/<username>/jobs')
+def api_user_jobs(username):
+    """Analysis status for a user: running repositories, deferred runs and progress"""
+    records = store.user_records(username)
+    # Entries are removed as runs end, possibly while this loop reads them
+    progress = [(record.name, analysis_progress.get((username, record.name))) for record in records]
+    running = [{'repo': name, 'file': current_file} for name, current_file in progress if current_file is not None]
+    deferred_until = deferred_reports.get(username)
+    analyzed = sum(1 for record in records if record.analyzed)
+    if running:
+        state = 'running'
+    elif deferred_until:
+        state = 'deferred'
+    elif records and analyzed == len(records):
+        state = 'done'
+    else:
+        state = 'idle'
+    payload = {
+        'username': username,
+        'state': state,
+        'listed': store.has_user(username),
+        'repo_count': len(records),
+        'analyzed_count': analyzed,
+        'running': running,
+        'deferred_until': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(deferred_until)) if deferred_until else None,
+    }
+    return api.json_response(payload, request)
+
+@app.route('/api/v1/batches', methods=['POST'])
+def api_submit_batch():
+    """Queue usernames and owner/repo pairs for analysis: {"entries": ["alice", "bob/project"]}"""
+    payload = request.get_json(silent=True) or {}
+    entries = payload.get('entries')
+    if entries is None:
+        entries = list(payload.get('users') or []) + list(payload.get('repos') or [])
+    try:
+        keys = batches.parse_entries(entries)
+    except ValueError as e:
+        raise api.ApiError(str(e))
+    # Check the whole batch against the client's quota now, not one repository at a time once it runs
+    admission = ledger.admit(None, request.remote_addr, batches.estimate_repos(keys), REPO_MAX_FILES)
+    if not admission.allowed:
+        retry_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(admission.retry_at))
+        raise api.ApiError("Batch exceeds the analysis quota left for this client", 429, retry_at=retry_at)
+    try:
+        batch = batches.create(keys, ip=request.remote_addr)
+    except batches.TooManyBatches as e:
+        raise api.ApiError(str(e), 429)
+    batch_planner.submit(batch, keys)
+    payload = {
+        **batch.summary(),
+        'status_url': url_for('api_batch', batch_id=batch.id, _external=True),
+        'results_url': url_for('api_batch_results', batch_id=batch.id, _external=True),
+    }
+    return api.json_response(payload, request, status=202)
+
+def find_batch(batch_id):
+    batch = batches.get(batch_id)
+    if batch is None:
+        raise api.ApiError(f"Batch {batch_id} not found", 404)
+    return batch
+
+@app.route('/api/v1/batches/<batch_id>')
+def api_batch(batch_id):
+    """Progress of a submitted batch"""
+    payload = {**find_batch(batch_id).summary(), 'queued_work': batch_planner.queued()}
+    return api.json_response(payload, request)
+
+@app.route('/api/v1/batches/<batch_id>/results')
+def api_batch_results(batch_id):
+    """Stream a batch's results as JSON lines while it runs; blank lines are keep-alives"""
+    batch = find_batch(batch_id)
+    
+    def generate():
+        for record in batch.follow():
+            yield "\n" if record is None else json.dumps(record, separators=(',', ':')) + "\n"
+    
+    response = Response(generate(), mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'  # Let reverse proxies pass lines through as they arrive
+    return response
+
+def warm_user(username):
+    """Store loader: restore a user's listing and results from the shared cache or the cache snapshot on first use"""
+    saved = load_shared_user(username) if shared_cache is not None else None
+    if saved is None and cache_snapshot.enabled():
+        saved = cache_snapshot.load(username)
+        metrics.record_cache("cache_snapshot", saved is not None)
+    if saved is None:
+        return
+    records = {repo['name']: repo for repo in saved['records']}
+    for repo in records.values():
+        store.put(username, repo)
+    if saved['listing'] is not None:
+        store.set_listing(username, [records[name] for name in saved['listing'] if name in records])
+        aggregation.sync(username, store.user_repos(username))
+
+def load_results(path):
+    """Load listings and analyses written by cli.py into the store"""
+    users = repos = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('type') == 'user':
+                cache_user_repos(record['username'], record['repos'])
+                users += 1
+            elif record.get('type') == 'repo':
+                save_repo_data(record['username'], record['repo']['name'], record['repo'])
+                repos += 1
+    print(f"Loaded {users} users and {repos} analyzed repositories from {path}")
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.before_request
+def hide_debug_endpoints():
+    """The /debug pages answer 404 unless DEBUG_ENDPOINTS=1"""
+    if request.path.startswith('/debug/') and not DEBUG_ENDPOINTS:
+        abort(404)
+
+@app.route('/debug/traces')
+def debug_traces():
+    """Recent traced requests, slowest first"""
+    min_ms = request.args.get('min_ms', 0, type=float)
+    traces = tracing.recent_traces(limit=request.args.get('limit', 50, type=int), min_duration=min_ms / 1000)
+    return render_template('traces.html', traces=traces, trace=None, rows=None, min_ms=min_ms)
+
+@app.route('/debug/traces/<trace_id>')
+def debug_trace(trace_id):
+    """Waterfall view of one trace"""
+    trace = tracing.find_trace(trace_id)
+    if trace is None:
+        return render_template('error.html', error=f"Trace {trace_id} not found"), 404
+    if request.args.get('format') == 'otlp':
+        return jsonify(tracing.to_otlp(trace))
+    return render_template('traces.html', traces=None, trace=trace, rows=tracing.waterfall(trace), min_ms=0)
+
+@app.route('/debug/ledger')
+def debug_ledger():
+    """Usage per username, repository and client IP in the current quota window"""
+    return jsonify(ledger.snapshot())
+
+@app.route('/debug/github')
+def debug_github():
+    """Remaining GitHub budget per pooled token and jobs parked until a reset"""
+    return jsonify(github_tokens().budget())
 
 @app.route('/analyze_progress/<username>/<repo_name>')
 def analyze_progress_status(username, repo_name):
     current_file = analysis_progress.get((username, repo_name))
     return jsonify({'file': current_file})
 
+# Warm start: users are restored from the shared cache or the last cache snapshot as they are first requested
+if shared_cache is not None or cache_snapshot.enabled():
+    store.loader = warm_user
+aggregation.source = store.user_repos  # Rebuilds score tables dropped by the AGGREGATION_MAX_USERS bound
+if cache_snapshot.enabled():
+    cache_snapshot.start(store.export, store.take_dirty)
+
+if PRELOAD_RESULTS:
+    load_results(PRELOAD_RESULTS)
+
 # Ensure non-Flask logic is executed only when not running the Flask app
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,36 @@
+"""
+Shared fixtures. The app is imported once, pointed at the synthetic replay
+server from utils/replay.py, so no test reaches GitHub or OpenAI.
+"""
+import pytest
+
+from benchmarks.pipeline import configure_environment
+from benchmarks.synthetic import generate_world
+from utils.replay import FakeAPIServer
+
+USERS = ["alice", "bob"]
+
+
+@pytest.fixture(scope="session")
+def api_server():
+    server = FakeAPIServer(mode="synthetic", world=generate_world(USERS, repos_per_user=2, seed=1)).start()
+    configure_environment(server, realistic_delays=False)
+    yield server
+    server.stop()
+
+
+@pytest.fixture(scope="session")
+def app_module(api_server):
+    import main
+    return main
+
+
+@pytest.fixture
+def main(app_module, api_server):
+    """The app module with an empty store and fresh server counters"""
+    app_module.store.clear()
+    app_module.aggregation.clear()
+    api_server.reset_stats()
+    yield app_module
+    app_module.store.clear()
+    app_module.aggregation.clear()
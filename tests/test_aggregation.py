@@ -0,0 +1,19 @@
+from utils import aggregation
+
+REPO = {'name': 'r1', 'analyzed': True, 'languages': {'Python': 100}, 'overall_score': 70,
+        'security': {'score': 80, 'concerns': []}, 'efficiency': {'score': 70, 'concerns': []},
+        'quality': {'score': 60, 'concerns': []}}
+
+
+def test_score_tables_are_bounded_and_rebuilt_from_the_store(main, monkeypatch):
+    monkeypatch.setattr(aggregation, "AGGREGATION_MAX_USERS", 2)
+    for username in ('carol', 'dave', 'erin'):
+        main.cache_user_repos(username, [REPO])
+        main.save_repo_data(username, 'r1', REPO)
+
+    assert list(aggregation._tables) == ['dave', 'erin']
+    assert aggregation.find_user_stats('carol')['overall'] == 70
+    assert aggregation.repo_stats('carol', 'r1')['security'] == 80
+    assert list(aggregation._tables) == ['erin', 'carol']
+    assert aggregation.find_user_stats('nobody') is None
+    assert 'nobody' not in aggregation._tables
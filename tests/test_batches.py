@@ -0,0 +1,43 @@
+import pytest
+
+from utils import batches, ledger
+
+
+@pytest.fixture
+def submit(main, monkeypatch):
+    """POST a batch without starting the planner"""
+    monkeypatch.setattr(batches, "_batches", {})
+    monkeypatch.setattr(main.batch_planner, "submit", lambda batch, keys: None)
+    client = main.app.test_client()
+    return lambda entries, ip="10.0.0.1": client.post('/api/v1/batches', json={'entries': entries},
+                                                     environ_base={'REMOTE_ADDR': ip})
+
+
+@pytest.mark.parametrize("entry", ["alice/.", "alice/..", "alice/../bob"])
+def test_dot_repo_names_are_rejected(entry):
+    with pytest.raises(ValueError):
+        batches.parse_entries([entry])
+
+
+def test_dotted_repo_names_are_accepted():
+    assert batches.parse_entries(["alice/.github", "alice/a.b"]) == [
+        ("repo", "alice", ".github"), ("repo", "alice", "a.b")]
+
+
+def test_batch_over_the_ip_quota_is_refused(submit, monkeypatch):
+    monkeypatch.setattr(ledger, "IP_TOKEN_QUOTA", 10 * ledger.TOKENS_PER_FILE_ESTIMATE)
+    monkeypatch.setattr(ledger, "OFF_PEAK_QUOTA_MULTIPLIER", 1)
+    monkeypatch.setattr(ledger, "_entries", {})
+
+    refused = submit(["alice"])
+    assert refused.status_code == 429
+    assert "retry_at" in refused.get_json()
+    assert submit(["alice/r1"]).status_code == 202
+
+
+def test_open_batches_are_capped_per_ip(submit, monkeypatch):
+    monkeypatch.setattr(batches, "BATCH_MAX_OPEN_PER_IP", 2)
+    assert submit(["alice"]).status_code == 202
+    assert submit(["bob"]).status_code == 202
+    assert submit(["alice/r1"]).status_code == 429
+    assert submit(["alice/r1"], ip="10.0.0.2").status_code == 202
@@ -0,0 +1,50 @@
+import threading
+
+import pytest
+
+from utils import cache_backends
+from utils.fake_redis import FakeRedisServer
+
+
+@pytest.fixture
+def redis():
+    server = FakeRedisServer().start()
+    yield cache_backends.from_url(server.url)
+    server.stop()
+
+
+def test_compare_and_set(redis):
+    assert redis.compare_and_set("k", None, b"a")
+    assert not redis.compare_and_set("k", None, b"b")
+    assert not redis.compare_and_set("k", b"x", b"b")
+    assert redis.compare_and_set("k", "a", b"b")
+    assert redis.get("k") == b"b"
+    assert redis.get_many(["k", "missing"]) == [b"b", None]
+
+
+def test_concurrent_compare_and_set_loses_no_update(redis):
+    redis.set("counter", b"0")
+    threads, increments = 8, 25
+
+    def increment():
+        for _ in range(increments):
+            while True:
+                current = redis.get("counter")
+                if redis.compare_and_set("counter", current, str(int(current) + 1)):
+                    break
+
+    workers = [threading.Thread(target=increment) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert redis.get("counter") == str(threads * increments).encode()
+
+
+def test_unreachable_server_raises_backend_error(monkeypatch):
+    server = FakeRedisServer().start()
+    url = server.url
+    server.stop()
+    monkeypatch.setattr(cache_backends, "CACHE_BACKEND_TIMEOUT", 0.5)
+    with pytest.raises(cache_backends.CacheBackendError):
+        cache_backends.from_url(url).get("k")
@@ -0,0 +1,35 @@
+from utils import cache_snapshot
+
+
+def test_round_trip_and_unknown_names(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_snapshot, "CACHE_SNAPSHOT_PATH", str(tmp_path / "snapshot.bin"))
+    payloads = {f"user{index}": {"listing": [f"r{index}"], "records": [{"name": f"r{index}", "score": index}]}
+                for index in range(50)}
+    payloads["ünïcode"] = {"listing": []}
+    assert cache_snapshot.save(payloads)
+    for name, payload in payloads.items():
+        assert cache_snapshot.load(name) == payload
+    assert cache_snapshot.load("nobody") is None
+
+
+def test_rotation_merges_and_keeps_old_readers_valid(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_snapshot, "CACHE_SNAPSHOT_PATH", str(tmp_path / "snapshot.bin"))
+    assert cache_snapshot.save({"alice": {"v": 1}, "bob": {"v": 1}})
+    old = cache_snapshot.reader()
+
+    # A later save rewrites only changed names and renames a new file over the old one
+    assert cache_snapshot.save({"alice": {"v": 2}, "carol": {"v": 1}})
+    assert cache_snapshot.reader() is not old
+    assert cache_snapshot.load("alice") == {"v": 2}
+    assert cache_snapshot.load("bob") == {"v": 1}
+    assert cache_snapshot.load("carol") == {"v": 1}
+    assert old.get("alice") == {"v": 1}
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_missing_or_corrupt_file_loads_nothing(tmp_path, monkeypatch):
+    path = tmp_path / "snapshot.bin"
+    monkeypatch.setattr(cache_snapshot, "CACHE_SNAPSHOT_PATH", str(path))
+    assert cache_snapshot.load("alice") is None
+    path.write_bytes(b"not a snapshot")
+    assert cache_snapshot.load("alice") is None
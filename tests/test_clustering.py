@@ -0,0 +1,35 @@
+import random
+
+import pytest
+
+from utils import clustering
+
+SUBJECTS = ("sql injection query string formatting password secret token xss html escaping input validation "
+            "path traversal csrf cookie session nested loop cache index regex backtracking").split()
+
+
+def concerns(count, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.sample(SUBJECTS, 4)) + f" in module{rng.randint(0, 50)}" for _ in range(count)]
+
+
+@pytest.fixture
+def without_numpy(monkeypatch):
+    monkeypatch.setattr(clustering, "_numpy_loaded", True)
+    monkeypatch.setattr(clustering, "np", None)
+
+
+def test_paraphrases_share_a_cluster(without_numpy):
+    texts = ["SQL injection via string formatting", "Possible SQL injection in query string formatting",
+             "Hardcoded password in settings"]
+    assert sorted(map(sorted, clustering.cluster(texts))) == [[0, 1], [2]]
+
+
+def test_numpy_and_pure_python_paths_agree(monkeypatch):
+    numpy = pytest.importorskip("numpy")
+    texts = concerns(1000)
+    monkeypatch.setattr(clustering, "_numpy_loaded", True)
+    monkeypatch.setattr(clustering, "np", numpy)
+    with_numpy = clustering.cluster(texts)
+    monkeypatch.setattr(clustering, "np", None)
+    assert clustering.cluster(texts) == with_numpy
@@ -0,0 +1,18 @@
+"""Cold-start import profile of main.py, measured in fresh interpreters by benchmarks/import_time.py"""
+import os
+
+from benchmarks import import_time
+
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "600"))  # Median import time of main.py
+
+
+def test_heavy_clients_are_not_imported_at_startup():
+    _, loaded = import_time.import_once("main")
+    for module in ("openai", "tenacity", "github"):
+        assert module not in loaded
+    assert loaded == [], f"Imported at startup: {loaded}"
+
+
+def test_import_time_within_budget():
+    result = import_time.measure("main", runs=3)
+    assert result["import_ms"] <= IMPORT_BUDGET_MS, result["slowest_packages_ms"]
@@ -0,0 +1,16 @@
+def test_progress_is_cleared_when_an_analysis_ends(main, monkeypatch):
+    client = main.app.test_client()
+    repo = client.get('/api/v1/users/alice/repos').get_json()['data'][0]['name']
+    seen = []
+
+    def fetch_sample(username, repo, max_files):
+        main.analysis_progress[(username, repo['name'])] = 'main.py'
+        seen.append(client.get('/api/v1/users/alice/jobs').get_json())
+        raise RuntimeError("crawl failed")
+
+    monkeypatch.setattr(main, "fetch_sample", fetch_sample)
+    assert client.post(f'/api/v1/users/alice/repos/{repo}').status_code == 200
+
+    assert seen[0]['running'] == [{'repo': repo, 'file': 'main.py'}]
+    assert main.analysis_progress == {}
+    assert client.get('/api/v1/users/alice/jobs').get_json()['running'] == []
@@ -0,0 +1,44 @@
+import contextvars
+import sys
+import threading
+
+from utils import ledger
+
+
+def test_concurrent_charges_are_all_counted(monkeypatch):
+    monkeypatch.setattr(ledger, "_entries", {})
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Interleave the workers' charges as finely as possible
+    threads, charges = 8, 2000
+    try:
+        with ledger.scope(username="carol", ip="10.0.0.1") as run:
+            with ledger.scope(repo="carol/r1") as repo_run:
+                # Chunk workers run in copies of the analysis context, like chunking.analyze
+                workers = [threading.Thread(target=contextvars.copy_context().run,
+                                            args=(lambda: [ledger.charge(prompt_tokens=1, github_calls=1)
+                                                           for _ in range(charges)],))
+                           for _ in range(threads)]
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    total = threads * charges
+    assert run.prompt_tokens == repo_run.prompt_tokens == total
+    for kind, name in (("user", "carol"), ("ip", "10.0.0.1"), ("repo", "carol/r1")):
+        usage = ledger.usage(kind, name)
+        assert (usage.prompt_tokens, usage.github_calls) == (total, total)
+
+
+def test_admission_downgrades_then_rejects(monkeypatch):
+    monkeypatch.setattr(ledger, "_entries", {})
+    monkeypatch.setattr(ledger, "USER_TOKEN_QUOTA", 10 * ledger.TOKENS_PER_FILE_ESTIMATE)
+    monkeypatch.setattr(ledger, "OFF_PEAK_QUOTA_MULTIPLIER", 1)
+    assert ledger.admit("carol", None, 1, 5).action == "allow"
+    assert ledger.admit("carol", None, 1, 15).max_files == 10
+    with ledger.scope(username="carol"):
+        ledger.charge(prompt_tokens=10 * ledger.TOKENS_PER_FILE_ESTIMATE)
+    admission = ledger.admit("carol", None, 1, 5)
+    assert admission.action == "reject" and admission.retry_at > 0
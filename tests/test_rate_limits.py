@@ -0,0 +1,29 @@
+import time
+
+import pytest
+
+
+@pytest.fixture
+def exhausted(main, api_server, monkeypatch):
+    """Every GitHub response is a spent-budget 403 that resets in ten minutes"""
+    monkeypatch.setattr(api_server, "rate_limit_every", 1)
+    monkeypatch.setattr(api_server, "retry_after", 600)
+    monkeypatch.setattr(api_server, "github_throttle_status", 403)
+    monkeypatch.setattr(main, "_github_pool", None)  # A fresh pool, discarded after the test
+    return main.app.test_client()
+
+
+def test_api_answers_503_with_retry_after(exhausted):
+    response = exhausted.get('/api/v1/users/alice/repos')
+    assert response.status_code == 503
+    assert 500 < int(response.headers['Retry-After']) <= 600
+    assert response.get_json()['retry_at'].endswith('Z')
+
+
+@pytest.mark.parametrize("path", ['/user-report/alice', '/repo_details/alice/r1'])
+def test_pages_answer_503_with_retry_after(exhausted, path):
+    start = time.time()
+    response = exhausted.get(path)
+    assert response.status_code == 503
+    assert 500 < int(response.headers['Retry-After']) <= 600
+    assert time.time() - start < 10  # Not parked until the reset
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from utils.structured import IncrementalJSONObject
+
+RESPONSE = json.dumps({"score": 40, "concerns": ['Query built with "%s" and {braces}', "Path ends in \\", "[unbalanced"]})
+
+
+def feed_in_pieces(pieces):
+    parser = IncrementalJSONObject()
+    for index, piece in enumerate(pieces):
+        if parser.feed(piece):
+            return parser, index
+    return parser, None
+
+
+@pytest.mark.parametrize("split", range(1, len(RESPONSE)))
+def test_object_split_anywhere_is_complete_only_at_the_end(split):
+    parser, index = feed_in_pieces([RESPONSE[:split], RESPONSE[split:]])
+    assert index == 1
+    assert json.loads(parser.text) == json.loads(RESPONSE)
+
+
+def test_character_stream_with_prefix_and_trailing_tokens():
+    parser, index = feed_in_pieces(list("Sure:\n```json\n" + RESPONSE + "\n```\nDone"))
+    assert index == len("Sure:\n```json\n") + len(RESPONSE) - 1
+    assert parser.text == RESPONSE
+
+
+def test_escaped_quote_at_a_chunk_boundary_keeps_the_string_open():
+    text = '{"concerns": ["a \\"} b"], "score": 1}'
+    parser, index = feed_in_pieces([text[:text.index("\\") + 1], text[text.index("\\") + 1:]])
+    assert index == 1
+    assert json.loads(parser.text)["concerns"] == ['a "} b']
+
+
+def test_incomplete_object_is_not_complete():
+    parser, index = feed_in_pieces(['{"score": 40, "concerns": ["}', '"]'])
+    assert index is None and not parser.complete
@@ -0,0 +1,54 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import cache_snapshot
+
+REPO = {'name': 'r1', 'analyzed': True, 'languages': {'Python': 100}, 'overall_score': 70,
+        'security': {'score': 80, 'concerns': []}, 'efficiency': {'score': 70, 'concerns': []},
+        'quality': {'score': 60, 'concerns': []}}
+
+
+def test_concurrent_first_requests_wait_for_the_warm_load(main, monkeypatch, tmp_path):
+    monkeypatch.setattr(cache_snapshot, "CACHE_SNAPSHOT_PATH", str(tmp_path / "snapshot.bin"))
+    main.cache_user_repos('carol', [REPO])
+    main.save_repo_data('carol', 'r1', REPO)
+    assert cache_snapshot.save(main.store.export(main.store.take_dirty()))
+
+    # A fresh worker: nothing in memory, users restored from the snapshot on first use
+    main.store.clear()
+    main.aggregation.clear()
+    loads = []
+
+    def slow_warm_user(username):
+        loads.append(username)
+        time.sleep(0.2)  # Long enough for every request below to arrive mid-load
+        main.warm_user(username)
+
+    monkeypatch.setattr(main.store, "loader", slow_warm_user)
+    client = main.app.test_client()
+    paths = ['/badge/carol.svg', '/badge/carol/r1.svg'] * 4
+    with ThreadPoolExecutor(len(paths)) as pool:
+        bodies = list(pool.map(lambda path: client.get(path).get_data(as_text=True), paths))
+
+    assert loads == ['carol']
+    for body in bodies:
+        assert 'not analyzed' not in body
+        assert '>70<' in body
+
+
+def test_failed_warm_load_is_retried(main, monkeypatch):
+    attempts = []
+
+    def flaky(username):
+        attempts.append(username)
+        if len(attempts) == 1:
+            raise OSError("cache server down")
+
+    monkeypatch.setattr(main.store, "loader", flaky)
+    try:
+        main.store.has_user('dave')
+    except OSError:
+        pass
+    assert 'dave' not in main.store.loaded
+    main.store.has_user('dave')
+    assert attempts == ['dave', 'dave']
@@ -0,0 +1,270 @@
+"""
+Score aggregation shared by every route.
+
+Analyzer results carry string scores ('72', 'N/A', 'Error', 'Click to analyze').
+This module parses them once, combines per-file results into repository
+scores, and keeps an array-backed table per user with running sums and counts
+so badge and report statistics are O(1) reads as repositories finish. At most
+AGGREGATION_MAX_USERS tables are kept; an evicted one is rebuilt from `source`
+on its next read.
+"""
+import math
+import os
+import re
+import threading
+from array import array
+from collections import OrderedDict
+
+from utils import clustering
+
+DIMENSIONS = ("security", "efficiency", "quality")
+COLUMNS = DIMENSIONS + ("overall",)
+MAX_CONCERNS = 5  # Unique concerns kept per repository and dimension
+IGNORED_CONCERNS = {"Unable to analyze code", "Analysis timed out", "No specific concerns identified"}
+NO_CONCERNS_PATTERN = re.compile(r"^no .*concerns (?:detected|identified)", re.IGNORECASE)
+COMMON_CONCERNS = 5  # Concern clusters per dimension in the user report
+
+FILE_WEIGHTING = os.getenv("FILE_WEIGHTING", "none")  # 'none' or 'size' (file length)
+REPO_WEIGHTING = os.getenv("REPO_WEIGHTING", "none")  # 'none', 'size' or 'language_bytes'
+AGGREGATION_MAX_USERS = int(os.getenv("AGGREGATION_MAX_USERS", "10000"))  # Score tables kept, least recently used dropped
+
+NAN = float("nan")
+
+
+def parse_score(value):
+    """Numeric score, or NaN for placeholders such as 'N/A' and 'Error'"""
+    try:
+        score = float(value)
+    except (TypeError, ValueError):
+        return NAN
+    return score if math.isfinite(score) else NAN
+
+
+def mean_score(values, weights=None):
+    """Weighted mean of the parsable scores, or 'N/A' when there are none"""
+    total = weight_total = 0.0
+    for index, value in enumerate(values):
+        score = parse_score(value)
+        if score == score:  # Skip NaN
+            weight = weights[index] if weights else 1.0
+            total += score * weight
+            weight_total += weight
+    return total / weight_total if weight_total else 'N/A'
+
+
+def combine(results, weights=None, max_concerns=MAX_CONCERNS):
+    """Merge per-file analyzer results for one dimension into a repository result"""
+    results = [result if isinstance(result, dict) else {} for result in results]
+    concerns, seen = [], set()
+    for result in results:
+        for concern in result.get('concerns', []):
+            key = clustering.concern_key(concern)
+            if key and key not in seen and concern not in IGNORED_CONCERNS:
+                seen.add(key)
+                concerns.append(concern)
+    # Paraphrases of an earlier concern from another file are dropped too
+    concerns = clustering.distinct(concerns, max_concerns)
+    score = mean_score([result.get('score') for result in results], weights)
+    return {'score': str(score), 'concerns': concerns}
+
+
+def dimension_score(repo, dimension):
+    section = repo.get(dimension) if isinstance(repo, dict) else None
+    return section.get('score') if isinstance(section, dict) else None
+
+
+def overall_score(repo):
+    """Mean of a repository's dimension scores, or 'N/A'"""
+    return mean_score([dimension_score(repo, dimension) for dimension in DIMENSIONS])
+
+
+def file_weight(content):
+    return float(max(len(content), 1)) if FILE_WEIGHTING == "size" else 1.0
+
+
+def repo_weight(repo):
+    if REPO_WEIGHTING == "size":
+        return float(max(repo.get('size') or 0, 1))
+    if REPO_WEIGHTING == "language_bytes":
+        return float(max(sum((repo.get('languages') or {}).values()), 1))
+    return 1.0
+
+
+def common_concerns(repos, limit=COMMON_CONCERNS):
+    """Near-identical concerns grouped across a user's analyzed repositories, per dimension.
+
+    Clusters are ranked by occurrences weighted by severity, where severity is
+    100 minus the score of the repositories that raised the concern.
+    """
+    report = {}
+    for dimension in DIMENSIONS:
+        phrasings = {}  # concern key -> [text, occurrences, severity sum, repository names]
+        for repo in repos:
+            section = repo.get(dimension) if isinstance(repo, dict) and repo.get('analyzed') else None
+            if not isinstance(section, dict):
+                continue
+            score = parse_score(section.get('score'))
+            severity = 100.0 - score if score == score else 50.0
+            for concern in section.get('concerns') or []:
+                if not isinstance(concern, str) or concern in IGNORED_CONCERNS or NO_CONCERNS_PATTERN.match(concern):
+                    continue
+                entry = phrasings.setdefault(clustering.concern_key(concern), [concern, 0, 0.0, set()])
+                entry[1] += 1
+                entry[2] += severity
+                entry[3].add(repo.get('name'))
+        entries = [entry for entry in phrasings.values() if entry[0].strip()]
+        ranked = []
+        for members in clustering.cluster([entry[0] for entry in entries], [entry[1] for entry in entries]):
+            group = [entries[index] for index in members]
+            count = sum(entry[1] for entry in group)
+            severity = sum(entry[2] for entry in group) / count
+            ranked.append({
+                'concern': group[0][0],
+                'count': count,
+                'repos': len(set().union(*(entry[3] for entry in group))),
+                'severity': round(severity),
+                'variants': [entry[0] for entry in group[1:4]],
+            })
+        ranked.sort(key=lambda cluster: cluster['count'] * (0.5 + cluster['severity'] / 100), reverse=True)
+        report[dimension] = ranked[:limit]
+    return report
+
+
+class UserScores:
+    """Array-backed score table for one user's repositories with running sums"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = {}  # repo name -> row
+        self.weights = array('d')
+        self.columns = {column: array('d') for column in COLUMNS}
+        self.sums = dict.fromkeys(COLUMNS, 0.0)
+        self.weight_sums = dict.fromkeys(COLUMNS, 0.0)
+        self.counts = dict.fromkeys(COLUMNS, 0)
+
+    def __len__(self):
+        return len(self.index)
+
+    def _apply(self, row, sign):
+        weight = self.weights[row]
+        for column in COLUMNS:
+            value = self.columns[column][row]
+            if value == value:
+                self.sums[column] += sign * value * weight
+                self.weight_sums[column] += sign * weight
+                self.counts[column] += sign
+                if not self.counts[column]:
+                    # Reset instead of accumulating float drift from add/subtract
+                    self.sums[column] = self.weight_sums[column] = 0.0
+
+    def update(self, repo):
+        """Insert or replace one repository's scores"""
+        values = {dimension: parse_score(dimension_score(repo, dimension)) for dimension in DIMENSIONS}
+        values["overall"] = parse_score(overall_score(repo))
+        with self.lock:
+            row = self.index.get(repo['name'])
+            if row is None:
+                row = self.index[repo['name']] = len(self.weights)
+                self.weights.append(0.0)
+                for column in COLUMNS:
+                    self.columns[column].append(NAN)
+            else:
+                self._apply(row, -1)
+            self.weights[row] = repo_weight(repo)
+            for column in COLUMNS:
+                self.columns[column][row] = values[column]
+            self._apply(row, 1)
+
+    def row(self, name):
+        """One repository's scores, or None when it is not in the table"""
+        with self.lock:
+            index = self.index.get(name)
+            if index is None:
+                return None
+            return {column: value if value == value else 'N/A'
+                    for column, value in ((column, self.columns[column][index]) for column in COLUMNS)}
+
+    def stats(self):
+        """Average per column ('N/A' when nothing is scored) plus repo counts"""
+        with self.lock:
+            stats = {column: self.sums[column] / self.weight_sums[column] if self.counts[column] else 'N/A'
+                     for column in COLUMNS}
+            stats['repo_count'] = len(self.index)
+            stats['analyzed_count'] = self.counts['overall']
+        return stats
+
+
+_tables = OrderedDict()  # username -> UserScores, least recently used first
+_tables_lock = threading.Lock()
+source = None  # username -> repository dicts, or None when unknown; rebuilds evicted tables
+
+
+def _put(username, scores):
+    _tables[username] = scores
+    _tables.move_to_end(username)
+    while len(_tables) > AGGREGATION_MAX_USERS:
+        _tables.popitem(last=False)
+
+
+def _table(username, create):
+    with _tables_lock:
+        scores = _tables.get(username)
+        if scores is not None:
+            _tables.move_to_end(username)
+            return scores
+    # Read the source outside the lock: it may warm the user, which syncs their table
+    repos = source(username) if source is not None else None
+    if repos is None and not create:
+        return None
+    rebuilt = UserScores()
+    for repo in repos or ():
+        rebuilt.update(repo)
+    with _tables_lock:
+        scores = _tables.get(username)
+        if scores is None:
+            scores = rebuilt
+        _put(username, scores)
+        return scores
+
+
+def table(username):
+    return _table(username, create=True)
+
+
+def sync(username, repos):
+    """Rebuild a user's table from a full repository list"""
+    scores = UserScores()
+    for repo in repos:
+        scores.update(repo)
+    with _tables_lock:
+        _put(username, scores)
+
+
+def record_repo(username, repo):
+    """Update a user's table as one repository finishes"""
+    table(username).update(repo)
+
+
+def user_stats(username):
+    return table(username).stats()
+
+
+def find_user_stats(username):
+    """Stats for a user with a score table, without creating an empty one"""
+    scores = _table(username, create=False)
+    return scores.stats() if scores is not None else None
+
+
+def repo_stats(username, repo_name):
+    scores = _table(username, create=False)
+    return scores.row(repo_name) if scores is not None else None
+
+
+def rounded(stats, digits=None):
+    """Round numeric averages for display, leaving 'N/A' untouched"""
+    return {key: round(value, digits) if isinstance(value, float) else value for key, value in stats.items()}
+
+
+def clear():
+    with _tables_lock:
+        _tables.clear()
@@ -0,0 +1,152 @@
+"""
+Helpers for the versioned JSON API under /api/v1.
+
+Responses are serialized once with sorted keys so the body hash is a stable
+strong ETag. Clients that send it back in If-None-Match get a 304 before any
+compression work. Larger bodies are brotli- or gzip-encoded depending on
+Accept-Encoding; brotli is used only when the 'brotli' package is installed.
+"""
+import base64
+import binascii
+import functools
+import gzip
+import hashlib
+import json
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_PAGE_SIZE = 30
+MAX_PAGE_SIZE = 100
+COMPRESS_MIN_BYTES = 1024  # Smaller bodies are sent uncompressed
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # Close to gzip -6 speed with noticeably smaller output
+COMPRESS_CACHE_SIZE = 256  # Encoded bodies kept for repeated requests of the same resource
+CACHE_CONTROL = "private, no-cache"  # Clients may store responses but must revalidate with the ETag
+
+
+class ApiError(Exception):
+    """Error rendered as a JSON body with an HTTP status"""
+
+    def __init__(self, message, status=400, **details):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.details = details
+
+    def to_dict(self):
+        return {"error": self.message, **self.details}
+
+
+def page_size(value):
+    """Validate the ?limit= parameter"""
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        size = int(value)
+    except ValueError:
+        raise ApiError("limit must be an integer")
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(offset, key):
+    raw = json.dumps({"o": offset, "k": key}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return (offset, key) from an opaque cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return int(data["o"]), data["k"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise ApiError("Invalid cursor")
+
+
+def paginate(items, cursor=None, limit=DEFAULT_PAGE_SIZE, key=lambda item: item["name"]):
+    """One page of items after the cursor, and the cursor for the next page (None on the last page).
+
+    Cursors name the last item of the previous page, so pages stay consistent
+    when items are added to or removed from the list between requests. The
+    offset is only used when that item has disappeared.
+    """
+    start = 0
+    if cursor:
+        offset, last_key = decode_cursor(cursor)
+        start = offset
+        for index, item in enumerate(items):
+            if key(item) == last_key:
+                start = index + 1
+                break
+    page = items[start:start + limit]
+    end = start + len(page)
+    next_cursor = encode_cursor(end, key(page[-1])) if page and end < len(items) else None
+    return page, next_cursor
+
+
+def parse_fields(value):
+    """?fields=name,overall_score,security.score -> tuple of dotted paths, or None for everything"""
+    if not value:
+        return None
+    return tuple(field.strip() for field in value.split(",") if field.strip()) or None
+
+
+def select_fields(item, fields):
+    """Copy only the requested (optionally dotted) fields of a dict; unknown fields are skipped"""
+    if not fields:
+        return item
+    selected = {}
+    for path in fields:
+        source, target = item, selected
+        parts = path.split(".")
+        for part in parts[:-1]:
+            source = source.get(part) if isinstance(source, dict) else None
+            if not isinstance(source, dict):
+                break
+            target = target.setdefault(part, {})
+        else:
+            if isinstance(source, dict) and parts[-1] in source:
+                target[parts[-1]] = source[parts[-1]]
+    return selected
+
+
+def negotiate_encoding(accept_encodings):
+    """Preferred content coding supported by both sides, or None"""
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = accept_encodings.best_match(candidates)
+    return best if best and accept_encodings[best] else None
+
+
+@functools.lru_cache(maxsize=COMPRESS_CACHE_SIZE)
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def json_response(payload, request, status=200, headers=None):
+    """Serialize payload with a strong ETag, answering 304 or compressing as the request allows"""
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+    encoding = negotiate_encoding(request.accept_encodings) if len(body) >= COMPRESS_MIN_BYTES else None
+    etag = hashlib.sha1(body).hexdigest()[:20]
+    if encoding:
+        etag = f"{etag}-{encoding}"  # Each encoding is a different representation
+
+    if status == 200 and request.method in ("GET", "HEAD") and request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(compress(body, encoding) if encoding else body, status=status,
+                            mimetype="application/json")
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    response.vary.add("Accept-Encoding")
+    if headers:
+        response.headers.update(headers)
+    return response
@@ -0,0 +1,89 @@
+"""
+Flat SVG score badges for READMEs.
+
+Badges are rendered from precomputed score aggregates. Each distinct
+(label, value) pair is rendered once and kept in a small LRU cache together
+with its strong ETag, so a badge hit costs a dict lookup.
+"""
+import functools
+import hashlib
+
+BADGE_CACHE_SIZE = 1024
+FRESH_MAX_AGE = 300  # Seconds clients and CDNs may serve a badge without revalidating
+STALE_WHILE_REVALIDATE = 86400
+PENDING_MAX_AGE = 60  # Badges for users or repos that have not been analyzed yet
+
+COLORS = {"high": "#4c1", "medium": "#dfb317", "low": "#e05d44", "none": "#9f9f9f"}
+
+# Approximate Verdana 11px advance widths; everything else uses the default
+CHAR_WIDTHS = {"i": 3, "l": 3, "I": 4, "j": 3, "t": 4, "f": 4, "r": 5, " ": 4, "1": 7, "/": 5, "m": 11, "w": 9,
+               "M": 10, "W": 11}
+DEFAULT_CHAR_WIDTH = 7
+PADDING = 10
+
+TEMPLATE = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="20" role="img" aria-label="{label}: {value}">'
+    '<title>{label}: {value}</title>'
+    '<linearGradient id="s" x2="0" y2="100%"><stop offset="0" stop-color="#bbb" stop-opacity=".1"/>'
+    '<stop offset="1" stop-opacity=".1"/></linearGradient>'
+    '<clipPath id="r"><rect width="{width}" height="20" rx="3" fill="#fff"/></clipPath>'
+    '<g clip-path="url(#r)"><rect width="{label_width}" height="20" fill="#555"/>'
+    '<rect x="{label_width}" width="{value_width}" height="20" fill="{color}"/>'
+    '<rect width="{width}" height="20" fill="url(#s)"/></g>'
+    '<g fill="#fff" text-anchor="middle" font-family="Verdana,Geneva,DejaVu Sans,sans-serif" font-size="11">'
+    '<text x="{label_x}" y="15" fill="#010101" fill-opacity=".3">{label}</text>'
+    '<text x="{label_x}" y="14">{label}</text>'
+    '<text x="{value_x}" y="15" fill="#010101" fill-opacity=".3">{value}</text>'
+    '<text x="{value_x}" y="14">{value}</text></g></svg>'
+)
+
+
+def text_width(text):
+    return sum(CHAR_WIDTHS.get(char, DEFAULT_CHAR_WIDTH) for char in text)
+
+
+def _escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+
+def score_color(score):
+    """Same thresholds as the report pages"""
+    if not isinstance(score, (int, float)):
+        return COLORS["none"]
+    if score >= 70:
+        return COLORS["high"]
+    if score >= 40:
+        return COLORS["medium"]
+    return COLORS["low"]
+
+
+def format_value(score):
+    return str(round(score)) if isinstance(score, (int, float)) else str(score)
+
+
+@functools.lru_cache(maxsize=BADGE_CACHE_SIZE)
+def render(label, value, color):
+    """Return (svg bytes, strong ETag value) for a badge"""
+    label_width = text_width(label) + PADDING
+    value_width = text_width(value) + PADDING
+    svg = TEMPLATE.format(
+        width=label_width + value_width,
+        label_width=label_width,
+        value_width=value_width,
+        label_x=label_width / 2,
+        value_x=label_width + value_width / 2,
+        label=_escape(label),
+        value=_escape(value),
+        color=color,
+    ).encode("utf-8")
+    return svg, hashlib.sha1(svg).hexdigest()[:20]
+
+
+def score_badge(label, score):
+    """Badge for a numeric score, or a grey badge for 'N/A' / pending values"""
+    return render(label, format_value(score), score_color(score))
+
+
+def cache_control(score):
+    max_age = FRESH_MAX_AGE if isinstance(score, (int, float)) else PENDING_MAX_AGE
+    return f"public, max-age={max_age}, stale-while-revalidate={STALE_WHILE_REVALIDATE}"
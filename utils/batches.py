@@ -0,0 +1,214 @@
+"""
+Bulk analysis batches.
+
+A batch is a list of GitHub usernames and owner/repo pairs submitted in one
+call. Entries from every batch go through a single planner thread, so there
+is one global pace of GitHub and LLM calls no matter how many cohorts are
+queued. Work is deduplicated by key: a repository named by several entries or
+batches is listed and analyzed once, and every waiting batch receives the
+result. Each batch keeps its results in completion order so they can be
+streamed as JSON lines while the rest of the plan is still running.
+"""
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+
+BATCH_MAX_ENTRIES = int(os.getenv("BATCH_MAX_ENTRIES", "500"))  # Entries accepted per submission
+BATCH_RETENTION = int(os.getenv("BATCH_RETENTION", "86400"))  # Seconds finished batches stay readable
+BATCH_MAX_OPEN_PER_IP = int(os.getenv("BATCH_MAX_OPEN_PER_IP", "2"))  # Unfinished batches per client IP, 0 = unlimited
+BATCH_USER_REPO_ESTIMATE = int(os.getenv("BATCH_USER_REPO_ESTIMATE", "30"))  # Repositories assumed per user entry
+STREAM_HEARTBEAT = 15  # Seconds between keep-alive lines on an idle result stream
+
+_NAME = r"[A-Za-z0-9](?:[A-Za-z0-9-]{0,38})"
+_USER_ENTRY = re.compile(rf"^{_NAME}$")
+_REPO_ENTRY = re.compile(rf"^({_NAME})/(?!\.\.?$)([A-Za-z0-9._-]{{1,100}})$")
+
+
+class TooManyBatches(Exception):
+    """The client already has BATCH_MAX_OPEN_PER_IP unfinished batches"""
+
+
+def parse_entries(entries, max_entries=BATCH_MAX_ENTRIES):
+    """Normalize 'username' and 'owner/repo' strings into unique work keys, preserving order"""
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("entries must be a non-empty list of usernames or owner/repo strings")
+    if max_entries and len(entries) > max_entries:
+        raise ValueError(f"At most {max_entries} entries per batch")
+    keys = []
+    for entry in entries:
+        entry = entry.strip().strip("/") if isinstance(entry, str) else ""
+        repo = _REPO_ENTRY.match(entry)
+        if repo:
+            keys.append(("repo", repo.group(1), repo.group(2)))
+        elif _USER_ENTRY.match(entry):
+            keys.append(("user", entry))
+        else:
+            raise ValueError(f"Invalid entry: {entry!r}")
+    # A repository entry is redundant when its owner is also submitted as a user
+    users = {key[1] for key in keys if key[0] == "user"}
+    return list(dict.fromkeys(key for key in keys if key[0] == "user" or key[1] not in users))
+
+
+def estimate_repos(keys):
+    """Repositories a batch is expected to analyze, for admission before its listings are known"""
+    return sum(BATCH_USER_REPO_ESTIMATE if key[0] == "user" else 1 for key in keys)
+
+
+class Batch:
+    def __init__(self, keys, ip=None):
+        self.id = uuid.uuid4().hex[:16]
+        self.keys = keys
+        self.ip = ip
+        self.created = time.time()
+        self.finished = None
+        self.results = []  # JSON-serializable records in completion order
+        self.seen = set()  # Keys already planned for this batch
+        self.pending = 0
+        self.condition = threading.Condition()
+
+    @property
+    def status(self):
+        if self.finished is not None:
+            return "done"
+        return "running" if self.results else "queued"
+
+    def plan(self, key):
+        """Count a key toward this batch unless it was planned already. Returns True if it is new."""
+        with self.condition:
+            if key in self.seen:
+                return False
+            self.seen.add(key)
+            self.pending += 1
+            return True
+
+    def complete(self, record):
+        """Record one finished key and close the batch when nothing is pending"""
+        with self.condition:
+            if record is not None:
+                self.results.append(record)
+            self.pending -= 1
+            if self.pending <= 0 and self.finished is None:
+                self.finished = time.time()
+                self.results.append({"type": "batch", "batch": self.id, "status": "done",
+                                     "seconds": round(self.finished - self.created, 2)})
+            self.condition.notify_all()
+
+    def follow(self, heartbeat=STREAM_HEARTBEAT):
+        """Yield results from the start, waiting for new ones until the batch is done.
+
+        Yields None after `heartbeat` idle seconds so streaming responses can
+        send keep-alive lines.
+        """
+        index = 0
+        while True:
+            with self.condition:
+                if index >= len(self.results) and self.finished is None:
+                    self.condition.wait(heartbeat)
+                records = self.results[index:]
+                done = self.finished is not None
+            index += len(records)
+            if not records and not done:
+                yield None
+            yield from records
+            if done and index >= len(self.results):
+                return
+
+    def summary(self):
+        with self.condition:
+            repos = [record for record in self.results if record.get("type") == "repo"]
+            return {
+                "batch": self.id,
+                "status": self.status,
+                "entries": ["/".join(key[1:]) for key in self.keys],
+                "completed": len(repos),
+                "pending": max(self.pending, 0),
+                "errors": sum(1 for record in repos if record.get("error")),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.created)),
+            }
+
+
+class Planner:
+    """Single worker thread running deduplicated work keys for every batch.
+
+    `handler(key, batch)` returns (record, follow_ups): the record is added to
+    every batch waiting on the key and the follow-up keys are planned for them.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.lock = threading.Lock()
+        self.queue = deque()
+        self.waiting = {}  # key -> batches waiting on it
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def submit(self, batch, keys):
+        with self.lock:
+            for key in keys:
+                if not batch.plan(key):
+                    continue
+                if key in self.waiting:
+                    self.waiting[key].append(batch)
+                else:
+                    self.waiting[key] = [batch]
+                    # Repository listings first so their repositories join the plan early
+                    if key[0] == "user":
+                        self.queue.appendleft(key)
+                    else:
+                        self.queue.append(key)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="batch-planner", daemon=True)
+                self.thread.start()
+        self.wakeup.set()
+
+    def queued(self):
+        with self.lock:
+            return len(self.queue)
+
+    def _run(self):
+        while True:
+            with self.lock:
+                key = self.queue.popleft() if self.queue else None
+                batches = list(self.waiting.get(key, ())) if key else None
+            if key is None:
+                self.wakeup.wait(60)
+                self.wakeup.clear()
+                continue
+            try:
+                record, follow_ups = self.handler(key, batches[0])
+            except Exception as e:
+                print(f"Error running batch work {key}: {e}")
+                record, follow_ups = {"type": key[0], "key": "/".join(key[1:]), "error": str(e)}, []
+            with self.lock:
+                batches = self.waiting.pop(key, batches)
+            for batch in batches:
+                if follow_ups:
+                    self.submit(batch, follow_ups)
+                batch.complete(record)
+
+
+_batches = {}
+_batches_lock = threading.Lock()
+
+
+def create(keys, ip=None):
+    """Register a new batch. Raises TooManyBatches when the IP has too many unfinished ones."""
+    batch = Batch(keys, ip)
+    now = time.time()
+    with _batches_lock:
+        for batch_id in [b.id for b in _batches.values() if b.finished and now - b.finished > BATCH_RETENTION]:
+            del _batches[batch_id]
+        if BATCH_MAX_OPEN_PER_IP and ip is not None:
+            open_batches = sum(1 for b in _batches.values() if b.ip == ip and b.finished is None)
+            if open_batches >= BATCH_MAX_OPEN_PER_IP:
+                raise TooManyBatches(f"At most {BATCH_MAX_OPEN_PER_IP} unfinished batches per client")
+        _batches[batch.id] = batch
+    return batch
+
+
+def get(batch_id):
+    with _batches_lock:
+        return _batches.get(batch_id)
@@ -0,0 +1,47 @@
+"""
+Content cache for GitHub blobs keyed by their git SHA.
+
+A blob SHA identifies file contents, so forks and template copies of the same
+project share entries and their files are fetched from GitHub once.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+BLOB_CACHE_BYTES = int(os.getenv("BLOB_CACHE_BYTES", str(32 * 1024 * 1024)))  # Decoded source kept in memory
+
+_blobs = OrderedDict()  # sha -> decoded text, least recently used first
+_size = 0
+_lock = threading.Lock()
+
+
+def get(sha):
+    if not sha:
+        return None
+    with _lock:
+        text = _blobs.get(sha)
+        if text is not None:
+            _blobs.move_to_end(sha)
+        return text
+
+
+def put(sha, text):
+    global _size
+    if not sha or len(text) > BLOB_CACHE_BYTES:
+        return
+    with _lock:
+        previous = _blobs.pop(sha, None)
+        if previous is not None:
+            _size -= len(previous)
+        _blobs[sha] = text
+        _size += len(text)
+        while _size > BLOB_CACHE_BYTES:
+            _, evicted = _blobs.popitem(last=False)
+            _size -= len(evicted)
+
+
+def clear():
+    global _size
+    with _lock:
+        _blobs.clear()
+        _size = 0
@@ -0,0 +1,247 @@
+"""
+Shared cache backends for analysis results.
+
+Every backend stores opaque bytes under string keys and supports
+compare-and-set, so several gunicorn workers or serverless instances can
+publish results without overwriting each other:
+
+    memory://                   in-process dict (one process only, for tests)
+    sqlite:///path/to/cache.db  local SQLite file shared by workers on one host
+    redis://host:6379/0         any server speaking the Redis protocol (RESP)
+
+compare_and_set(key, expected, value) writes only when the stored bytes still
+equal `expected` (None meaning the key must not exist) and returns whether it
+did. Connections are opened on first use.
+"""
+import abc
+import os
+import socket
+import sqlite3
+import threading
+from urllib.parse import urlsplit
+
+CACHE_BACKEND_TIMEOUT = float(os.getenv("CACHE_BACKEND_TIMEOUT", "2"))  # Seconds per backend operation
+
+
+def to_bytes(value):
+    """Values are stored as bytes; strings are encoded as UTF-8 like the Redis protocol does"""
+    return value.encode("utf-8") if isinstance(value, str) else value
+
+
+class CacheBackendError(Exception):
+    """The shared cache could not be reached or returned an error"""
+    pass
+
+
+class CacheBackend(abc.ABC):
+    @abc.abstractmethod
+    def get(self, key):
+        pass
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    @abc.abstractmethod
+    def set(self, key, value):
+        pass
+
+    @abc.abstractmethod
+    def compare_and_set(self, key, expected, value):
+        pass
+
+    @abc.abstractmethod
+    def delete(self, key):
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+
+    def get(self, key):
+        with self.lock:
+            return self.data.get(key)
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = to_bytes(value)
+
+    def compare_and_set(self, key, expected, value):
+        with self.lock:
+            if self.data.get(key) != to_bytes(expected):
+                return False
+            self.data[key] = to_bytes(value)
+            return True
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+
+class SQLiteBackend(CacheBackend):
+    """Key-value table in a SQLite file; WAL mode lets worker processes read while one writes"""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=CACHE_BACKEND_TIMEOUT, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+            self.local.connection = connection
+        return connection
+
+    def _execute(self, sql, params=()):
+        try:
+            return self._connection().execute(sql, params)
+        except sqlite3.Error as e:
+            raise CacheBackendError(f"SQLite cache error: {e}") from e
+
+    def get(self, key):
+        row = self._execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        return bytes(row[0]) if row else None
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        placeholders = ",".join("?" * len(keys))
+        rows = dict(self._execute(f"SELECT key, value FROM cache WHERE key IN ({placeholders})", list(keys)))
+        return [bytes(rows[key]) if key in rows else None for key in keys]
+
+    def set(self, key, value):
+        self._execute("INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)", (key, to_bytes(value)))
+
+    def compare_and_set(self, key, expected, value):
+        expected, value = to_bytes(expected), to_bytes(value)
+        if expected is None:
+            cursor = self._execute("INSERT OR IGNORE INTO cache (key, value) VALUES (?, ?)", (key, value))
+        else:
+            cursor = self._execute("UPDATE cache SET value = ? WHERE key = ? AND value = ?", (value, key, expected))
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        self._execute("DELETE FROM cache WHERE key = ?", (key,))
+
+
+class RESPBackend(CacheBackend):
+    """Minimal Redis protocol client: one connection per thread, CAS through WATCH/MULTI/EXEC"""
+
+    def __init__(self, host="127.0.0.1", port=6379, db=0, password=None):
+        self.address = (host, port)
+        self.db = db
+        self.password = password
+        self.local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=CACHE_BACKEND_TIMEOUT)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.local.sock = sock
+        self.local.reader = sock.makefile("rb")
+        if self.password:
+            self._call("AUTH", self.password)
+        if self.db:
+            self._call("SELECT", self.db)
+
+    def _close(self):
+        sock = getattr(self.local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self.local.sock = None
+
+    def _read(self):
+        line = self.local.reader.readline()
+        if not line:
+            raise CacheBackendError("Connection closed by cache server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise CacheBackendError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self.local.reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise CacheBackendError(f"Unexpected reply from cache server: {line!r}")
+
+    def _call(self, *args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self.local.sock.sendall(b"".join(parts))
+        return self._read()
+
+    def command(self, *args):
+        """Send one command, reconnecting once if the connection dropped"""
+        for attempt in (1, 2):
+            if getattr(self.local, "sock", None) is None:
+                try:
+                    self._connect()
+                except OSError as e:
+                    raise CacheBackendError(f"Cannot reach cache server {self.address}: {e}") from e
+            try:
+                return self._call(*args)
+            except (OSError, CacheBackendError) as e:
+                if isinstance(e, CacheBackendError) and "closed" not in str(e):
+                    raise
+                self._close()
+                if attempt == 2:
+                    raise CacheBackendError(f"Cache server {self.address} failed: {e}") from e
+
+    def get(self, key):
+        return self.command("GET", key)
+
+    def get_many(self, keys):
+        return self.command("MGET", *keys) if keys else []
+
+    def set(self, key, value):
+        self.command("SET", key, value)
+
+    def compare_and_set(self, key, expected, value):
+        # WATCH connects or reconnects as needed; the rest must run on that same connection, since
+        # a reconnect would lose the watch and could replay MULTI/SET into a fresh session
+        self.command("WATCH", key)
+        try:
+            if self._call("GET", key) != to_bytes(expected):
+                self._call("UNWATCH")
+                return False
+            self._call("MULTI")
+            self._call("SET", key, value)
+            return self._call("EXEC") is not None  # Nil when the key changed after WATCH
+        except (OSError, CacheBackendError) as e:
+            self._close()  # Drop the connection rather than leave a transaction open
+            if isinstance(e, CacheBackendError):
+                raise
+            raise CacheBackendError(f"Cache server {self.address} failed: {e}") from e
+
+    def delete(self, key):
+        self.command("DEL", key)
+
+
+def from_url(url):
+    """Backend for a CACHE_BACKEND url"""
+    parts = urlsplit(url)
+    if parts.scheme == "memory":
+        return MemoryBackend()
+    if parts.scheme == "sqlite":
+        return SQLiteBackend(parts.netloc + parts.path if parts.netloc else parts.path)
+    if parts.scheme == "redis":
+        db = int(parts.path.strip("/") or 0)
+        return RESPBackend(parts.hostname or "127.0.0.1", parts.port or 6379, db, parts.password)
+    raise ValueError(f"Unsupported cache backend: {url}")
@@ -0,0 +1,200 @@
+"""
+Binary snapshot of the result store for warm starts.
+
+The store is written periodically to CACHE_SNAPSHOT_PATH as one compressed
+blob per user followed by a sorted index of (name hash, offset, length)
+entries. A new process maps the file and binary-searches the index on the
+first lookup of each user, so only the users that are actually requested are
+decompressed. Snapshots are written to a temporary file and renamed over the
+old one. Readers that still map the old file keep a valid view, and the next
+lookup switches to the new file.
+
+Layout (little-endian):
+    header  magic(8s) version(H) count(I) index_offset(Q)
+    blobs   name_length(H) name(utf-8) zlib(json payload)
+    index   count x name_hash(Q) offset(Q) length(I), sorted by hash
+"""
+import atexit
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+CACHE_SNAPSHOT_PATH = os.getenv("CACHE_SNAPSHOT_PATH", "")  # Empty disables snapshots
+CACHE_SNAPSHOT_INTERVAL = int(os.getenv("CACHE_SNAPSHOT_INTERVAL", "300"))  # Seconds between snapshot writes
+
+MAGIC = b"GGSNAP\x00\x01"
+VERSION = 1
+HEADER = struct.Struct("<8sHIQ")
+ENTRY = struct.Struct("<QQI")
+NAME_LENGTH = struct.Struct("<H")
+
+_reader = None
+_reader_lock = threading.Lock()
+
+
+def enabled():
+    return bool(CACHE_SNAPSHOT_PATH)
+
+
+def name_hash(name):
+    return int.from_bytes(hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def encode(name, payload):
+    raw = name.encode("utf-8")
+    body = zlib.compress(json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8"), 6)
+    return NAME_LENGTH.pack(len(raw)) + raw + body
+
+
+class Snapshot:
+    """Read-only view of a snapshot file through mmap"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns)
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, self.index_offset = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a cache snapshot")
+
+    def _entry(self, position):
+        return ENTRY.unpack_from(self.map, self.index_offset + position * ENTRY.size)
+
+    def entries(self):
+        for position in range(self.count):
+            yield self._entry(position)
+
+    def _name_at(self, offset):
+        (length,) = NAME_LENGTH.unpack_from(self.map, offset)
+        start = offset + NAME_LENGTH.size
+        return self.map[start:start + length].decode("utf-8"), start + length
+
+    def raw(self, name):
+        """The encoded blob for a name, or None"""
+        target = name_hash(name)
+        low, high = 0, self.count
+        while low < high:  # Leftmost entry with the target hash
+            middle = (low + high) // 2
+            if self._entry(middle)[0] < target:
+                low = middle + 1
+            else:
+                high = middle
+        while low < self.count:
+            hashed, offset, length = self._entry(low)
+            if hashed != target:
+                return None
+            if self._name_at(offset)[0] == name:
+                return self.map[offset:offset + length]
+            low += 1
+        return None
+
+    def get(self, name):
+        """Decoded payload for a name, or None"""
+        blob = self.raw(name)
+        if blob is None:
+            return None
+        (length,) = NAME_LENGTH.unpack_from(blob, 0)
+        return json.loads(zlib.decompress(blob[NAME_LENGTH.size + length:]))
+
+
+def write(path, payloads, previous=None):
+    """Atomically write a snapshot of {name: payload}, carrying over untouched names from `previous`"""
+    blobs = {name: encode(name, payload) for name, payload in payloads.items()}
+    if previous is not None:
+        for _, offset, length in previous.entries():
+            name, _ = previous._name_at(offset)
+            if name not in blobs:
+                blobs[name] = previous.map[offset:offset + length]
+
+    index = []
+    offset = HEADER.size
+    chunks = []
+    for name, blob in blobs.items():
+        index.append((name_hash(name), offset, len(blob)))
+        chunks.append(blob)
+        offset += len(blob)
+    index.sort()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(index), offset))
+        for chunk in chunks:
+            f.write(chunk)
+        for entry in index:
+            f.write(ENTRY.pack(*entry))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(index), offset + len(index) * ENTRY.size
+
+
+def reader():
+    """The current snapshot, reopened when a newer file has been rotated in. None when missing."""
+    global _reader
+    try:
+        stat = os.stat(CACHE_SNAPSHOT_PATH)
+    except OSError:
+        return None
+    with _reader_lock:
+        if _reader is None or _reader.identity != (stat.st_ino, stat.st_mtime_ns):
+            try:
+                _reader = Snapshot(CACHE_SNAPSHOT_PATH)
+            except (OSError, ValueError, struct.error) as e:
+                print(f"Error opening cache snapshot {CACHE_SNAPSHOT_PATH}: {e}")
+                _reader = None
+        return _reader
+
+
+def load(name):
+    """Payload saved for a name, or None"""
+    snapshot = reader()
+    if snapshot is None:
+        return None
+    try:
+        return snapshot.get(name)
+    except (ValueError, zlib.error, struct.error) as e:
+        print(f"Error reading {name} from cache snapshot: {e}")
+        return None
+
+
+def save(payloads):
+    """Write {name: payload} merged with the current snapshot. Returns False on errors."""
+    start = time.perf_counter()
+    try:
+        count, size = write(CACHE_SNAPSHOT_PATH, payloads, previous=reader())
+    except OSError as e:
+        print(f"Error writing cache snapshot {CACHE_SNAPSHOT_PATH}: {e}")
+        return False
+    print(f"Cache snapshot: {count} users, {size} bytes in {time.perf_counter() - start:.2f}s")
+    return True
+
+
+def start(export, take_dirty):
+    """Save the names changed since the last save every CACHE_SNAPSHOT_INTERVAL seconds and at exit.
+
+    Only changed names are re-encoded; everything else is copied from the
+    current file, so a process never overwrites newer entries it did not touch.
+    """
+    pending = set()
+
+    def save_if_changed():
+        pending.update(take_dirty())
+        if pending and save(export(pending)):
+            pending.clear()
+
+    def run():
+        while True:
+            time.sleep(CACHE_SNAPSHOT_INTERVAL)
+            save_if_changed()
+
+    threading.Thread(target=run, name="cache-snapshot", daemon=True).start()
+    atexit.register(save_if_changed)
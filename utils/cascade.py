@@ -0,0 +1,185 @@
+"""
+Model-tier cascade for the analyzers.
+
+Each analyzer call is routed to a tier:
+    small    the cheap model only (markup and stylesheets by default)
+    cascade  the cheap model first, escalated to LLM_MODEL when it reports low
+             confidence or fails to produce a score
+    large    LLM_MODEL only
+The tier comes from CASCADE_TIERS, a comma-separated list of rules such as
+"html=small,css=small,security=cascade,security:c=large". A rule's key is a
+dimension, a language (extension or GitHub language name) or both joined by
+a colon, and the most specific matching rule wins. Cascade files skip the cheap
+model when they rank among the repository's most important files or when the
+local static pass flags a risky pattern. Every routing decision is counted in
+/metrics with the escalation ratio per dimension.
+"""
+import os
+import re
+
+from utils import metrics, packing
+from utils.sampling import EXTENSION_LANGUAGES
+
+CASCADE_TIERS = os.getenv("CASCADE_TIERS", "html=small,css=small")  # Rules as above; unmatched calls use 'cascade'
+CASCADE_MIN_CONFIDENCE = int(os.getenv("CASCADE_MIN_CONFIDENCE", "70"))  # Cheap results below this are escalated
+CASCADE_IMPORTANT_FILES = int(os.getenv("CASCADE_IMPORTANT_FILES", "2"))  # Top-ranked files per repo sent to the large model
+
+TIERS = ("small", "cascade", "large")
+
+# Local static pass: patterns that make a cheap-tier answer not worth the risk
+STATIC_PATTERNS = {
+    "security": re.compile(
+        r"\b(?:eval|exec)\s*\(|shell\s*=\s*True|pickle\.loads?\(|yaml\.load\(|innerHTML\s*=|dangerouslySetInnerHTML"
+        r"|(?:password|passwd|secret|api_key|apikey|token)\s*[:=]\s*['\"][^'\"]{6,}['\"]"
+        r"|\b(?:SELECT|INSERT|UPDATE|DELETE)\b[^\n]*(?:%s|\{\w*\}|['\"]\s*\+)",
+        re.IGNORECASE),
+    "efficiency": re.compile(r"\b(?:time\.sleep|Thread\.sleep)\s*\(|\.readlines\(\)|\bSELECT\s+\*"),
+    "quality": re.compile(r"^\s*except\s*:|catch\s*\([^)]*\)\s*\{\s*\}", re.MULTILINE),
+}
+LOOP_PATTERN = re.compile(r"^(\s*)(?:for|while)\b")
+MAX_LOOP_DEPTH = 2  # Deeper loop nests are flagged for the efficiency analyzer
+
+
+def parse_tiers(text):
+    rules = {}
+    for item in (part.strip() for part in text.split(",")):
+        if not item:
+            continue
+        key, _, tier = item.partition("=")
+        tier = tier.strip().lower()
+        if tier not in TIERS:
+            raise ValueError(f"Unknown model tier '{tier}' in CASCADE_TIERS, expected one of {', '.join(TIERS)}")
+        rules[key.strip().lower()] = tier
+    return rules
+
+
+RULES = parse_tiers(CASCADE_TIERS)
+
+
+def languages_of(path):
+    """Keys a path's language can be written as in CASCADE_TIERS: 'py' and 'python'"""
+    extension = os.path.splitext(path)[1].lower()
+    keys = [extension.lstrip(".")] if extension else []
+    if extension in EXTENSION_LANGUAGES:
+        keys.append(EXTENSION_LANGUAGES[extension].lower())
+    return keys
+
+
+def configured_tier(dimension, path):
+    languages = languages_of(path)
+    for key in [f"{dimension}:{language}" for language in languages] + languages + [dimension]:
+        if key in RULES:
+            return RULES[key]
+    return "cascade"
+
+
+def loop_depth(code):
+    """Deepest nesting of for/while loops, judged by indentation"""
+    deepest, stack = 0, []
+    for line in code.split("\n"):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        indent = len(line) - len(line.lstrip())
+        while stack and indent <= stack[-1]:
+            stack.pop()
+        if LOOP_PATTERN.match(line):
+            stack.append(indent)
+            deepest = max(deepest, len(stack))
+    return deepest
+
+
+def static_flags(dimension, code):
+    """True when the local static pass finds something the cheap model should not judge alone"""
+    pattern = STATIC_PATTERNS.get(dimension)
+    if pattern is not None and pattern.search(code):
+        return True
+    return dimension == "efficiency" and loop_depth(code) > MAX_LOOP_DEPTH
+
+
+def _llm():
+    """utils.llm, imported on the first routing decision to keep pydantic out of cold starts"""
+    from utils import llm
+    return llm
+
+
+def route(dimension, path, code, important=False):
+    """(tier, reason) for one analyzer call"""
+    if not _llm().LLM_SMALL_MODEL:
+        return "large", "disabled"
+    tier = configured_tier(dimension, path)
+    if tier == "cascade":
+        if important:
+            return "large", "important"
+        if static_flags(dimension, code):
+            return "large", "static"
+    return tier, "config"
+
+
+def run_large(evaluate_fn, code, path):
+    with _llm().use_model(None):
+        return evaluate_fn(code, path)
+
+
+def escalation_reason(result, attempt):
+    """Why a cheap-tier result needs the large model, or None to keep it"""
+    if attempt.calls == 0:
+        return None  # Answered without the LLM
+    if not isinstance(result, dict) or result.get("score") in (None, "N/A", "Error"):
+        return "failed"
+    if attempt.confidence is None or attempt.confidence < CASCADE_MIN_CONFIDENCE:
+        return "low_confidence"
+    return None
+
+
+def evaluate(dimension, evaluate_fn, code, path, important=False):
+    """evaluate_fn(code, path) through the cascade"""
+    tier, reason = route(dimension, path, code, important)
+    if tier == "large":
+        metrics.record_cascade(dimension, "large", reason)
+        return run_large(evaluate_fn, code, path)
+    with _llm().use_model(_llm().LLM_SMALL_MODEL, confident=tier == "cascade") as attempt:
+        result = evaluate_fn(code, path)
+    escalate = escalation_reason(result, attempt) if tier == "cascade" else None
+    if escalate is None:
+        metrics.record_cascade(dimension, "small", reason if tier == "small" else "confident")
+        return result
+    metrics.record_cascade(dimension, "escalated", escalate)
+    return run_large(evaluate_fn, code, path)
+
+
+def evaluate_pack(dimension, evaluate_fn, files, important=()):
+    """packing.evaluate_pack through the cascade: large-tier files share a request to LLM_MODEL,
+    the rest share one to the cheap model and low-confidence answers are escalated one by one"""
+    routes = {path: route(dimension, path, code, path in important) for path, code in files}
+    large = [(path, code) for path, code in files if routes[path][0] == "large"]
+    light = [(path, code) for path, code in files if routes[path][0] != "large"]
+    results = {}
+    if large:
+        for path, _ in large:
+            metrics.record_cascade(dimension, "large", routes[path][1])
+        with _llm().use_model(None):
+            results.update(packing.evaluate_pack(dimension, evaluate_fn, large))
+    if light:
+        escalated = set()
+
+        def accept(path, analysis):
+            tier, reason = routes[path]
+            if tier == "small":
+                metrics.record_cascade(dimension, "small", reason)
+                return True
+            if analysis.confidence is not None and analysis.confidence >= CASCADE_MIN_CONFIDENCE:
+                metrics.record_cascade(dimension, "small", "confident")
+                return True
+            metrics.record_cascade(dimension, "escalated", "low_confidence")
+            escalated.add(path)
+            return False
+
+        def fallback(code, path):
+            if path in escalated:
+                return run_large(evaluate_fn, code, path)
+            return evaluate(dimension, evaluate_fn, code, path, path in important)
+
+        with _llm().use_model(_llm().LLM_SMALL_MODEL, confident=True):
+            results.update(packing.evaluate_pack(dimension, fallback, light, accept))
+    return results
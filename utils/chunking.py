@@ -0,0 +1,194 @@
+"""
+Map-reduce analysis of large source files.
+
+Files above CHUNK_THRESHOLD characters used to be cut down to a few sampled
+lines before scoring. Instead they are split at top-level definitions
+(functions, classes, and blocks at the outermost brace depth for C-like
+languages) into chunks small enough to reach the LLM untrimmed. Every
+analyzer scores the chunks in parallel (map), then the results are merged
+into one file result (reduce): a size-weighted mean score and the chunks'
+concerns deduplicated. Chunks beyond the per-file token budget are skipped
+evenly across the file, so cost and latency stay bounded.
+"""
+import contextvars
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import aggregation, clustering, deadlines, tracing
+
+CHUNK_THRESHOLD = int(os.getenv("CHUNK_THRESHOLD", "10000"))  # Files above this many characters are analyzed in chunks
+CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", "6000"))  # Code tokens per analyzer and file (~4 chars per token)
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", "1"))  # Chunk analyses at once per file; each adds to the LLM request rate
+CHUNK_MAX_CHARS = 3800  # Below the analyzers' 4000-character trim, so each chunk is analyzed whole
+
+# Lines at the outermost depth that continue the previous unit instead of starting one
+CONTINUATION_PATTERN = re.compile(r"^(?:[\)\]\}]|else\b|elif\b|except\b|finally\b|catch\b)")
+# Decorators and comments belong to the definition that follows them
+PREFIX_PATTERN = re.compile(r"^(?:@|#(?!include|import|define)|//|/\*|\*)")
+
+
+def is_large(code):
+    return len(code) > CHUNK_THRESHOLD
+
+
+def _depths(lines, indented):
+    """Nesting depth at the start of each line: indentation for Python, open braces otherwise"""
+    depths = []
+    depth = 0
+    for line in lines:
+        if indented:
+            stripped = line.lstrip()
+            depths.append(len(line) - len(stripped) if stripped else None)
+        else:
+            depths.append(depth if line.strip() else None)
+            depth = max(0, depth + line.count("{") - line.count("}"))
+    return depths
+
+
+def _units(lines, indented):
+    """Split lines into units that start at the outermost depth: definitions, statements and their bodies"""
+    depths = _depths(lines, indented)
+    present = [depth for depth in depths if depth is not None]
+    if not present:
+        return [lines]
+    outer = min(present)
+    units, current, prefixed = [], [], False
+    for line, depth in zip(lines, depths):
+        stripped = line.strip()
+        if depth == outer and current and not prefixed and not CONTINUATION_PATTERN.match(stripped):
+            units.append(current)
+            current = []
+        current.append(line)
+        if depth == outer:
+            prefixed = bool(PREFIX_PATTERN.match(stripped))
+    units.append(current)
+    return units
+
+
+def _split(lines, indented, max_chars):
+    """Pieces of at most max_chars, cutting at definition boundaries where possible"""
+    if sum(len(line) + 1 for line in lines) <= max_chars:
+        return [lines]
+    units = _units(lines, indented)
+    if len(units) == 1:
+        # One definition too large to send whole: split its body at the next depth
+        header, body = lines[:1], lines[1:]
+        budget = max_chars - len(header[0]) - 1  # Room for the header on the first piece
+        inner = _units(body, indented) if body and budget > max_chars // 2 else []
+        if len(inner) > 1:
+            pieces = []
+            for unit in inner:
+                pieces.extend(_split(unit, indented, budget))
+            pieces[0] = header + pieces[0]
+            return pieces
+        return _split_lines(lines, max_chars)
+    pieces = []
+    for unit in units:
+        pieces.extend(_split(unit, indented, max_chars))
+    return pieces
+
+
+def _split_lines(lines, max_chars):
+    pieces, current, size = [], [], 0
+    for line in lines:
+        line = line[:max_chars - 1]
+        if current and size + len(line) + 1 > max_chars:
+            pieces.append(current)
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_chunks(code, file_path, max_chars=CHUNK_MAX_CHARS):
+    """Split source into chunks of whole definitions. Returns [(first line number, text)]."""
+    lines = code.split("\n")
+    indented = os.path.splitext(file_path)[1].lower() == ".py"
+    chunks, current, start, size, line_number = [], [], 1, 0, 1
+    for piece in _split(lines, indented, max_chars):
+        piece_size = sum(len(line) + 1 for line in piece)
+        if current and size + piece_size > max_chars:
+            chunks.append((start, "\n".join(current)))
+            current, start, size = [], line_number, 0
+        current.extend(piece)
+        size += piece_size
+        line_number += len(piece)
+    if current:
+        chunks.append((start, "\n".join(current)))
+    return [(first, text) for first, text in chunks if text.strip()]
+
+
+def within_budget(chunks, token_budget=CHUNK_TOKEN_BUDGET):
+    """Chunks to analyze: all of them when they fit the budget, otherwise an even spread across the file"""
+    total = sum(len(text) for _, text in chunks) // 4
+    if total <= token_budget or len(chunks) <= 1:
+        return chunks
+    keep = max(1, min(len(chunks), token_budget * 4 // CHUNK_MAX_CHARS))
+    if keep == 1:
+        return chunks[:1]
+    step = (len(chunks) - 1) / (keep - 1)
+    return [chunks[round(index * step)] for index in range(keep)]
+
+
+def reduce_results(results, weights):
+    """Merge one analyzer's chunk results into a file result"""
+    scored = [(result, weight) for result, weight in zip(results, weights) if isinstance(result, dict)]
+    score = aggregation.mean_score([result.get("score") for result, _ in scored], [weight for _, weight in scored])
+    if score == "N/A":
+        return {"score": "N/A", "concerns": ["Unable to analyze code"]}
+
+    concerns, seen, resources, seen_resources = [], set(), [], set()
+    clean = None
+    for result, _ in scored:
+        for concern in result.get("concerns", []):
+            if aggregation.NO_CONCERNS_PATTERN.match(str(concern)):
+                clean = clean or concern
+                continue
+            key = clustering.concern_key(concern)
+            if key and key not in seen and concern not in aggregation.IGNORED_CONCERNS:
+                seen.add(key)
+                concerns.append(concern)
+        for resource in result.get("resources", []):
+            key = resource.get("url") if isinstance(resource, dict) else resource
+            if key not in seen_resources:
+                seen_resources.add(key)
+                resources.append(resource)
+
+    concerns = clustering.distinct(concerns, aggregation.MAX_CONCERNS)
+    merged = {"score": str(round(score)), "concerns": concerns or ([clean] if clean else [])}
+    if resources:
+        merged["resources"] = resources[:3]
+    return merged
+
+
+def analyze(code, file_path, evaluators, workers=CHUNK_WORKERS):
+    """Map every (analyzer, chunk) pair onto a thread pool and reduce per analyzer.
+
+    evaluators is a sequence of (dimension, evaluate(code, file_path)). Returns
+    {dimension: result}. A chunk whose analysis raises is left out of the reduce.
+    """
+    chunks = split_chunks(code, file_path)
+    selected = within_budget(chunks)
+    print(f"Chunked analysis of {file_path}: {len(selected)} of {len(chunks)} chunks")
+    weights = [len(text) for _, text in selected]
+
+    def run(evaluate, text):
+        if deadlines.expired():
+            return None  # Left out of the reduce like a failed chunk
+        try:
+            return evaluate(text, file_path)
+        except Exception as e:
+            print(f"Error analyzing chunk of {file_path}: {e}")
+            return None
+
+    with tracing.span("chunked_analysis", file=file_path, chunks=len(chunks), analyzed=len(selected)), \
+            ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        # Each task runs in a copy of the caller's context so ledger charges and spans land on this request
+        futures = {dimension: [pool.submit(contextvars.copy_context().run, run, evaluate, text)
+                               for _, text in selected]
+                   for dimension, evaluate in evaluators}
+        return {dimension: reduce_results([future.result() for future in pending], weights)
+                for dimension, pending in futures.items()}
@@ -0,0 +1,168 @@
+"""
+Near-duplicate clustering of analyzer concerns.
+
+The analyzers phrase one problem many ways ("SQL injection via string
+formatting", "Possible SQL injection in query construction"), so exact-string
+deduplication lets paraphrases through. Concerns are vectorized locally with
+hashed TF-IDF: words are lightly stemmed, hashed into CONCERN_FEATURES buckets
+with a stable hash and weighted by how rare they are among the concerns being
+compared. A concern joins the cluster of the most frequent phrasing whose
+cosine similarity with it reaches CONCERN_SIMILARITY.
+
+Only cluster leaders are compared with the rest, through an inverted index
+from each word bucket to the concerns containing it: a leader is scored
+against every concern that shares any of its words, which is every concern
+with a non-zero similarity. NumPy, when installed, adds up each bucket's
+weights in one vectorized step; the pure-Python path does the same sums and
+returns the same clusters.
+"""
+import math
+import os
+import re
+import zlib
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+np = None  # NumPy when installed, imported on first use to keep it out of cold starts
+_numpy_loaded = False
+
+CONCERN_SIMILARITY = float(os.getenv("CONCERN_SIMILARITY", "0.5"))  # Cosine similarity at which two concerns are one
+CONCERN_FEATURES = 1 << 10  # Hashed vocabulary size
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+    a an and are as at be been being by can could do does for from has have if in into is it its may might
+    of on or possible possibly potential potentially should that the their there this to use used uses using
+    via was when where which while with within without would code
+    found issue issues lack lacks lacking missing no not problem problems
+""".split())
+
+
+def _numpy():
+    global np, _numpy_loaded
+    if not _numpy_loaded:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            pass
+        _numpy_loaded = True
+    return np
+
+
+def concern_key(concern):
+    """Case- and punctuation-insensitive form used for exact deduplication"""
+    return re.sub(r"[\W_]+", " ", str(concern).lower()).strip()
+
+
+@lru_cache(maxsize=65536)
+def _stem(word):
+    for suffix, replacement in (("ies", "y"), ("ing", ""), ("ed", ""), ("es", ""), ("s", "")):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)] + replacement
+    return word
+
+
+@lru_cache(maxsize=65536)
+def _bucket(word):
+    # crc32 rather than hash(): string hashes change between processes
+    return zlib.crc32(word.encode("utf-8")) % CONCERN_FEATURES
+
+
+def _features(text):
+    words = [_stem(word) for word in WORD_PATTERN.findall(str(text).lower())
+             if len(word) > 1 and word not in STOPWORDS]
+    return Counter(_bucket(word) for word in words)
+
+
+def vectorize(texts):
+    """Hashed TF-IDF vectors as {bucket: weight} dicts with unit length"""
+    features = [_features(text) for text in texts]
+    document_frequency = Counter(bucket for counts in features for bucket in counts)
+    total = len(texts)
+    vectors = []
+    for counts in features:
+        vector = {bucket: (1 + math.log(count)) * (math.log((1 + total) / (1 + document_frequency[bucket])) + 1)
+                  for bucket, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+        vectors.append({bucket: weight / norm for bucket, weight in vector.items()})
+    return vectors
+
+
+def _postings(vectors):
+    """Inverted index: bucket -> ([concern indices], [weights]) in index order"""
+    postings = defaultdict(lambda: ([], []))
+    for index, vector in enumerate(vectors):
+        for bucket, weight in vector.items():
+            indices, weights = postings[bucket]
+            indices.append(index)
+            weights.append(weight)
+    return postings
+
+
+def _numpy_neighbors(vectors, threshold):
+    """Indices similar to a concern: its word weights times each word's posting list, summed in place"""
+    postings = {bucket: (np.array(indices, dtype=np.intp), np.array(weights))
+                for bucket, (indices, weights) in _postings(vectors).items()}
+    scores = np.zeros(len(vectors))
+
+    def similar(index):
+        touched = []
+        for bucket, weight in vectors[index].items():
+            indices, weights = postings[bucket]
+            scores[indices] += weight * weights  # Indices are unique within one posting list
+            touched.append(indices)
+        candidates = np.concatenate(touched)
+        matches = np.unique(candidates[scores[candidates] >= threshold]).tolist()
+        scores[candidates] = 0.0
+        return matches
+    return similar
+
+
+def _sparse_neighbors(vectors, threshold):
+    """Indices similar to a concern, from the same posting lists without NumPy"""
+    postings = _postings(vectors)
+
+    def similar(index):
+        scores = defaultdict(float)
+        for bucket, weight in vectors[index].items():
+            indices, weights = postings[bucket]
+            for other, other_weight in zip(indices, weights):
+                scores[other] += weight * other_weight
+        return sorted(other for other, score in scores.items() if score >= threshold)
+    return similar
+
+
+def cluster(texts, counts=None, threshold=CONCERN_SIMILARITY):
+    """Group near-identical texts. Returns lists of indices, each led by its most frequent member.
+
+    Texts are taken in order of descending count (ties keep their order); each
+    one not yet grouped starts a cluster and pulls in every ungrouped text
+    similar to it, so clusters never chain through intermediate phrasings.
+    """
+    counts = counts or [1] * len(texts)
+    vectors = vectorize(texts)
+    similar = _numpy_neighbors(vectors, threshold) if _numpy() is not None else _sparse_neighbors(vectors, threshold)
+    grouped = [False] * len(texts)
+    clusters = []
+    for index in sorted(range(len(texts)), key=lambda index: -counts[index]):
+        if grouped[index]:
+            continue
+        grouped[index] = True
+        members = [index]
+        if vectors[index]:  # Texts made only of stopwords match nothing
+            for other in similar(index):
+                if not grouped[other]:
+                    grouped[other] = True
+                    members.append(other)
+        members[1:] = sorted(members[1:], key=lambda member: -counts[member])
+        clusters.append(members)
+    return clusters
+
+
+def distinct(texts, limit=None):
+    """The first phrasing of each group of near-identical texts, in their original order"""
+    if len(texts) < 2:
+        return list(texts[:limit] if limit else texts)
+    leaders = sorted(members[0] for members in cluster(texts))
+    return [texts[index] for index in leaders[:limit]]
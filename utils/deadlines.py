@@ -0,0 +1,98 @@
+"""
+Per-request deadlines with cooperative cancellation.
+
+A route opens scope(seconds) and every stage below it reads the same
+deadline from a context variable: listing stops paging, the crawl stops
+fetching files, LLM calls get the remaining time as their timeout and traced
+sleeps are cut short. Stages never get killed; they ask expired() or
+check() between units of work and hand back what they have, so the caller
+can return a partial result instead of blocking the worker. Worker threads
+started with contextvars.copy_context() see the same deadline. Work outside
+any scope (batches, the CLI) has no deadline.
+"""
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+REPO_DETAILS_DEADLINE = float(os.getenv("REPO_DETAILS_DEADLINE", "45"))  # Seconds before the repository page answers
+LLM_MIN_SECONDS = 1.0  # An LLM call with less time left than this is not started
+
+_deadline = contextvars.ContextVar("gitgud_deadline", default=None)
+
+
+class Deadline:
+    __slots__ = ("at", "parent", "cut")
+
+    def __init__(self, at, parent):
+        self.at = at
+        self.parent = parent
+        self.cut = False  # Some stage under this deadline was skipped or stopped early
+
+    def mark_cut(self):
+        deadline = self
+        while deadline is not None:
+            deadline.cut = True
+            deadline = deadline.parent
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before this stage could run"""
+
+    def __init__(self, stage):
+        self.stage = stage
+        super().__init__(f"Deadline exceeded before {stage}")
+
+
+@contextmanager
+def scope(seconds):
+    """Give the enclosed work `seconds` to finish; an enclosing deadline that is sooner still wins"""
+    current = _deadline.get()
+    at = time.monotonic() + seconds
+    token = _deadline.set(Deadline(at if current is None else min(current.at, at), current))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Seconds left, or None without a deadline"""
+    deadline = _deadline.get()
+    return None if deadline is None else max(0.0, deadline.at - time.monotonic())
+
+
+def expired():
+    """True once the deadline passed; the caller is expected to stop, so the work counts as cut short"""
+    deadline = _deadline.get()
+    if deadline is None or time.monotonic() < deadline.at:
+        return False
+    deadline.mark_cut()
+    return True
+
+
+def cut_short():
+    """Whether any stage under the current deadline was skipped or stopped early"""
+    deadline = _deadline.get()
+    return deadline is not None and deadline.cut
+
+
+def mark_cut():
+    """Record that a stage under the current deadline stopped early, e.g. when a capped timeout fired"""
+    deadline = _deadline.get()
+    if deadline is not None:
+        deadline.mark_cut()
+
+
+def check(stage, needed=0.0):
+    """Raise DeadlineExceeded when less than `needed` seconds are left for `stage`"""
+    deadline = _deadline.get()
+    if deadline is not None and deadline.at - time.monotonic() <= needed:
+        deadline.mark_cut()
+        raise DeadlineExceeded(stage)
+
+
+def cap(seconds):
+    """A timeout or wait shortened to the time left"""
+    left = remaining()
+    return seconds if left is None else min(seconds, left)
@@ -1,14 +1,6 @@
-from openai import OpenAI
-from dotenv import load_dotenv
-import os
-import json
 import random
-import time
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-
-# LOAD API KEYS
-load_dotenv()
-APIKEY = os.getenv("OPENAI_API_KEY")
+from utils.metrics import timed
+from utils.tracing import traced, retry_sleep, sleep as traced_sleep
 
 # Updated to randomly select 3 resources from a larger list
 EFFICIENCY_RESOURCES = {
@@ -101,20 +93,14 @@ def trim_code_for_analysis(code, file_path):
 class RateLimitError(Exception):
     pass
 
+@timed("evaluate_efficiency")
+@traced("evaluate_efficiency")
 def evaluate_efficiency(code: str, file_path: str = "") -> dict:
     """
     Analyze the efficiency of the given code using OpenAI.
     Returns a dict with score and efficiency concerns.
     Implements rate limiting and retry logic.
     """
-    client = OpenAI(
-        api_key=APIKEY,
-    )
-
-    # Import necessary modules
-    import threading
-    import time
-    from concurrent.futures import ThreadPoolExecutor
 
     # Special case handling for specific users
     # Ensure file_path is a string before using .lower()
@@ -149,15 +135,22 @@ def evaluate_efficiency(code: str, file_path: str = "") -> dict:
     # Trim code to reduce token usage - enforce strict limits
     trimmed_code = trim_code_for_analysis(code, file_path)
     
+    # The LLM client, tenacity and pydantic load on the first analysis, not at import time
+    from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+    from utils.llm import request_analysis, LLM_CALL_DELAY
+    from utils.structured import SchemaViolation
+    
     # Add retry logic using tenacity
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=2, min=4, max=60),  # Longer waits between retries
-        retry=retry_if_exception_type((RateLimitError))
+        retry=retry_if_exception_type((RateLimitError)),
+        sleep=retry_sleep  # Retry waits show up in traces
     )
+    @traced("efficiency_attempt")
     def call_api_with_retry():
         # Rate limiting - Add longer delay between calls (at least 4 seconds)
-        time.sleep(4)
+        traced_sleep(LLM_CALL_DELAY, "llm_call_delay")
         
         try:
             # Create an extremely minimal prompt to reduce tokens
@@ -182,24 +175,12 @@ def evaluate_efficiency(code: str, file_path: str = "") -> dict:
                 
                 {trimmed_code_reduced}"""
             
-            # Use streaming to reduce memory usage and get faster response
-            completion = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.6,
-                max_tokens=250,  # Further reduced for token efficiency
-                stream=True  # Use streaming
-            )
-            
-            # Collect streaming response
-            content = ""
-            for chunk in completion:
-                if chunk.choices and chunk.choices[0].delta.content:
-                    content += chunk.choices[0].delta.content
-            return content
+            # Schema-constrained request, validated into an AnalysisResult
+            return request_analysis(prompt, analyzer="efficiency")
             
+        except SchemaViolation as e:
+            print(f"Invalid efficiency analysis response: {e}")
+            return None
         except Exception as e:
             error_msg = str(e)
             print(f"API call error: {error_msg}")
@@ -207,77 +188,34 @@ def evaluate_efficiency(code: str, file_path: str = "") -> dict:
             # Handle rate limit errors with longer timeout
             if "rate_limit" in error_msg.lower() or "429" in error_msg:
                 print(f"Rate limit exceeded. Waiting 2 seconds before retry...")
-                time.sleep(2)  # Wait a full minute before retry
+                traced_sleep(2, "rate_limit")
                 raise RateLimitError("Rate limit exceeded")
-                
-            # Handle other errors with fallback
-            generic_concerns = [
-                "Consider optimizing loop structures to reduce time complexity",
-                "Review data structure choices for better efficiency"
-            ]
-            selected_concerns = random.sample(generic_concerns, 1)
-            return json.dumps({
-                "score": random.randint(50, 80),
-                "concerns": selected_concerns
-            })
+            return None
 
     try:
         # Execute with retry logic and increased timeouts
-        response = call_api_with_retry()
+        analysis = call_api_with_retry()
         
-        if not response:
-            # Fallback if no response
-            random_score = random.randint(50, 80)
-            generic_concerns = [
-                "Consider optimizing loop structures to reduce time complexity",
-                "Review data structure choices for better efficiency"
-            ]
-            selected_concerns = random.sample(generic_concerns, 1)
-            result = {"score": str(random_score), "concerns": selected_concerns}
-            result["resources"] = get_efficiency_resources(selected_concerns)
+        if analysis is None:
+            # Report the failure instead of guessing a score
+            result = {"score": "N/A", "concerns": ["Unable to analyze code"]}
+            result["resources"] = get_efficiency_resources([])
             return result
         
-        # Process response
-        import re
-        
-        # Try to extract JSON from the response
-        json_match = re.search(r'({[\s\S]*})', response)
-        if json_match:
-            json_str = json_match.group(1)
-            try:
-                result = json.loads(json_str)
-                # Ensure score is a string
-                result["score"] = str(result.get("score", 60))
-                # Ensure "No concerns" always gets 100
-                if not result.get("concerns") or len(result.get("concerns", [])) == 0:
-                    result["score"] = "100"
-                    result["concerns"] = ["No efficiency concerns detected"]
-                # Add relevant resources
-                result["resources"] = get_efficiency_resources(result.get("concerns", []))
-                return result
-            except json.JSONDecodeError:
-                pass
-        
-        # If JSON parsing fails, provide fallback
-        random_score = random.randint(50, 80)
-        generic_concerns = [
-            "Review algorithms for potential optimizations",
-            "Consider more efficient data structures"
-        ]
-        result = {"score": str(random_score), "concerns": generic_concerns}
-        result["resources"] = get_efficiency_resources(generic_concerns)
+        result = {"score": str(analysis.score), "concerns": analysis.concerns}
+        # Ensure "No concerns" always gets 100
+        if not result["concerns"]:
+            result["score"] = "100"
+            result["concerns"] = ["No efficiency concerns detected"]
+        # Add relevant resources
+        result["resources"] = get_efficiency_resources(result["concerns"])
         return result
     
     except Exception as e:
         print(f"Error analyzing efficiency: {e}")
         # Fallback response
-        random_score = random.randint(50, 80)
-        generic_concerns = [
-            "Consider optimizing algorithm complexity",
-            "Evaluate data structure choices for better performance"
-        ]
-        result = {"score": str(random_score), "concerns": generic_concerns}
-        result["resources"] = get_efficiency_resources(generic_concerns)
+        result = {"score": "N/A", "concerns": ["Unable to analyze code"]}
+        result["resources"] = get_efficiency_resources([])
         return result
 
 if __name__ == "__main__":
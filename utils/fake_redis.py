@@ -0,0 +1,157 @@
+"""
+Local stand-in for a Redis server.
+
+Speaks enough of the Redis protocol (RESP) for utils.cache_backends: PING,
+AUTH, SELECT, GET, SET, MGET, DEL, EXISTS, FLUSHDB, WATCH, UNWATCH, MULTI,
+EXEC and DISCARD, with optimistic WATCH semantics. Used to test the shared
+cache without installing Redis.
+
+Usage:
+    python -m utils.fake_redis --port 6379
+    CACHE_BACKEND=redis://127.0.0.1:6379/0 python main.py
+"""
+import argparse
+import socketserver
+import threading
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__((host, port), FakeRedisHandler)
+        self.lock = threading.Lock()
+        self.data = {}
+        self.versions = {}  # key -> write counter, checked by EXEC for WATCHed keys
+        self.commands = 0
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def write(self, key, value):
+        self.versions[key] = self.versions.get(key, 0) + 1
+        if value is None:
+            self.data.pop(key, None)
+        else:
+            self.data[key] = value
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.watched = {}  # key -> version seen at WATCH
+        self.queued = None  # Commands queued after MULTI
+
+    def handle(self):
+        while True:
+            try:
+                args = self.read_command()
+            except (ConnectionError, ValueError):
+                return
+            if args is None:
+                return
+            self.wfile.write(self.dispatch(args))
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.strip().split()  # Inline command, e.g. from telnet
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def dispatch(self, args):
+        name = args[0].upper().decode()
+        server = self.server
+        server.commands += 1
+        if self.queued is not None and name not in ("EXEC", "DISCARD", "MULTI", "WATCH"):
+            self.queued.append(args)
+            return b"+QUEUED\r\n"
+        if name == "MULTI":
+            self.queued = []
+            return b"+OK\r\n"
+        if name == "DISCARD":
+            self.queued, self.watched = None, {}
+            return b"+OK\r\n"
+        if name == "WATCH":
+            with server.lock:
+                for key in args[1:]:
+                    self.watched[key] = server.versions.get(key, 0)
+            return b"+OK\r\n"
+        if name == "UNWATCH":
+            self.watched = {}
+            return b"+OK\r\n"
+        if name == "EXEC":
+            if self.queued is None:
+                return b"-ERR EXEC without MULTI\r\n"
+            queued, watched = self.queued, self.watched
+            self.queued, self.watched = None, {}
+            with server.lock:
+                if any(server.versions.get(key, 0) != version for key, version in watched.items()):
+                    return b"*-1\r\n"
+                replies = [self.execute(command[0].upper().decode(), command[1:]) for command in queued]
+            return b"*%d\r\n" % len(replies) + b"".join(replies)
+        with server.lock:
+            return self.execute(name, args[1:])
+
+    def execute(self, name, args):
+        """Run one data command; the caller holds the server lock"""
+        server = self.server
+        if name == "PING":
+            return b"+PONG\r\n"
+        if name in ("AUTH", "SELECT"):
+            return b"+OK\r\n"
+        if name == "GET":
+            return bulk(server.data.get(args[0]))
+        if name == "MGET":
+            return b"*%d\r\n" % len(args) + b"".join(bulk(server.data.get(key)) for key in args)
+        if name == "SET":
+            server.write(args[0], args[1])
+            return b"+OK\r\n"
+        if name == "DEL":
+            removed = [key for key in args if key in server.data]
+            for key in removed:
+                server.write(key, None)
+            return b":%d\r\n" % len(removed)
+        if name == "EXISTS":
+            return b":%d\r\n" % sum(1 for key in args if key in server.data)
+        if name == "FLUSHDB":
+            for key in list(server.data):
+                server.write(key, None)
+            return b"+OK\r\n"
+        return b"-ERR unknown command '%s'\r\n" % name.encode()
+
+
+def bulk(value):
+    return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Redis protocol stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+    server = FakeRedisServer(args.host, args.port)
+    print(f"Serving {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Rate-limit aware access to the GitHub API across a pool of tokens.
+
+Every GitHub response carries X-RateLimit-Remaining and X-RateLimit-Reset for
+the token that made it. The pool records both per token (GITHUB_TOKENS, or the
+single ACCESS_TOKEN) and hands out the client of the token with the most
+requests left. Work runs at one of two priorities: interactive requests may
+spend a token down to zero, bulk work (batches, deferred reports, prefetching
+and the CLI) stops at GITHUB_BULK_RESERVE so it backs off before interactive
+requests starve. When no token can serve a request the job is parked until the
+earliest reset instead of failing. Interactive requests stop waiting after
+GITHUB_INTERACTIVE_WAIT seconds and raise RateLimitExhausted, which carries
+the reset time.
+"""
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from utils import deadlines, metrics, tracing
+
+GITHUB_TOKENS = [token.strip() for token in os.getenv("GITHUB_TOKENS", os.getenv("ACCESS_TOKEN") or "").split(",")
+                 if token.strip()]  # Comma-separated pool; ACCESS_TOKEN alone when unset
+GITHUB_BULK_RESERVE = int(os.getenv("GITHUB_BULK_RESERVE", "500"))  # Requests per token kept for interactive work
+GITHUB_INTERACTIVE_WAIT = float(os.getenv("GITHUB_INTERACTIVE_WAIT", "20"))  # Seconds a page waits for a reset
+GITHUB_BULK_WAIT = float(os.getenv("GITHUB_BULK_WAIT", "3900"))  # Seconds bulk work stays parked (one window plus margin)
+GITHUB_RATE_LIMIT_RETRIES = 3  # Attempts per job when GitHub answers with a rate-limit error
+UNKNOWN_RESET = 60  # Seconds to wait when a token ran out without reporting its reset time
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+_priority = contextvars.ContextVar("gitgud_github_priority", default=None)
+_default_priority = INTERACTIVE
+
+
+class RateLimitExhausted(Exception):
+    """Every token is out of requests and the caller cannot wait for the reset"""
+
+    def __init__(self, reset_at):
+        self.reset_at = reset_at
+        when = time.strftime('%H:%M UTC', time.gmtime(reset_at))
+        super().__init__(f"GitHub API rate limit reached. Try again after {when}.")
+
+
+def is_rate_limit(error):
+    """True for errors that mean a token ran out of requests, not that the request was wrong"""
+    if isinstance(error, RateLimitExhausted) or type(error).__name__ == "RateLimitExceededException":
+        return True
+    return getattr(error, "status", None) in (403, 429) and "rate limit" in str(error).lower()
+
+
+def set_default_priority(priority):
+    """Priority of work that does not set one, e.g. BULK in CLI worker processes"""
+    global _default_priority
+    _default_priority = priority
+
+
+def current_priority():
+    return _priority.get() or _default_priority
+
+
+@contextmanager
+def priority(level):
+    """Run the enclosed GitHub calls at INTERACTIVE or BULK priority"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def bulk_work(func):
+    """Decorator running a function's GitHub calls at BULK priority"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with priority(BULK):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class TokenState:
+    __slots__ = ("label", "token", "client", "remaining", "limit", "reset")
+
+    def __init__(self, label, token):
+        self.label = label
+        self.token = token
+        self.client = None
+        self.remaining = None  # Unknown until the first response
+        self.limit = None
+        self.reset = None
+
+    def left(self, now):
+        """Requests left, None when unknown or the window has reset since the last response"""
+        if self.reset is not None and now >= self.reset:
+            return None
+        return self.remaining
+
+
+class TokenPool:
+    """Clients for a set of tokens; make_client(token) builds one when it is first needed"""
+
+    def __init__(self, tokens, make_client):
+        # Without tokens the pool holds one anonymous client
+        self.states = [TokenState(str(index), token) for index, token in enumerate(tokens or [None])]
+        self.make_client = make_client
+        self.condition = threading.Condition()
+        self.parked = 0
+
+    def observe(self, authorization, headers):
+        """Record a response's rate-limit headers for the token that made the request"""
+        remaining = headers.get("x-ratelimit-remaining")
+        if remaining is None:
+            return
+        token = authorization.split()[-1] if authorization else None
+        with self.condition:
+            state = next((state for state in self.states if state.token == token), None)
+            if state is None:
+                return
+            state.remaining = int(float(remaining))
+            state.limit = int(float(headers.get("x-ratelimit-limit") or state.limit or 0)) or None
+            reset = headers.get("x-ratelimit-reset")
+            state.reset = float(reset) if reset else state.reset
+            self.condition.notify_all()
+        metrics.GITHUB_TOKEN_REMAINING.set(state.remaining, token=state.label)
+
+    def _floor(self, level):
+        return GITHUB_BULK_RESERVE if level == BULK else 0
+
+    def _best(self, level, now):
+        """Token with the most requests left above the priority's floor, unknown budgets first"""
+        floor = self._floor(level)
+        usable = [state for state in self.states if state.left(now) is None or state.left(now) > floor]
+        if not usable:
+            return None
+        return max(usable, key=lambda state: float("inf") if state.left(now) is None else state.left(now))
+
+    def _next_reset(self, now):
+        return min(state.reset if state.reset and state.reset > now else now + UNKNOWN_RESET
+                   for state in self.states)
+
+    def available(self, level=BULK):
+        """Whether work at this priority could start now without parking"""
+        with self.condition:
+            return self._best(level, time.time()) is not None
+
+    def client(self, level=None):
+        """Client of the token with the most budget; parks until a reset when none has any left"""
+        level = level or current_priority()
+        deadline = time.time() + deadlines.cap(GITHUB_BULK_WAIT if level == BULK else GITHUB_INTERACTIVE_WAIT)
+        with self.condition:
+            state = self._best(level, time.time())
+            if state is None:
+                with tracing.span("github_park", priority=level):
+                    self.parked += 1
+                    try:
+                        while state is None:
+                            now = time.time()
+                            reset = self._next_reset(now)
+                            if now >= deadline or reset > deadline:
+                                raise RateLimitExhausted(reset)
+                            print(f"GitHub budget exhausted for {level} work, parked until "
+                                  f"{time.strftime('%H:%M:%S UTC', time.gmtime(reset))}")
+                            self.condition.wait(reset - now + 1)
+                            state = self._best(level, time.time())
+                    finally:
+                        self.parked -= 1
+            if state.client is None:
+                state.client = self.make_client(state.token)
+            return state.client
+
+    def run(self, job):
+        """Run job(), which fetches its client from the pool, again after a rate-limit error.
+
+        The failed response already marked its token as spent, so the retry
+        rotates to another token or parks until the reset.
+        """
+        for attempt in range(1, GITHUB_RATE_LIMIT_RETRIES + 1):
+            try:
+                return job()
+            except Exception as e:
+                if isinstance(e, RateLimitExhausted) or not is_rate_limit(e):
+                    raise
+                if attempt == GITHUB_RATE_LIMIT_RETRIES:
+                    with self.condition:
+                        reset = self._next_reset(time.time())
+                    raise RateLimitExhausted(reset) from e
+                print(f"GitHub rate limit hit ({e}), retrying with another token")
+                tracing.sleep(attempt, "github_rate_limit")  # Secondary limits report no budget to rotate on
+
+    def budget(self):
+        """Per-token budget and parked jobs for the scheduler and /debug pages"""
+        now = time.time()
+        with self.condition:
+            tokens = [{"token": state.label, "remaining": state.left(now), "limit": state.limit,
+                       "reset_at": state.reset} for state in self.states]
+            return {"tokens": tokens, "parked": self.parked,
+                    "interactive_available": self._best(INTERACTIVE, now) is not None,
+                    "bulk_available": self._best(BULK, now) is not None}
@@ -0,0 +1,239 @@
+"""
+Per-user usage ledger and quota-based admission control.
+
+Every analysis run opens a ledger scope for the GitHub username and client IP
+(and a nested scope per repository). LLM tokens, GitHub calls, analyzed files
+and wall time recorded while the scope is active are charged to each of those
+keys for the current quota window. Before expensive work starts, admit()
+checks the estimated cost against the configured quotas and either allows
+it, downgrades it to fewer files, defers it to off-peak hours or rejects it.
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+LEDGER_WINDOW = int(os.getenv("LEDGER_WINDOW", "86400"))  # Seconds per quota window
+USER_TOKEN_QUOTA = int(os.getenv("USER_TOKEN_QUOTA", "0"))  # LLM tokens per username per window, 0 = unlimited
+IP_TOKEN_QUOTA = int(os.getenv("IP_TOKEN_QUOTA", "0"))  # LLM tokens per client IP per window, 0 = unlimited
+QUOTA_EXCEEDED_ACTION = os.getenv("QUOTA_EXCEEDED_ACTION", "reject")  # 'reject' or 'defer'
+OFF_PEAK_HOURS = os.getenv("OFF_PEAK_HOURS", "1-6")  # UTC hours, start inclusive and end exclusive
+OFF_PEAK_QUOTA_MULTIPLIER = float(os.getenv("OFF_PEAK_QUOTA_MULTIPLIER", "2"))
+TOKENS_PER_FILE_ESTIMATE = int(os.getenv("TOKENS_PER_FILE_ESTIMATE", "3000"))  # Used until enough files are observed
+MIN_OBSERVED_FILES = 20  # Files analyzed before the observed tokens-per-file replaces the estimate
+LEDGER_MAX_KEYS = 10000  # Past this many keys, stale entries and then the least-used keys are dropped
+LEDGER_EVICT_FRACTION = 0.1  # Share of the keys dropped at once when the current window alone fills the ledger
+
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "github_calls", "files", "wall_time")
+
+
+class Usage:
+    __slots__ = USAGE_FIELDS + ("started",)
+
+    def __init__(self):
+        for field in USAGE_FIELDS:
+            setattr(self, field, 0)
+        self.started = None  # perf_counter start while a run is still in progress
+
+    def add(self, amounts):
+        for field, amount in amounts.items():
+            setattr(self, field, getattr(self, field) + amount)
+
+    @property
+    def tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+    def as_dict(self):
+        usage = {field: getattr(self, field) for field in USAGE_FIELDS}
+        running = time.perf_counter() - self.started if self.started is not None else 0
+        usage["wall_time"] = round(self.wall_time + running, 2)
+        usage["tokens"] = self.tokens
+        return usage
+
+
+class Admission:
+    """Result of an admission check. action is allow, downgrade, defer or reject."""
+    __slots__ = ("action", "max_files", "reason", "retry_at")
+
+    def __init__(self, action, max_files, reason="", retry_at=None):
+        self.action = action
+        self.max_files = max_files
+        self.reason = reason
+        self.retry_at = retry_at
+
+    @property
+    def allowed(self):
+        return self.action in ("allow", "downgrade")
+
+
+class _Scope:
+    __slots__ = ("keys", "runs")
+
+    def __init__(self, keys, runs):
+        self.keys = keys
+        self.runs = runs
+
+
+_current_scope = contextvars.ContextVar("gitgud_ledger_scope", default=None)
+_lock = threading.Lock()
+_entries = {}  # (kind, name) -> [window index, Usage]
+_totals = Usage()
+
+
+def _window(now=None):
+    return int((now or time.time()) // LEDGER_WINDOW)
+
+
+def _entry(key, window):
+    entry = _entries.get(key)
+    if entry is None or entry[0] != window:
+        if entry is None and len(_entries) >= LEDGER_MAX_KEYS:
+            _evict(window)
+        entry = _entries[key] = [window, Usage()]
+    return entry[1]
+
+
+def _evict(window):
+    """Drop entries of past windows, then the least-used keys of this one if it still fills the ledger"""
+    for stale in [k for k, e in _entries.items() if e[0] != window]:
+        del _entries[stale]
+    if len(_entries) < LEDGER_MAX_KEYS:
+        return
+    count = max(len(_entries) - LEDGER_MAX_KEYS + 1, int(LEDGER_MAX_KEYS * LEDGER_EVICT_FRACTION))
+    # sorted() is stable, so among equally used keys the oldest go first
+    least_used = sorted(_entries, key=lambda k: (_entries[k][1].tokens, _entries[k][1].github_calls))
+    for key in least_used[:count]:
+        del _entries[key]
+
+
+def _scope_keys(username=None, ip=None, repo=None):
+    return [key for key in (("user", username), ("ip", ip), ("repo", repo)) if key[1]]
+
+
+@contextmanager
+def scope(username=None, ip=None, repo=None):
+    """Charge usage recorded inside the block to these keys. Yields the run's Usage."""
+    parent = _current_scope.get()
+    inherited = parent.keys if parent else []
+    own_keys = [key for key in _scope_keys(username, ip, repo) if key not in inherited]
+    run = Usage()
+    start = run.started = time.perf_counter()
+    current = _Scope(inherited + own_keys, (parent.runs if parent else ()) + (run,))
+    token = _current_scope.set(current)
+    try:
+        yield run
+    finally:
+        _current_scope.reset(token)
+        elapsed = time.perf_counter() - start
+        window = _window()
+        with _lock:
+            run.wall_time += elapsed
+            run.started = None
+            if parent is None:
+                _totals.wall_time += elapsed
+            for key in own_keys:
+                _entry(key, window).wall_time += elapsed
+
+
+def charge(**amounts):
+    """Add usage (prompt_tokens, completion_tokens, github_calls, files) to the active scope"""
+    current = _current_scope.get()
+    with _lock:
+        _totals.add(amounts)
+        if current is None:
+            return
+        window = _window()
+        for key in current.keys:
+            _entry(key, window).add(amounts)
+        # Chunk and cascade threads charge the same run concurrently
+        for run in current.runs:
+            run.add(amounts)
+
+
+def usage(kind, name):
+    """Usage for one key in the current quota window"""
+    with _lock:
+        entry = _entries.get((kind, name))
+        if entry is None or entry[0] != _window():
+            return Usage()
+        return entry[1]
+
+
+def tokens_per_file():
+    """Observed LLM tokens per analyzed file, or the configured estimate"""
+    with _lock:
+        if _totals.files >= MIN_OBSERVED_FILES:
+            return max(1, _totals.tokens // _totals.files)
+    return TOKENS_PER_FILE_ESTIMATE
+
+
+def is_off_peak(now=None):
+    start, _, end = OFF_PEAK_HOURS.partition("-")
+    hour = time.gmtime(now or time.time()).tm_hour
+    start, end = int(start), int(end)
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+
+def next_off_peak(now=None):
+    """Unix time of the next off-peak window start"""
+    now = now or time.time()
+    start_hour = int(OFF_PEAK_HOURS.partition("-")[0])
+    day_start = now - now % 86400
+    candidate = day_start + start_hour * 3600
+    return candidate if candidate > now else candidate + 86400
+
+
+def quota(kind, now=None):
+    base = {"user": USER_TOKEN_QUOTA, "ip": IP_TOKEN_QUOTA}.get(kind, 0)
+    return int(base * OFF_PEAK_QUOTA_MULTIPLIER) if base and is_off_peak(now) else base
+
+
+def remaining_tokens(username=None, ip=None):
+    """Tokens left in the tightest applicable quota, or None when unlimited"""
+    remaining = None
+    for kind, name in _scope_keys(username, ip):
+        limit = quota(kind)
+        if limit:
+            left = max(0, limit - usage(kind, name).tokens)
+            remaining = left if remaining is None else min(remaining, left)
+    return remaining
+
+
+def admit(username, ip, repos, max_files):
+    """Decide whether analyzing `repos` repositories of `max_files` files each fits the quotas"""
+    remaining = remaining_tokens(username, ip)
+    if remaining is None or repos <= 0:
+        return Admission("allow", max_files)
+
+    affordable = remaining // (tokens_per_file() * repos)
+    if affordable >= max_files:
+        return Admission("allow", max_files)
+    if affordable >= 1:
+        return Admission("downgrade", int(affordable),
+                         f"Quota nearly used: analyzing {int(affordable)} files per repository instead of {max_files}")
+
+    window_end = (_window() + 1) * LEDGER_WINDOW
+    if QUOTA_EXCEEDED_ACTION == "defer" and not is_off_peak():
+        retry_at = next_off_peak()
+        return Admission("defer", 0, "Analysis quota used up; this run has been scheduled for off-peak hours",
+                         min(retry_at, window_end))
+    return Admission("reject", 0, "Analysis quota used up until the quota window resets", window_end)
+
+
+def budget(username, run=None):
+    """Summary shown on report pages"""
+    summary = {"run": run.as_dict() if run else None,
+               "window": usage("user", username).as_dict(),
+               "quota": quota("user") or None}
+    if summary["quota"]:
+        summary["percent"] = round(100 * summary["window"]["tokens"] / summary["quota"], 1)
+    return summary
+
+
+def snapshot():
+    with _lock:
+        window = _window()
+        entries = {f"{kind}:{name}": entry[1].as_dict()
+                   for (kind, name), entry in _entries.items() if entry[0] == window}
+        return {"window_seconds": LEDGER_WINDOW, "totals": _totals.as_dict(), "entries": entries}
@@ -0,0 +1,228 @@
+import contextvars
+import os
+import threading
+from contextlib import contextmanager
+from utils import deadlines, ledger
+from utils.metrics import HTTPX_EVENT_HOOKS, record_tokens
+from utils.structured import (
+    ANALYSIS_SCHEMA, CONFIDENT_ANALYSIS_SCHEMA, CONFIDENT_PACKED_SCHEMA, PACKED_SCHEMA, IncrementalJSONObject,
+    SchemaViolation, parse_analysis, parse_packed, response_format
+)
+
+# API keys; main.py loads .env before anything imports this module
+APIKEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # None means the public OpenAI endpoint
+
+# Model selection - every analyzer goes through these
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o")
+LLM_SMALL_MODEL = os.getenv("LLM_SMALL_MODEL", "gpt-4o-mini")  # Cheap first tier of the cascade, empty disables it
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.6"))
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "250"))
+LLM_SCHEMA_RETRIES = 1  # Extra attempts when a response fails validation
+
+# Connection pool shared by every analyzer in the process
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "120"))  # Seconds an idle connection is kept
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "0") == "1"  # Needs the optional 'h2' package
+
+# Timeouts in seconds
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+LLM_WRITE_TIMEOUT = float(os.getenv("LLM_WRITE_TIMEOUT", "10"))
+LLM_POOL_TIMEOUT = float(os.getenv("LLM_POOL_TIMEOUT", "30"))
+
+# Delay before every call to stay under the OpenAI rate limit
+LLM_CALL_DELAY = float(os.getenv("LLM_CALL_DELAY", "4"))
+
+_client = None
+_client_lock = threading.Lock()
+_attempt = contextvars.ContextVar("gitgud_llm_attempt", default=None)
+
+
+class Attempt:
+    """Model tier for the analyzer calls made inside use_model(), and what they reported"""
+    __slots__ = ("model", "confident", "calls", "confidence")
+
+    def __init__(self, model, confident):
+        self.model = model
+        self.confident = confident
+        self.calls = 0
+        self.confidence = None  # Lowest confidence reported by the calls
+
+
+@contextmanager
+def use_model(model=None, confident=False):
+    """Route analyzer calls in the block to `model` (None = LLM_MODEL), asking for confidence when `confident`"""
+    attempt = Attempt(model, confident)
+    token = _attempt.set(attempt)
+    try:
+        yield attempt
+    finally:
+        _attempt.reset(token)
+
+
+def _record_call():
+    """Count a request before it is sent, so a call that errors out still counts as made"""
+    attempt = _attempt.get()
+    if attempt is not None:
+        attempt.calls += 1
+
+
+def _record_confidence(confidence):
+    attempt = _attempt.get()
+    if attempt is not None and confidence is not None:
+        attempt.confidence = confidence if attempt.confidence is None else min(attempt.confidence, confidence)
+
+
+def http2_enabled():
+    """HTTP/2 is only used when requested and the 'h2' package is installed"""
+    if not LLM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        print("LLM_HTTP2 is set but the 'h2' package is not installed, using HTTP/1.1")
+        return False
+
+
+def http_timeout():
+    """Per-phase timeouts, each shortened to the time left before the request's deadline"""
+    import httpx
+    return httpx.Timeout(
+        connect=deadlines.cap(LLM_CONNECT_TIMEOUT),
+        read=deadlines.cap(LLM_READ_TIMEOUT),
+        write=deadlines.cap(LLM_WRITE_TIMEOUT),
+        pool=deadlines.cap(LLM_POOL_TIMEOUT),
+    )
+
+
+def build_http_client():
+    """Create the keep-alive HTTP pool used by the OpenAI client"""
+    import httpx
+    return httpx.Client(
+        http2=http2_enabled(),
+        event_hooks=HTTPX_EVENT_HOOKS,
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            connect=LLM_CONNECT_TIMEOUT,
+            read=LLM_READ_TIMEOUT,
+            write=LLM_WRITE_TIMEOUT,
+            pool=LLM_POOL_TIMEOUT,
+        ),
+    )
+
+
+def get_client():
+    """Return the process-wide OpenAI client, creating it on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI  # Imported here: the SDK dominates cold-start time
+                _client = OpenAI(
+                    api_key=APIKEY,
+                    base_url=OPENAI_BASE_URL,
+                    http_client=build_http_client(),
+                    max_retries=0,  # Analyzers handle retries themselves
+                )
+    return _client
+
+
+def close_client():
+    """Close the shared client and its connection pool"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def stream_json_object(prompt, max_tokens=LLM_MAX_TOKENS, model=None, schema=ANALYSIS_SCHEMA,
+                       schema_name="code_analysis"):
+    """Stream a schema-constrained response and return the JSON object text.
+
+    Reading stops as soon as the top-level object closes; the stream is closed so
+    no further output tokens are waited for. Under a request deadline the call
+    is not started without LLM_MIN_SECONDS left, and is abandoned when the
+    deadline passes mid-stream. A call that fails at the deadline, typically
+    its capped timeout firing, marks the deadline as cut.
+    """
+    deadlines.check("llm_call", deadlines.LLM_MIN_SECONDS)
+    try:
+        completion = get_client().chat.completions.create(
+            model=model or LLM_MODEL,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            temperature=LLM_TEMPERATURE,
+            max_tokens=max_tokens,
+            response_format=response_format(name=schema_name, schema=schema),
+            stream=True,  # Use streaming
+            timeout=http_timeout()
+        )
+
+        parser = IncrementalJSONObject()
+        try:
+            for chunk in completion:
+                deadlines.check("llm_stream")
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if parser.feed(chunk.choices[0].delta.content):
+                        break
+        finally:
+            completion.close()
+    except Exception:
+        left = deadlines.remaining()
+        if left is not None and left < deadlines.LLM_MIN_SECONDS:
+            deadlines.mark_cut()  # Timeouts are capped to the deadline, so it was the deadline that stopped this call
+        raise
+    return parser.text
+
+
+def request_analysis(prompt, analyzer="analysis", max_tokens=LLM_MAX_TOKENS, model=None):
+    """Request a validated AnalysisResult, retrying only on schema violations"""
+    tier = _attempt.get()
+    schema = CONFIDENT_ANALYSIS_SCHEMA if tier is not None and tier.confident else ANALYSIS_SCHEMA
+    model = model or (tier.model if tier is not None else None)
+    for attempt in range(LLM_SCHEMA_RETRIES + 1):
+        try:
+            _record_call()
+            text = stream_json_object(prompt, max_tokens, model, schema=schema)
+            # Rough estimate (4 chars ~= 1 token); usage is not sent before the stream is cut
+            prompt_tokens, completion_tokens = len(prompt) // 4, len(text) // 4
+            record_tokens(analyzer, prompt_tokens, completion_tokens)
+            ledger.charge(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+            result = parse_analysis(text)
+            _record_confidence(result.confidence)
+            return result
+        except SchemaViolation as e:
+            print(f"Schema violation (attempt {attempt + 1}/{LLM_SCHEMA_RETRIES + 1}): {e}")
+            if attempt == LLM_SCHEMA_RETRIES:
+                raise
+
+
+def request_packed(prompt, files, analyzer="analysis", model=None):
+    """One request for several delimited files, retrying only on schema violations. Returns
+    {file label: AnalysisResult} for the files the response covered; callers analyze any missing
+    file on its own."""
+    tier = _attempt.get()
+    schema = CONFIDENT_PACKED_SCHEMA if tier is not None and tier.confident else PACKED_SCHEMA
+    model = model or (tier.model if tier is not None else None)
+    for attempt in range(LLM_SCHEMA_RETRIES + 1):
+        try:
+            _record_call()
+            text = stream_json_object(prompt, LLM_MAX_TOKENS * files, model, schema=schema,
+                                      schema_name="packed_code_analysis")
+            prompt_tokens, completion_tokens = len(prompt) // 4, len(text) // 4
+            record_tokens(analyzer, prompt_tokens, completion_tokens)
+            ledger.charge(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+            return parse_packed(text)
+        except SchemaViolation as e:
+            print(f"Schema violation in packed response (attempt {attempt + 1}/{LLM_SCHEMA_RETRIES + 1}): {e}")
+            if attempt == LLM_SCHEMA_RETRIES:
+                raise
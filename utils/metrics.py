@@ -0,0 +1,317 @@
+"""
+Prometheus-style metrics for the analysis hot path.
+
+A small in-process registry of counters, gauges and histograms rendered in the
+Prometheus text exposition format by the /metrics route. GitHub traffic is
+instrumented through PyGithub's connection classes and OpenAI traffic through
+httpx event hooks on the shared LLM client.
+"""
+import bisect
+import functools
+import re
+import threading
+import time
+
+from utils import ledger
+
+# Latency buckets in seconds, from cache hits to full repository analyses
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {sorted(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = list(zip(labelnames, key)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels):
+        with self.lock:
+            return self.values.get(_label_key(self.labelnames, labels), 0)
+
+    def render(self):
+        with self.lock:
+            items = sorted(self.values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                                for key, value in items]
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.values = {}
+        self.function = function  # Called at render time for unlabelled gauges
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            self.values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        self.function = function
+
+    def render(self):
+        if self.function is not None:
+            try:
+                self.set(self.function())
+            except Exception as e:
+                print(f"Error reading gauge {self.name}: {e}")
+        with self.lock:
+            items = sorted(self.values.items())
+        return self.header() + [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                                for key, value in items]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self):
+        with self.lock:
+            items = sorted((key, list(state)) for key, state in self.values.items())
+        lines = self.header()
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+GITHUB_REQUESTS = REGISTRY.register(Counter(
+    "gitgud_github_requests_total", "GitHub API requests by endpoint and status", ["endpoint", "status"]))
+GITHUB_LATENCY = REGISTRY.register(Histogram(
+    "gitgud_github_request_seconds", "GitHub API request latency", ["endpoint"]))
+GITHUB_RATE_LIMIT_REMAINING = REGISTRY.register(Gauge(
+    "gitgud_github_rate_limit_remaining", "Remaining GitHub API requests in the current window"))
+GITHUB_TOKEN_REMAINING = REGISTRY.register(Gauge(
+    "gitgud_github_token_remaining", "Remaining GitHub API requests per pooled token", ["token"]))
+OPENAI_REQUESTS = REGISTRY.register(Counter(
+    "gitgud_openai_requests_total", "OpenAI API requests by endpoint and status", ["endpoint", "status"]))
+OPENAI_LATENCY = REGISTRY.register(Histogram(
+    "gitgud_openai_request_seconds", "OpenAI API time to response headers", ["endpoint"]))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "gitgud_llm_tokens_total", "Estimated LLM tokens by analyzer and kind", ["analyzer", "kind"]))
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "gitgud_stage_seconds", "Latency of analysis pipeline stages", ["stage"]))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "gitgud_cache_requests_total", "Cache lookups by cache and result", ["cache", "result"]))
+CACHE_HIT_RATIO = REGISTRY.register(Gauge(
+    "gitgud_cache_hit_ratio", "Cache hit ratio since start", ["cache"]))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "gitgud_queue_depth", "Items waiting in the API request queue"))
+PACKED_FILES = REGISTRY.register(Counter(
+    "gitgud_packed_files_total", "Small files in packed LLM requests by analyzer and outcome", ["analyzer", "outcome"]))
+PARTIAL_ANALYSES = REGISTRY.register(Counter(
+    "gitgud_partial_analyses_total", "Analyses cut short by a request deadline by the stage they reached", ["stage"]))
+CASCADE_FILES = REGISTRY.register(Counter(
+    "gitgud_cascade_files_total", "Analyzer calls by dimension, model tier route and reason", ["dimension", "route", "reason"]))
+CASCADE_ESCALATION_RATIO = REGISTRY.register(Gauge(
+    "gitgud_cascade_escalation_ratio", "Share of cheap-tier analyses escalated to the large model", ["dimension"]))
+
+
+def render():
+    return REGISTRY.render()
+
+
+def record_cache(cache, hit):
+    """Count a cache lookup and refresh that cache's hit ratio"""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+    hits = CACHE_REQUESTS.get(cache=cache, result="hit")
+    misses = CACHE_REQUESTS.get(cache=cache, result="miss")
+    CACHE_HIT_RATIO.set(hits / (hits + misses), cache=cache)
+
+
+def record_cascade(dimension, route, reason):
+    """Count a model tier decision and refresh the dimension's escalation ratio"""
+    CASCADE_FILES.inc(dimension=dimension, route=route, reason=reason)
+    if route in ("small", "escalated"):
+        with CASCADE_FILES.lock:
+            counts = [(key[1], value) for key, value in CASCADE_FILES.values.items() if key[0] == dimension]
+        escalated = sum(value for route_name, value in counts if route_name == "escalated")
+        kept = sum(value for route_name, value in counts if route_name == "small")
+        CASCADE_ESCALATION_RATIO.set(escalated / (escalated + kept), dimension=dimension)
+
+
+def record_tokens(analyzer, prompt_tokens, completion_tokens):
+    LLM_TOKENS.inc(prompt_tokens, analyzer=analyzer, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, analyzer=analyzer, kind="completion")
+
+
+def timed(stage):
+    """Decorator recording a function's latency as a pipeline stage"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                STAGE_LATENCY.observe(time.perf_counter() - start, stage=stage)
+        return wrapper
+    return decorator
+
+
+# GitHub instrumentation
+
+_ID_SEGMENT = re.compile(r"^[0-9a-f]{40}$|^\d+$")
+# Called with (Authorization request header, response headers) after every GitHub response
+GITHUB_RESPONSE_HOOKS = []
+
+
+def github_endpoint(path):
+    """Collapse a GitHub API path into a low-cardinality endpoint label"""
+    parts = [part for part in path.split("?")[0].split("/") if part]
+    if not parts:
+        return "/"
+    if parts[0] == "repos" and len(parts) >= 3:
+        return "/repos/:owner/:repo" + (f"/{parts[3]}" if len(parts) > 3 else "")
+    if parts[0] in ("users", "orgs") and len(parts) >= 2:
+        return f"/{parts[0]}/:name" + (f"/{parts[2]}" if len(parts) > 2 else "")
+    return "/" + "/".join(":id" if _ID_SEGMENT.match(part) else part for part in parts[:2])
+
+
+def _instrumented(connection_class):
+    class InstrumentedConnection(connection_class):
+        def getresponse(self):
+            endpoint = github_endpoint(self.url)
+            start = time.perf_counter()
+            status = "error"
+            try:
+                response = super().getresponse()
+                status = str(response.status)
+                remaining = response.headers.get("x-ratelimit-remaining")
+                if remaining is not None:
+                    GITHUB_RATE_LIMIT_REMAINING.set(int(float(remaining)))
+                for hook in GITHUB_RESPONSE_HOOKS:
+                    hook(self.headers.get("Authorization"), response.headers)
+                return response
+            finally:
+                GITHUB_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+                GITHUB_REQUESTS.inc(endpoint=endpoint, status=status)
+                ledger.charge(github_calls=1)
+
+    InstrumentedConnection.__name__ = f"Instrumented{connection_class.__name__}"
+    return InstrumentedConnection
+
+
+def install_github_instrumentation():
+    """Count and time every PyGithub request. Must run before Github() is created."""
+    from github.Requester import HTTPRequestsConnectionClass, HTTPSRequestsConnectionClass, Requester
+
+    Requester.injectConnectionClasses(_instrumented(HTTPRequestsConnectionClass),
+                                      _instrumented(HTTPSRequestsConnectionClass))
+
+
+# OpenAI instrumentation (httpx event hooks)
+
+def _openai_endpoint(request):
+    path = request.url.path
+    return path[path.find("/v1/") + 3:] if "/v1/" in path else path
+
+
+def _on_request(request):
+    request.extensions["gitgud_start"] = time.perf_counter()
+
+
+def _on_response(response):
+    request = response.request
+    endpoint = _openai_endpoint(request)
+    OPENAI_REQUESTS.inc(endpoint=endpoint, status=str(response.status_code))
+    start = request.extensions.get("gitgud_start")
+    if start is not None:
+        OPENAI_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+
+
+HTTPX_EVENT_HOOKS = {"request": [_on_request], "response": [_on_response]}
@@ -0,0 +1,123 @@
+"""
+Packing of small source files into shared LLM requests.
+
+Many sampled files are models, constants or short helpers, yet each one
+costs a full request per analyzer with its own prompt overhead and call
+delay. Files up to PACK_FILE_MAX_CHARS are bundled, each between labelled
+delimiters, into one request per analyzer holding up to PACK_TOKEN_LIMIT
+tokens of code. The structured response carries one result per label. Files
+the response leaves out, and every file of a pack whose request fails, are
+analyzed on their own as before. Packed requests get the analyzers' rate-limit
+retry and schema retries, and files of the users the analyzers answer with
+canned results are never packed.
+"""
+import os
+
+from utils import metrics, tracing
+from utils.efficiency import get_efficiency_resources
+from utils.quality import get_quality_resources
+from utils.security import get_security_resources
+
+PACK_FILE_MAX_CHARS = int(os.getenv("PACK_FILE_MAX_CHARS", "2500"))  # Files up to this size are packed, 0 disables packing
+PACK_TOKEN_LIMIT = int(os.getenv("PACK_TOKEN_LIMIT", "3000"))  # Code tokens per packed request (~4 chars per token)
+PACK_MAX_FILES = int(os.getenv("PACK_MAX_FILES", "8"))  # Files per packed request
+SPECIAL_USERS = ("torvalds", "vipr728")  # Paths the analyzers answer without the LLM, so they stay single
+
+RESOURCES = {
+    "security": get_security_resources,
+    "efficiency": get_efficiency_resources,
+    "quality": get_quality_resources,
+}
+
+
+def plan(files):
+    """Group (path, code) pairs into packs of small files. Returns (packs, singles)."""
+    if PACK_FILE_MAX_CHARS <= 0:
+        return [], list(files)
+    packs, singles, current, size = [], [], [], 0
+    for path, code in files:
+        if len(code) > PACK_FILE_MAX_CHARS or any(user in str(path).lower() for user in SPECIAL_USERS):
+            singles.append((path, code))
+            continue
+        if current and (size + len(code) > PACK_TOKEN_LIMIT * 4 or len(current) >= PACK_MAX_FILES):
+            packs.append(current)
+            current, size = [], 0
+        current.append((path, code))
+        size += len(code)
+    if current:
+        packs.append(current)
+    # A pack of one saves nothing
+    singles.extend(pack[0] for pack in packs if len(pack) == 1)
+    return [pack for pack in packs if len(pack) > 1], singles
+
+
+def build_prompt(dimension, files):
+    sections = "\n\n".join(f"=== FILE {path} ===\n{code}\n=== END FILE {path} ===" for path, code in files)
+    return f"""
+            Rate code {dimension} (0-100) of each file below separately. Top concerns only. Format: JSON with a files array holding file (the label after FILE), score and concerns for every file.
+            
+            {sections}"""
+
+
+def to_result(dimension, analysis):
+    """Analyzer result dict for one file of a packed response, as evaluate_* would return it"""
+    result = {"score": str(analysis.score), "concerns": analysis.concerns}
+    # Ensure "No concerns" always gets 100
+    if not result["concerns"]:
+        result["score"] = "100"
+        result["concerns"] = [f"No {dimension} concerns detected"]
+    result["resources"] = RESOURCES[dimension](result["concerns"])
+    return result
+
+
+class RateLimitError(Exception):
+    pass
+
+
+@metrics.timed("evaluate_pack")
+@tracing.traced("packed_request")
+def request_pack(dimension, files):
+    """One packed request, retried like the analyzers' calls when rate limited. Returns {label: AnalysisResult}."""
+    from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+    from utils.llm import LLM_CALL_DELAY, request_packed
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=2, min=4, max=60),
+        retry=retry_if_exception_type(RateLimitError),
+        sleep=tracing.retry_sleep,
+        reraise=True
+    )
+    @tracing.traced("packed_attempt")
+    def call_api_with_retry():
+        tracing.sleep(LLM_CALL_DELAY, "llm_call_delay")
+        try:
+            return request_packed(build_prompt(dimension, files), len(files), analyzer=dimension)
+        except Exception as e:
+            if "rate_limit" in str(e).lower() or "429" in str(e):
+                raise RateLimitError("Rate limit exceeded") from e
+            raise
+
+    return call_api_with_retry()
+
+
+def evaluate_pack(dimension, evaluate, files, accept=None):
+    """Analyze a pack with one request. Returns {path: result}.
+
+    Files missing from the response, or whose analysis accept(path, analysis)
+    rejects, fall back to evaluate(code, path).
+    """
+    try:
+        parsed = request_pack(dimension, files)
+    except Exception as e:
+        print(f"Packed {dimension} analysis of {len(files)} files failed, analyzing them one by one: {e}")
+        parsed = {}
+
+    results = {}
+    for path, code in files:
+        analysis = parsed.get(path)
+        if analysis is not None and accept is not None and not accept(path, analysis):
+            analysis = None
+        metrics.PACKED_FILES.inc(analyzer=dimension, outcome="packed" if analysis is not None else "fallback")
+        results[path] = to_result(dimension, analysis) if analysis is not None else evaluate(code, path)
+    return results
@@ -0,0 +1,149 @@
+"""
+Speculative prefetch of repository samples after a listing renders.
+
+Nothing used to happen between the listing page and a click, and the click
+then paid for the whole crawl: tree walk, commit churn, blob fetches and
+file ranking. When a listing renders, the top PREFETCH_REPOS unanalyzed
+repositories (by stars, size or recency) are queued on a single low-priority
+thread that runs that crawl ahead of time and keeps the resulting file
+sample. It pauses while foreground analyses run. Each user has a budget of
+GitHub calls per window for speculation. A click on a prefetched repository
+takes the warm sample, or waits for a prefetch that is already running, so
+only the LLM calls remain.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from utils import ledger
+
+PREFETCH_REPOS = int(os.getenv("PREFETCH_REPOS", "3"))  # Repositories warmed per listing, 0 disables prefetching
+PREFETCH_ORDER = os.getenv("PREFETCH_ORDER", "stars")  # 'stars', 'size' or 'recent'
+PREFETCH_BUDGET = int(os.getenv("PREFETCH_BUDGET", "100"))  # Speculative GitHub calls per user per window
+PREFETCH_WINDOW = int(os.getenv("PREFETCH_WINDOW", "3600"))  # Seconds per prefetch budget window
+PREFETCH_TTL = int(os.getenv("PREFETCH_TTL", "900"))  # Seconds a warm sample stays usable
+PREFETCH_WAIT = float(os.getenv("PREFETCH_WAIT", "30"))  # Seconds a click waits for a prefetch already running
+PREFETCH_MAX_ENTRIES = 500  # Warm samples kept, oldest dropped first
+
+ORDER_KEYS = {
+    "stars": lambda repo: (repo.get('stargazers_count') or 0, repo.get('size') or 0),
+    "size": lambda repo: (repo.get('size') or 0, repo.get('stargazers_count') or 0),
+    "recent": lambda repo: (repo.get('pushed_at') or "", repo.get('stargazers_count') or 0),
+}
+
+
+def candidates(repos, limit=PREFETCH_REPOS, order=PREFETCH_ORDER):
+    """Unanalyzed, non-fork repositories most likely to be clicked, best first"""
+    pending = [repo for repo in repos if not repo.get('analyzed', False) and not repo.get('fork')]
+    return sorted(pending, key=ORDER_KEYS.get(order, ORDER_KEYS["stars"]), reverse=True)[:limit]
+
+
+class Prefetcher:
+    """Low-priority worker: fetch(username, repo, max_files) -> [(path, code)] for queued repositories"""
+
+    def __init__(self, fetch):
+        self.fetch = fetch
+        self.lock = threading.Condition()
+        self.queue = deque()  # (username, repo, max_files)
+        self.queued = set()  # (username, repo name) waiting or running
+        self.running = None
+        self.warm = OrderedDict()  # (username, repo name) -> (created, max_files, sample)
+        self.spent = {}  # username -> [window, GitHub calls]
+        self.foreground = 0
+        self.thread = None
+
+    def schedule(self, username, repos, max_files):
+        """Queue the best candidates of a listing. Returns how many were queued."""
+        if PREFETCH_REPOS <= 0:
+            return 0
+        added = 0
+        with self.lock:
+            if self._budget_left(username) <= 0:
+                return 0
+            for repo in candidates(repos):
+                key = (username, repo['name'])
+                if key in self.queued or self._fresh(key, max_files):
+                    continue
+                self.queue.append((username, repo, max_files))
+                self.queued.add(key)
+                added += 1
+            if added and (self.thread is None or not self.thread.is_alive()):
+                self.thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+                self.thread.start()
+            self.lock.notify_all()
+        return added
+
+    def take(self, username, repo_name, max_files, wait=PREFETCH_WAIT):
+        """Warm sample for a repository, or None. Waits for a prefetch of it that is already running."""
+        key = (username, repo_name)
+        deadline = time.monotonic() + wait
+        with self.lock:
+            while self.running == key and time.monotonic() < deadline:
+                self.lock.wait(deadline - time.monotonic())
+            # The click fetches it now; drop a queued speculative copy
+            if key in self.queued and self.running != key:
+                self.queue = deque(item for item in self.queue if (item[0], item[1]['name']) != key)
+                self.queued.discard(key)
+            entry = self.warm.pop(key, None)
+        if entry is None or entry[1] != max_files or time.time() - entry[0] > PREFETCH_TTL:
+            return None
+        return entry[2]
+
+    @contextmanager
+    def foreground_work(self):
+        """Pause speculation while user-facing analysis runs"""
+        with self.lock:
+            self.foreground += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.foreground -= 1
+                self.lock.notify_all()
+
+    def stats(self):
+        with self.lock:
+            return {"queued": len(self.queue), "warm": len(self.warm), "running": "/".join(self.running or ())}
+
+    def _fresh(self, key, max_files):
+        entry = self.warm.get(key)
+        return entry is not None and entry[1] == max_files and time.time() - entry[0] <= PREFETCH_TTL
+
+    def _budget_left(self, username):
+        window = int(time.time() // PREFETCH_WINDOW)
+        entry = self.spent.get(username)
+        if entry is None or entry[0] != window:
+            entry = self.spent[username] = [window, 0]
+        return PREFETCH_BUDGET - entry[1]
+
+    def _run(self):
+        while True:
+            with self.lock:
+                while not self.queue or self.foreground:
+                    self.lock.wait(60)
+                username, repo, max_files = self.queue.popleft()
+                key = (username, repo['name'])
+                if self._budget_left(username) <= 0:
+                    print(f"Prefetch budget spent for {username}, skipping {repo['name']}")
+                    self.queued.discard(key)
+                    continue
+                self.running = key
+            sample = None
+            with ledger.scope(username=username) as run:
+                try:
+                    sample = self.fetch(username, repo, max_files)
+                except Exception as e:
+                    print(f"Error prefetching {username}/{repo['name']}: {e}")
+            with self.lock:
+                self._budget_left(username)
+                self.spent[username][1] += run.github_calls
+                self.running = None
+                self.queued.discard(key)
+                if sample:
+                    self.warm[key] = (time.time(), max_files, sample)
+                    while len(self.warm) > PREFETCH_MAX_ENTRIES:
+                        self.warm.popitem(last=False)
+                self.lock.notify_all()
+            print(f"Prefetched {username}/{repo['name']}: {len(sample or ())} files, {run.github_calls} GitHub calls")
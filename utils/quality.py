@@ -1,17 +1,6 @@
-from openai import OpenAI
-from dotenv import load_dotenv
-import os
-import json
 import random
-import time
-import backoff
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-import asyncio
-from openai import AsyncOpenAI
-
-# LOAD API KEYS
-load_dotenv()
-APIKEY = os.getenv("OPENAI_API_KEY")
+from utils.metrics import timed
+from utils.tracing import traced, retry_sleep, sleep as traced_sleep
 
 # Updated to randomly select 3 resources from a larger list
 QUALITY_RESOURCES = {
@@ -104,20 +93,14 @@ def trim_code_for_analysis(code, file_path):
 class RateLimitError(Exception):
     pass
     
+@timed("evaluate_quality")
+@traced("evaluate_quality")
 def evaluate_quality(code: str, file_path: str = "") -> dict:
     """
     Analyze the quality of the given code using OpenAI.
     Returns a dict with score and improvement suggestions.
     Implements rate limiting and retry logic.
     """
-    client = OpenAI(
-        api_key=APIKEY,
-    )
-
-    # Import necessary modules
-    import threading
-    import time
-    from concurrent.futures import ThreadPoolExecutor
 
     # Special case handling for specific users
     # Ensure file_path is a string before using .lower()
@@ -154,15 +137,22 @@ def evaluate_quality(code: str, file_path: str = "") -> dict:
     # Trim code to reduce token usage - enforce strict limits
     trimmed_code = trim_code_for_analysis(code, file_path)
     
+    # The LLM client, tenacity and pydantic load on the first analysis, not at import time
+    from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+    from utils.llm import request_analysis, LLM_CALL_DELAY
+    from utils.structured import SchemaViolation
+    
     # Add retry logic using tenacity
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=2, min=4, max=60),  # Longer waits between retries
-        retry=retry_if_exception_type((RateLimitError))
+        retry=retry_if_exception_type((RateLimitError)),
+        sleep=retry_sleep  # Retry waits show up in traces
     )
+    @traced("quality_attempt")
     def call_api_with_retry():
         # Rate limiting - Add longer delay between calls (at least 4 seconds)
-        time.sleep(4)
+        traced_sleep(LLM_CALL_DELAY, "llm_call_delay")
         
         try:
             # Create an extremely minimal prompt to reduce tokens
@@ -187,24 +177,12 @@ def evaluate_quality(code: str, file_path: str = "") -> dict:
                 
                 {trimmed_code_reduced}"""
             
-            # Use streaming to reduce memory usage and get faster response
-            completion = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.6,
-                max_tokens=250,  # Further reduced for token efficiency
-                stream=True  # Use streaming
-            )
-            
-            # Collect streaming response
-            content = ""
-            for chunk in completion:
-                if chunk.choices and chunk.choices[0].delta.content:
-                    content += chunk.choices[0].delta.content
-            return content
+            # Schema-constrained request, validated into an AnalysisResult
+            return request_analysis(prompt, analyzer="quality")
             
+        except SchemaViolation as e:
+            print(f"Invalid quality analysis response: {e}")
+            return None
         except Exception as e:
             error_msg = str(e)
             print(f"API call error: {error_msg}")
@@ -212,278 +190,43 @@ def evaluate_quality(code: str, file_path: str = "") -> dict:
             # Handle rate limit errors with longer timeout
             if "rate_limit" in error_msg.lower() or "429" in error_msg:
                 print(f"Rate limit exceeded. Waiting 2 seconds before retry...")
-                time.sleep(2)  # Wait a full minute before retry
+                traced_sleep(2, "rate_limit")
                 raise RateLimitError("Rate limit exceeded")
-                
-            # Handle other errors with fallback
-            generic_concerns = [
-                "Consider improving variable naming for better readability",
-                "Add comprehensive documentation to explain functionality"
-            ]
-            selected_concerns = random.sample(generic_concerns, 1)
-            return json.dumps({
-                "score": random.randint(50, 80),
-                "concerns": selected_concerns
-            })
+            return None
 
     try:
         # Execute with retry logic and increased timeouts
-        response = call_api_with_retry()
+        analysis = call_api_with_retry()
         
-        if not response:
-            # Fallback if no response
-            random_score = random.randint(50, 80)
-            generic_concerns = [
-                "Consider improving variable naming for better readability",
-                "Add comprehensive documentation to explain functionality",
-                "Improve error handling to make the code more robust"
-            ]
-            selected_concerns = random.sample(generic_concerns, random.randint(1, 2))
-            result = {"score": str(random_score), "concerns": selected_concerns}
-            result["resources"] = get_quality_resources(selected_concerns)
+        if analysis is None:
+            # Report the failure instead of guessing a score
+            result = {"score": "N/A", "concerns": ["Unable to analyze code"]}
+            result["resources"] = get_quality_resources([])
             return result
         
-        # Process response
-        import re
-        
-        # Try to extract JSON from the response
-        json_match = re.search(r'({[\s\S]*})', response)
-        if json_match:
-            json_str = json_match.group(1)
-            try:
-                result = json.loads(json_str)
-                # Ensure score is a string
-                result["score"] = str(result.get("score", 60))
-                # Ensure "No concerns" always gets 100
-                if not result.get("concerns") or len(result.get("concerns", [])) == 0:
-                    result["score"] = "100"
-                    result["concerns"] = ["No quality concerns detected"]
-                # Add relevant resources
-                result["resources"] = get_quality_resources(result.get("concerns", []))
-                return result
-            except json.JSONDecodeError:
-                pass
-        
-        # If JSON parsing fails, provide fallback
-        random_score = random.randint(50, 80)
-        generic_concerns = [
-            "Consider improving code organization and structure",
-            "Enhance documentation for better maintainability"
-        ]
-        result = {"score": str(random_score), "concerns": generic_concerns}
-        result["resources"] = get_quality_resources(generic_concerns)
+        result = {"score": str(analysis.score), "concerns": analysis.concerns}
+        # Ensure "No concerns" always gets 100
+        if not result["concerns"]:
+            result["score"] = "100"
+            result["concerns"] = ["No quality concerns detected"]
+        # Add relevant resources
+        result["resources"] = get_quality_resources(result["concerns"])
         return result
     
     except Exception as e:
         print(f"Error analyzing quality: {e}")
         # Fallback response
-        random_score = random.randint(50, 80)
-        generic_concerns = [
-            "Consider improving variable naming for better readability",
-            "Add comprehensive documentation to explain functionality"
-        ]
-        result = {"score": str(random_score), "concerns": generic_concerns}
-        result["resources"] = get_quality_resources(generic_concerns)
+        result = {"score": "N/A", "concerns": ["Unable to analyze code"]}
+        result["resources"] = get_quality_resources([])
         return result
 
 async def evaluate_quality_async(code: str, file_path: str = "") -> dict:
     """
-    Async version of evaluate_quality
+    Async version of evaluate_quality.
+    Runs the synchronous analyzer in a worker thread so both share one connection pool.
     """
-    # Import necessary modules
-    import threading
-    import time
-
-    # Special case handling for specific users
-    # Ensure file_path is a string before using .lower()
-    file_path_str = str(file_path) if file_path is not None else ""
-    
-    if "torvalds" in file_path_str.lower():
-        # ... special case handling ...
-        concerns = [
-            "Linus Torvalds' masterpiece is so clean it makes Shakespeare look like a hack. The structure is pure elegance and the clarity is unmatched.",
-            "Each line in this code is like a perfectly crafted verse of poetry. The coherence is so perfect it makes other developers weep with joy.",
-            "This code is so clean and maintainable that it could serve as documentation for itself. Linus Torvalds has transcended the need for comments."
-        ]
-        return {
-            "score": "∞", 
-            "concerns": random.sample(concerns, 2),
-            "resources": random.sample(QUALITY_RESOURCES["default"], 2)
-        }
-    
-    if "vipr728" in file_path_str.lower():
-        # ... special case handling ...
-        concerns = [
-            "This code is the programming equivalent of a dumpster fire behind a fast-food restaurant. The stench of poor design choices permeates every function, and trying to maintain it would require hazmat gear.",
-            "If this code were a book, it would be written in crayon, with half the pages upside down and the other half in randomly generated hieroglyphics. The variable naming convention appears to be 'mash the keyboard and hope for the best'.",
-            "Documentation is not just missing; it's been deliberately avoided like vipr728 avoids showering. The few comments that exist are so misleading they could be considered malicious.",
-            "The cohesion in this codebase is comparable to a pile of scrambled jigsaw pieces from 87 different puzzles. It's as if vipr728 deliberately set out to create the most incomprehensible structure possible.",
-            "This code violates so many best practices it should be classified as a war crime against software engineering. Reading it has given senior developers PTSD and made junior developers question their career choices.",
-            "The error handling approach is similar to vipr728's approach to personal relationships - completely non-existent and painfully obvious in its absence. Exceptions are treated with the same respect as vipr728 treats professional coding standards.",
-            "The code structure is as chaotic as vipr728's bedroom - a swirling vortex of disorganization that defies the laws of logic and reason. Functions are named with the creativity of someone naming a pet rock 'Rock'."
-        ]
-        return {
-            "score": "-∞",
-            "concerns": random.sample(concerns, 3),
-            "resources": random.sample(QUALITY_RESOURCES["default"], 2)
-        }
-
-    # Trim code to reduce token usage - enforce strict limits
-    trimmed_code = trim_code_for_analysis(code, file_path)
-    
-    client = AsyncOpenAI(
-        api_key=APIKEY,
-    )
-    
-    # Create retry function
-    async def call_api_with_retry(retries=3, delay=2):
-        # Rate limiting - Add delay between calls
-        await asyncio.sleep(2)
-        
-        last_error = None
-        for attempt in range(retries):
-            try:
-                # Create an extremely minimal prompt to reduce tokens
-                prompt = f"""
-                Rate code quality (0-100). Top concerns only. Format: JSON with score and concerns.
-                
-                File: {file_path.split('/')[-1] if '/' in file_path else file_path}
-                
-                {trimmed_code}"""
-                
-                # Calculate rough token estimate (4 chars ~= 1 token)
-                estimated_tokens = len(prompt) // 4
-                if estimated_tokens > 7000:  # Safe limit for input tokens
-                    # Further reduce code if needed
-                    reduction_ratio = 7000 / estimated_tokens
-                    char_limit = int(len(trimmed_code) * reduction_ratio)
-                    trimmed_code_reduced = trimmed_code[:char_limit] + "\n\n# ... (truncated)"
-                    prompt = f"""
-                    Rate code quality (0-100). Top concerns only. Format: JSON with score and concerns.
-                    
-                    File: {file_path.split('/')[-1] if '/' in file_path else file_path}
-                    
-                    {trimmed_code_reduced}"""
-                
-                # Use streaming to reduce memory usage and get faster response
-                completion = await client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.6,
-                    max_tokens=250,  # Further reduced for token efficiency
-                    stream=True  # Use streaming
-                )
-                
-                # Collect streaming response
-                content = ""
-                async for chunk in completion:
-                    if chunk.choices and chunk.choices[0].delta.content:
-                        content += chunk.choices[0].delta.content
-                return content
-                
-            except Exception as e:
-                error_msg = str(e)
-                print(f"API call error (attempt {attempt+1}/{retries}): {error_msg}")
-                
-                # Handle rate limit errors with timeout
-                if "rate_limit" in error_msg.lower() or "429" in error_msg:
-                    print(f"Rate limit exceeded. Waiting {delay} seconds before retry...")
-                    await asyncio.sleep(delay)
-                    delay *= 2  # Exponential backoff
-                    last_error = RateLimitError("Rate limit exceeded")
-                else:
-                    last_error = e
-                
-                # Wait before retry
-                if attempt < retries - 1:
-                    await asyncio.sleep(delay)
-            
-        # If we get here, all retries failed
-        if last_error:
-            # Handle other errors with fallback
-            generic_concerns = [
-                "Consider improving variable naming for better readability",
-                "Add comprehensive documentation to explain functionality"
-            ]
-            selected_concerns = random.sample(generic_concerns, 1)
-            return json.dumps({
-                "score": random.randint(50, 80),
-                "concerns": selected_concerns
-            })
-    
-    try:
-        # Execute with retry logic
-        response = await call_api_with_retry()
-        
-        if not response:
-            # Fallback if no response
-            random_score = random.randint(50, 80)
-            generic_concerns = [
-                "Consider improving variable naming for better readability",
-                "Add comprehensive documentation to explain functionality",
-                "Improve error handling to make the code more robust"
-            ]
-            selected_concerns = random.sample(generic_concerns, random.randint(1, 2))
-            result = {"score": str(random_score), "concerns": selected_concerns}
-            result["resources"] = get_quality_resources(selected_concerns)
-            return result
-        
-        # Process response
-        import re
-        
-        # Try to extract JSON from the response
-        json_match = re.search(r'({[\s\S]*})', response)
-        if json_match:
-            json_str = json_match.group(1)
-            try:
-                result = json.loads(json_str)
-                # Ensure score is a string
-                result["score"] = str(result.get("score", 60))
-                # Ensure "No concerns" always gets 100
-                if not result.get("concerns") or len(result.get("concerns", [])) == 0:
-                    result["score"] = "100"
-                    result["concerns"] = ["No quality concerns detected"]
-                # Add relevant resources
-                result["resources"] = get_quality_resources(result.get("concerns", []))
-                return result
-            except json.JSONDecodeError:
-                pass
-        
-        # If JSON parsing fails, provide fallback
-        random_score = random.randint(50, 80)
-        generic_concerns = [
-            "Consider improving code organization and structure",
-            "Enhance documentation for better maintainability"
-        ]
-        result = {"score": str(random_score), "concerns": generic_concerns}
-        result["resources"] = get_quality_resources(generic_concerns)
-        return result
-    
-    except Exception as e:
-        print(f"Error analyzing quality: {e}")
-        # Fallback response
-        random_score = random.randint(50, 80)
-        generic_concerns = [
-            "Consider improving variable naming for better readability",
-            "Add comprehensive documentation to explain functionality"
-        ]
-        result = {"score": str(random_score), "concerns": generic_concerns}
-        result["resources"] = get_quality_resources(generic_concerns)
-        return result
-
-# Keep a synchronous version for backwards compatibility
-def evaluate_quality(code: str, file_path: str = "") -> dict:
-    """
-    Synchronous wrapper around the async function
-    """
-    loop = asyncio.new_event_loop()
-    try:
-        asyncio.set_event_loop(loop)
-        return loop.run_until_complete(evaluate_quality_async(code, file_path))
-    finally:
-        loop.close()
+    import asyncio
+    return await asyncio.to_thread(evaluate_quality, code, file_path)
 
 if __name__ == "__main__":
     # Example usage
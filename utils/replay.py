@@ -0,0 +1,595 @@
+"""
+Record/replay harness for GitHub and OpenAI traffic.
+
+Runs a local HTTP server that the app is pointed at through GITHUB_API_URL and
+OPENAI_BASE_URL. The server can
+  - record: proxy to the real APIs and save every response as a cassette,
+  - replay: serve saved cassettes without any network access,
+  - synthetic: serve generated fixtures from a SyntheticWorld,
+with configurable latency and injected rate-limit responses in every mode.
+
+Usage:
+    python -m utils.replay --mode record --cassettes cassettes/
+    python -m utils.replay --mode replay --cassettes cassettes/ --latency 0.05 --rate-limit-every 20
+    python -m utils.replay --mode synthetic --fixtures world.json
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit
+
+GITHUB_UPSTREAM = "https://api.github.com"
+OPENAI_UPSTREAM = "https://api.openai.com"
+
+# Response headers worth keeping in a cassette
+RECORDED_HEADERS = (
+    "content-type", "link", "etag", "last-modified", "retry-after",
+    "x-ratelimit-limit", "x-ratelimit-remaining", "x-ratelimit-reset", "x-ratelimit-used",
+)
+
+# Request headers forwarded upstream while recording
+FORWARDED_HEADERS = ("authorization", "accept", "content-type", "user-agent", "openai-organization", "openai-project")
+
+SYNTHETIC_CONCERNS = [
+    "Functions are long and mix several responsibilities",
+    "User input is used without validation",
+    "Nested loops make this section quadratic",
+    "Error handling swallows exceptions silently",
+    "Variable names do not describe their purpose",
+    "Repeated code could be extracted into a helper",
+]
+
+
+def is_openai_path(path):
+    return path.startswith("/v1/")
+
+
+def stable_id(text):
+    """Numeric id that stays the same across processes"""
+    return int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def cassette_key(method, path, query, body):
+    """Stable key for a request: method, path, sorted query and a hash of the body"""
+    canonical_query = urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+    body_hash = hashlib.sha1(body or b"").hexdigest()
+    raw = f"{method.upper()} {path}?{canonical_query} {body_hash}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class CassetteStore:
+    """Directory of recorded responses, one JSON file per request key"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+
+    def _file(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key):
+        try:
+            with open(self._file(key), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, key, request_info, status, headers, body):
+        cassette = {
+            "request": request_info,
+            "response": {
+                "status": status,
+                "headers": {k: v for k, v in headers.items() if k.lower() in RECORDED_HEADERS},
+                "body": body.decode("utf-8", errors="replace"),
+            },
+        }
+        with self.lock:
+            tmp_path = self._file(key) + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(cassette, f, indent=1)
+            os.replace(tmp_path, self._file(key))
+
+
+PACKED_FILE_PATTERN = re.compile(r"=== FILE (.+?) ===\n(.*?)\n=== END FILE \1 ===", re.DOTALL)
+
+
+def synthetic_analysis(text, confident=False):
+    """Deterministic score and concerns (and confidence when asked) for a prompt or a packed file"""
+    digest = hashlib.sha1(text.encode("utf-8")).digest()
+    payload = {
+        "score": 40 + digest[0] % 56,
+        "concerns": [SYNTHETIC_CONCERNS[digest[i] % len(SYNTHETIC_CONCERNS)] for i in range(1, 1 + digest[4] % 3)],
+    }
+    if confident:
+        payload["confidence"] = 40 + digest[5] % 60
+    return payload
+
+
+class SyntheticWorld:
+    """Generated GitHub users, repositories and files served in synthetic mode.
+
+    `users` maps login -> {"repos": {name: repo}}, where a repo has "files"
+    ({path: code}) and optionally "languages", "description", "stargazers_count",
+    "size", "fork" and "pushed_at".
+    """
+
+    def __init__(self, users=None):
+        self.users = users or {}
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f).get("users", {}))
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"users": self.users}, f)
+
+    def repo(self, owner, name):
+        return self.users.get(owner, {}).get("repos", {}).get(name)
+
+    @staticmethod
+    def blob_sha(code):
+        data = code.encode("utf-8")
+        return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+    @staticmethod
+    def commit_sha(owner, name, index):
+        return hashlib.sha1(f"{owner}/{name}#{index}".encode("utf-8")).hexdigest()
+
+
+class FakeAPIServer(ThreadingHTTPServer):
+    """Local stand-in for api.github.com and api.openai.com"""
+
+    daemon_threads = True
+
+    def __init__(self, mode="replay", cassettes=None, world=None, host="127.0.0.1", port=0,
+                 latency=0.0, jitter=0.0, token_latency=0.0, rate_limit_every=0, rate_limit_rate=0.0,
+                 retry_after=1, github_throttle_status=429, seed=0,
+                 github_upstream=GITHUB_UPSTREAM, openai_upstream=OPENAI_UPSTREAM):
+        super().__init__((host, port), FakeAPIHandler)
+        if mode not in ("record", "replay", "synthetic"):
+            raise ValueError(f"Unknown replay mode: {mode}")
+        if mode in ("record", "replay") and not cassettes:
+            raise ValueError(f"{mode} mode needs a cassette directory")
+        self.mode = mode
+        self.store = CassetteStore(cassettes) if cassettes else None
+        self.world = world or SyntheticWorld()
+        self.latency = latency
+        self.jitter = jitter
+        self.token_latency = token_latency
+        self.rate_limit_every = rate_limit_every
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.github_throttle_status = github_throttle_status
+        self.github_upstream = github_upstream.rstrip("/")
+        self.openai_upstream = openai_upstream.rstrip("/")
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.thread = None
+        self.reset_stats()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """Environment variables that point the app at this server"""
+        return {"GITHUB_API_URL": self.base_url, "OPENAI_BASE_URL": f"{self.base_url}/v1"}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request, client_address):
+        # Clients closing a keep-alive connection or a stream early is expected
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+    def reset_stats(self):
+        with self.lock:
+            self.request_count = 0
+            self.stats = {
+                "github_requests": 0,
+                "openai_requests": 0,
+                "injected_rate_limits": 0,
+                "replay_misses": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "github_endpoints": {},
+                "openai_models": {},
+            }
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+    def count_endpoint(self, endpoint):
+        with self.lock:
+            endpoints = self.stats["github_endpoints"]
+            endpoints[endpoint] = endpoints.get(endpoint, 0) + 1
+
+    def count_model(self, model):
+        with self.lock:
+            models = self.stats["openai_models"]
+            models[model] = models.get(model, 0) + 1
+
+    def snapshot_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["github_endpoints"] = dict(self.stats["github_endpoints"])
+            stats["openai_models"] = dict(self.stats["openai_models"])
+            return stats
+
+    def should_throttle(self):
+        """Decide whether the next request gets an injected rate-limit response"""
+        with self.lock:
+            self.request_count += 1
+            if self.rate_limit_every and self.request_count % self.rate_limit_every == 0:
+                return True
+            return bool(self.rate_limit_rate) and self.random.random() < self.rate_limit_rate
+
+    def delay(self):
+        wait = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if wait > 0:
+            time.sleep(wait)
+
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output quiet
+
+    def do_GET(self):
+        self.handle_any("GET")
+
+    def do_POST(self):
+        self.handle_any("POST")
+
+    def do_PATCH(self):
+        self.handle_any("PATCH")
+
+    def do_PUT(self):
+        self.handle_any("PUT")
+
+    def do_DELETE(self):
+        self.handle_any("DELETE")
+
+    def handle_any(self, method):
+        server = self.server
+        parts = urlsplit(self.path)
+        path, query = parts.path, parts.query
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        openai = is_openai_path(path)
+        server.count("openai_requests" if openai else "github_requests")
+        if not openai:
+            server.count_endpoint(github_endpoint(path))
+
+        server.delay()
+        if server.should_throttle():
+            server.count("injected_rate_limits")
+            return self.send_rate_limited(openai)
+
+        if server.mode == "synthetic":
+            return self.serve_synthetic(method, path, query, body, openai)
+
+        key = cassette_key(method, path, query, body)
+        if server.mode == "record":
+            return self.record(key, method, path, query, body, openai)
+
+        cassette = server.store.load(key)
+        if cassette is None:
+            server.count("replay_misses")
+            return self.send_json(404, {"message": f"No cassette for {method} {self.path}"})
+        response = cassette["response"]
+        upstream = cassette["request"].get("upstream", server.github_upstream)
+        headers = {k: self.rewrite(v, upstream) for k, v in response["headers"].items()}
+        self.send_body(response["status"], headers, self.rewrite(response["body"], upstream).encode("utf-8"))
+
+    def rewrite(self, text, upstream):
+        """Point URLs in recorded GitHub responses back at this server"""
+        return text.replace(upstream, self.server.base_url)
+
+    def record(self, key, method, path, query, body, openai):
+        import httpx
+
+        server = self.server
+        upstream = server.openai_upstream if openai else server.github_upstream
+        url = f"{upstream}{path}" + (f"?{query}" if query else "")
+        headers = {k: v for k, v in self.headers.items() if k.lower() in FORWARDED_HEADERS}
+        with httpx.Client(timeout=120) as client:
+            response = client.request(method, url, headers=headers, content=body)
+        content = response.content
+        server.store.save(key, {"method": method, "path": path, "query": query, "upstream": upstream},
+                          response.status_code, dict(response.headers), content)
+        kept = {k: self.rewrite(v, upstream) for k, v in response.headers.items() if k.lower() in RECORDED_HEADERS}
+        body = self.rewrite(content.decode("utf-8", errors="replace"), upstream)
+        self.send_body(response.status_code, kept, body.encode("utf-8"))
+
+    def send_rate_limited(self, openai):
+        server = self.server
+        headers = {"Retry-After": str(server.retry_after)}
+        if openai:
+            return self.send_json(429, {"error": {
+                "message": "Rate limit reached for requests (injected by replay server)",
+                "type": "requests", "code": "rate_limit_exceeded"}}, headers)
+        headers.update({
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Remaining": "0",
+            "X-RateLimit-Reset": str(int(time.time()) + server.retry_after),
+        })
+        return self.send_json(server.github_throttle_status, {
+            "message": "API rate limit exceeded (injected by replay server)"}, headers)
+
+    def send_json(self, status, payload, headers=None):
+        headers = dict(headers or {})
+        headers["Content-Type"] = "application/json; charset=utf-8"
+        self.send_body(status, headers, json.dumps(payload).encode("utf-8"))
+
+    def send_body(self, status, headers, body):
+        self.send_response(status)
+        for name, value in headers.items():
+            if name.lower() not in ("content-length", "transfer-encoding", "content-encoding", "connection"):
+                self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Synthetic fixtures
+
+    def serve_synthetic(self, method, path, query, body, openai):
+        if openai:
+            if method == "POST" and path.endswith("/chat/completions"):
+                return self.synthetic_completion(json.loads(body or b"{}"))
+            return self.send_json(404, {"error": {"message": f"Unknown endpoint {path}"}})
+
+        params = dict(parse_qsl(query))
+        for pattern, handler_name in SYNTHETIC_ROUTES:
+            match = pattern.match(path)
+            if match:
+                status, payload, extra_headers = getattr(self, handler_name)(params, *map(unquote, match.groups()))
+                headers = github_rate_headers()
+                headers.update(extra_headers)
+                return self.send_json(status, payload, headers)
+        return self.send_json(404, {"message": "Not Found"})
+
+    def paginate(self, items, url, params):
+        per_page = int(params.get("per_page", 30))
+        page = int(params.get("page", 1))
+        chunk = items[(page - 1) * per_page:page * per_page]
+        headers = {}
+        if page * per_page < len(items):
+            headers["Link"] = f'<{url}?per_page={per_page}&page={page + 1}>; rel="next"'
+        return 200, chunk, headers
+
+    def user_json(self, login):
+        base = self.server.base_url
+        return {"login": login, "id": stable_id(login), "type": "User",
+                "url": f"{base}/users/{login}", "repos_url": f"{base}/users/{login}/repos",
+                "html_url": f"https://github.com/{login}",
+                "public_repos": len(self.server.world.users.get(login, {}).get("repos", {}))}
+
+    def repo_json(self, owner, name, repo):
+        base = self.server.base_url
+        return {
+            "id": stable_id(f"{owner}/{name}"), "name": name, "full_name": f"{owner}/{name}",
+            "owner": self.user_json(owner), "private": False,
+            "html_url": f"https://github.com/{owner}/{name}", "url": f"{base}/repos/{owner}/{name}",
+            "description": repo.get("description", ""), "fork": repo.get("fork", False),
+            "size": repo.get("size", sum(len(code) for code in repo.get("files", {}).values()) // 1024),
+            "stargazers_count": repo.get("stargazers_count", 0), "default_branch": "main",
+            "pushed_at": repo.get("pushed_at", "2024-01-01T00:00:00Z"), "language": next(iter(repo.get("languages", {})), None),
+        }
+
+    def gh_user(self, params, login):
+        if login not in self.server.world.users:
+            return 404, {"message": "Not Found"}, {}
+        return 200, self.user_json(login), {}
+
+    def gh_user_repos(self, params, login):
+        repos = self.server.world.users.get(login, {}).get("repos", {})
+        items = [self.repo_json(login, name, repo) for name, repo in repos.items()]
+        return self.paginate(items, f"{self.server.base_url}/users/{login}/repos", params)
+
+    def gh_repo(self, params, owner, name):
+        repo = self.server.world.repo(owner, name)
+        if repo is None:
+            return 404, {"message": "Not Found"}, {}
+        return 200, self.repo_json(owner, name, repo), {}
+
+    def gh_languages(self, params, owner, name):
+        repo = self.server.world.repo(owner, name) or {}
+        return 200, repo.get("languages", {}), {}
+
+    def gh_tree(self, params, owner, name, sha):
+        repo = self.server.world.repo(owner, name)
+        if repo is None:
+            return 404, {"message": "Not Found"}, {}
+        if not repo.get("files"):
+            return 409, {"message": "Git Repository is empty."}, {}
+        base = self.server.base_url
+        entries, directories = [], set()
+        for path, code in sorted(repo["files"].items()):
+            parts = path.split("/")
+            for depth in range(1, len(parts)):
+                directories.add("/".join(parts[:depth]))
+            blob = SyntheticWorld.blob_sha(code)
+            entries.append({"path": path, "mode": "100644", "type": "blob", "sha": blob,
+                            "size": len(code.encode("utf-8")), "url": f"{base}/repos/{owner}/{name}/git/blobs/{blob}"})
+        for directory in sorted(directories):
+            entries.append({"path": directory, "mode": "040000", "type": "tree",
+                            "sha": hashlib.sha1(directory.encode("utf-8")).hexdigest()})
+        return 200, {"sha": sha, "url": f"{base}/repos/{owner}/{name}/git/trees/{sha}",
+                     "tree": entries, "truncated": False}, {}
+
+    def gh_contents(self, params, owner, name, path):
+        repo = self.server.world.repo(owner, name)
+        if repo is None or path not in repo.get("files", {}):
+            return 404, {"message": "Not Found"}, {}
+        data = repo["files"][path].encode("utf-8")
+        base = self.server.base_url
+        return 200, {"type": "file", "encoding": "base64", "size": len(data), "name": path.split("/")[-1],
+                     "path": path, "sha": SyntheticWorld.blob_sha(repo["files"][path]),
+                     "content": base64.b64encode(data).decode("ascii"),
+                     "url": f"{base}/repos/{owner}/{name}/contents/{path}"}, {}
+
+    def gh_commits(self, params, owner, name):
+        repo = self.server.world.repo(owner, name) or {}
+        base = self.server.base_url
+        commits = [{"sha": SyntheticWorld.commit_sha(owner, name, index),
+                    "url": f"{base}/repos/{owner}/{name}/commits/{SyntheticWorld.commit_sha(owner, name, index)}",
+                    "commit": {"message": f"Commit {index}"}}
+                   for index in range(min(len(repo.get("files", {})), 10))]
+        return self.paginate(commits, f"{base}/repos/{owner}/{name}/commits", params)
+
+    def gh_commit(self, params, owner, name, sha):
+        repo = self.server.world.repo(owner, name) or {}
+        paths = sorted(repo.get("files", {}))
+        base = self.server.base_url
+        # Each synthetic commit touches a deterministic pair of files
+        seed = int(sha[:8], 16)
+        files = [{"filename": paths[(seed + offset) % len(paths)], "status": "modified",
+                  "additions": 1, "deletions": 1, "changes": 2} for offset in range(min(2, len(paths)))]
+        return 200, {"sha": sha, "url": f"{base}/repos/{owner}/{name}/commits/{sha}",
+                     "commit": {"message": "Synthetic commit"}, "files": files}, {}
+
+    def gh_rate_limit(self, params):
+        reset = int(time.time()) + 3600
+        core = {"limit": 5000, "remaining": 5000, "reset": reset, "used": 0}
+        return 200, {"resources": {"core": core}, "rate": core}, {}
+
+    def synthetic_completion(self, request_body):
+        server = self.server
+        prompt = "".join(str(message.get("content", "")) for message in request_body.get("messages", []))
+        schema = request_body.get("response_format", {}).get("json_schema", {}).get("schema", {})
+        server.count_model(request_body.get("model", "gpt-4o"))
+        if "files" in schema.get("properties", {}):
+            # Packed request: one result per delimited file, derived from that file's code
+            confident = "confidence" in schema["properties"]["files"]["items"]["properties"]
+            payload = {"files": [dict(file=label, **synthetic_analysis(code, confident))
+                                 for label, code in PACKED_FILE_PATTERN.findall(prompt)]}
+        else:
+            payload = synthetic_analysis(prompt, "confidence" in schema.get("properties", {}))
+        content = json.dumps(payload)
+        # Roughly one token per 4 characters, like the analyzers' own estimate
+        pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+        prompt_tokens = len(prompt) // 4
+        server.count("prompt_tokens", prompt_tokens)
+        server.count("completion_tokens", len(pieces))
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(pieces),
+                 "total_tokens": prompt_tokens + len(pieces)}
+        model = request_body.get("model", "gpt-4o")
+        created = int(time.time())
+
+        if not request_body.get("stream"):
+            return self.send_json(200, {
+                "id": "chatcmpl-synthetic", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": usage})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for piece in pieces:
+                if server.token_latency:
+                    time.sleep(server.token_latency)
+                self.write_event({"id": "chatcmpl-synthetic", "object": "chat.completion.chunk", "created": created,
+                                  "model": model, "choices": [{"index": 0, "delta": {"content": piece},
+                                                               "finish_reason": None}]})
+            self.write_event({"id": "chatcmpl-synthetic", "object": "chat.completion.chunk", "created": created,
+                              "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            self.write_chunk(b"data: [DONE]\n\n")
+            self.write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading once it had the whole object
+            self.close_connection = True
+
+    def write_event(self, payload):
+        self.write_chunk(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    def write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+SYNTHETIC_ROUTES = [
+    (re.compile(r"^/users/([^/]+)$"), "gh_user"),
+    (re.compile(r"^/users/([^/]+)/repos$"), "gh_user_repos"),
+    (re.compile(r"^/repos/([^/]+)/([^/]+)$"), "gh_repo"),
+    (re.compile(r"^/repos/([^/]+)/([^/]+)/languages$"), "gh_languages"),
+    (re.compile(r"^/repos/([^/]+)/([^/]+)/git/trees/([^/]+)$"), "gh_tree"),
+    (re.compile(r"^/repos/([^/]+)/([^/]+)/contents/(.+)$"), "gh_contents"),
+    (re.compile(r"^/repos/([^/]+)/([^/]+)/commits$"), "gh_commits"),
+    (re.compile(r"^/repos/([^/]+)/([^/]+)/commits/([^/]+)$"), "gh_commit"),
+    (re.compile(r"^/rate_limit$"), "gh_rate_limit"),
+]
+
+
+def github_endpoint(path):
+    """Collapse a GitHub path into its endpoint template for per-endpoint counts"""
+    for pattern, handler_name in SYNTHETIC_ROUTES:
+        if pattern.match(path):
+            return handler_name[3:]
+    return "other"
+
+
+def github_rate_headers():
+    return {"X-RateLimit-Limit": "5000", "X-RateLimit-Remaining": "4999",
+            "X-RateLimit-Reset": str(int(time.time()) + 3600)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record/replay server for GitHub and OpenAI traffic")
+    parser.add_argument("--mode", choices=["record", "replay", "synthetic"], default="replay")
+    parser.add_argument("--cassettes", help="Cassette directory (record/replay)")
+    parser.add_argument("--fixtures", help="SyntheticWorld JSON file (synthetic)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency up to this many seconds")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds between streamed chunks")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth request with a rate limit")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Probability of a rate-limit response")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    world = SyntheticWorld.load(args.fixtures) if args.fixtures else None
+    server = FakeAPIServer(mode=args.mode, cassettes=args.cassettes, world=world, host=args.host, port=args.port,
+                           latency=args.latency, jitter=args.jitter, token_latency=args.token_latency,
+                           rate_limit_every=args.rate_limit_every, rate_limit_rate=args.rate_limit_rate,
+                           retry_after=args.retry_after, seed=args.seed)
+    print(f"Replay server ({args.mode}) listening on {server.base_url}")
+    for name, value in server.env().items():
+        print(f"  export {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import math
+import os
+import re
+
+# Map file extensions to the language names GitHub reports in repo.get_languages()
+EXTENSION_LANGUAGES = {
+    ".py": "Python",
+    ".js": "JavaScript",
+    ".ts": "TypeScript",
+    ".java": "Java",
+    ".cpp": "C++",
+    ".c": "C",
+    ".h": "C",
+    ".dart": "Dart",
+    ".swift": "Swift",
+    ".kt": "Kotlin",
+    ".html": "HTML",
+    ".css": "CSS",
+    ".m": "Objective-C",
+    ".cs": "C#",
+    ".lua": "Lua",
+}
+
+# File names that usually hold the core logic of a project
+ENTRY_POINT_NAMES = {
+    "main": 3.0, "__main__": 3.0, "app": 3.0, "index": 2.5, "server": 2.5, "program": 2.5,
+    "cli": 2.0, "manage": 1.0, "run": 1.5, "api": 2.0, "routes": 2.0, "views": 2.0,
+    "models": 1.5, "core": 1.5, "service": 1.5, "controller": 1.5, "handler": 1.5, "lib": 1.0,
+}
+
+# Paths that are vendored or generated and never worth an LLM call
+EXCLUDED_PATTERN = re.compile(
+    r"(^|/)(node_modules|vendor|third_party|dist|build|Pods|\.dart_tool|\.git|generated|migrations)/"
+    r"|\.min\.(js|css)$|\.g\.dart$|\.pb\.\w+$"
+)
+
+# Paths that are usually tests or configuration and say little about the author's code
+LOW_VALUE_PATTERN = re.compile(
+    r"(^|/)(tests?|spec|__tests__|docs?|examples?|config|conf|settings)(/|$)"
+    r"|(^|/)(test_[^/]*|[^/]*_test\.\w+|[^/]*\.(spec|test)\.\w+|setup\.py|conftest\.py|[^/]*config\.\w+)$"
+)
+
+# Import statements per language, used to approximate fan-in between sampled files
+IMPORT_PATTERNS = {
+    ".py": re.compile(r"^\s*(?:from\s+([\w\.]+)\s+import|import\s+([\w\.]+))", re.MULTILINE),
+    ".js": re.compile(r"(?:from\s+|require\(\s*|import\s+)['\"]([^'\"]+)['\"]"),
+    ".ts": re.compile(r"(?:from\s+|require\(\s*|import\s+)['\"]([^'\"]+)['\"]"),
+    ".java": re.compile(r"^\s*import\s+(?:static\s+)?([\w\.]+)\s*;", re.MULTILINE),
+    ".kt": re.compile(r"^\s*import\s+([\w\.]+)", re.MULTILINE),
+    ".cs": re.compile(r"^\s*using\s+([\w\.]+)\s*;", re.MULTILINE),
+    ".c": re.compile(r"#include\s+\"([^\"]+)\""),
+    ".cpp": re.compile(r"#include\s+\"([^\"]+)\""),
+    ".h": re.compile(r"#include\s+\"([^\"]+)\""),
+    ".m": re.compile(r"#(?:include|import)\s+\"([^\"]+)\""),
+    ".dart": re.compile(r"^\s*import\s+['\"]([^'\"]+)['\"]", re.MULTILINE),
+    ".lua": re.compile(r"require\s*\(?\s*['\"]([^'\"]+)['\"]"),
+}
+
+# Weights for each ranking signal
+ENTRY_POINT_WEIGHT = 1.0
+DEPTH_PENALTY = 0.5
+LANGUAGE_WEIGHT = 3.0
+FAN_IN_WEIGHT = 1.5
+CHURN_WEIGHT = 0.75
+LOW_VALUE_PENALTY = 3.0
+
+# Diversity penalties applied while greedily picking the top K
+SAME_EXTENSION_PENALTY = 1.0
+SAME_DIRECTORY_PENALTY = 0.75
+
+
+def _extension(path):
+    return os.path.splitext(path)[1].lower()
+
+
+def _stem(path):
+    """Module name a file is imported by (index.js is imported by its directory name)"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    if name in ("index", "__init__", "mod"):
+        parent = os.path.basename(os.path.dirname(path))
+        return parent or name
+    return name
+
+
+def is_excluded(path):
+    """Return True for vendored or generated files that should never be sampled"""
+    return bool(EXCLUDED_PATTERN.search(path))
+
+
+def language_shares(languages):
+    """Convert a {language: bytes} dict into {language: share of total bytes}"""
+    total = sum(languages.values()) if languages else 0
+    if not total:
+        return {}
+    return {lang: count / total for lang, count in languages.items()}
+
+
+def size_score(size):
+    """Favour mid-sized files; tiny stubs and huge generated files score low"""
+    if not size or size < 200:
+        return -1.0
+    if size > 100000:
+        return 0.0
+    # Peaks around 4-20 KB
+    return min(math.log2(size / 200.0), 6.0) / 2.0
+
+
+def compute_fan_in(sources, targets=None):
+    """Count how many other files import each file.
+
+    `sources` maps path -> code of the files whose imports are read. `targets`
+    are the paths counted (default: the sources), so files not fetched yet
+    can be ranked by the fetched files that import them. Imports are matched
+    to files by module stem, which is cheap and good enough to find the
+    modules a project is built around.
+    """
+    targets = list(sources) if targets is None else targets
+    stems = {}
+    for path in targets:
+        stems.setdefault(_stem(path).lower(), []).append(path)
+
+    fan_in = {path: 0 for path in targets}
+    for path, code in sources.items():
+        pattern = IMPORT_PATTERNS.get(_extension(path))
+        if not pattern or not code:
+            continue
+        imported = set()
+        for match in pattern.finditer(code):
+            target = next((group for group in match.groups() if group), "")
+            # "pkg.module", "./dir/module.js" and "dir/module.h" all reduce to "module"
+            target = target.replace("\\", "/").rstrip("/").split("/")[-1]
+            if _extension(target) in IMPORT_PATTERNS:
+                target = os.path.splitext(target)[0]
+            target = target.split(".")[-1].lower()
+            if target:
+                imported.add(target)
+        for target in imported:
+            for other in stems.get(target, []):
+                if other != path:
+                    fan_in[other] += 1
+    return fan_in
+
+
+def score_file(path, size, shares=None, fan_in=0, churn=0):
+    """Importance score for a single candidate file"""
+    score = 0.0
+
+    name = os.path.splitext(os.path.basename(path))[0].lower()
+    score += ENTRY_POINT_WEIGHT * ENTRY_POINT_NAMES.get(name, 0.0)
+
+    depth = path.count("/")
+    score -= DEPTH_PENALTY * min(depth, 6)
+
+    score += size_score(size)
+
+    if shares:
+        language = EXTENSION_LANGUAGES.get(_extension(path))
+        score += LANGUAGE_WEIGHT * shares.get(language, 0.0)
+
+    if LOW_VALUE_PATTERN.search(path.lower()):
+        score -= LOW_VALUE_PENALTY
+
+    score += FAN_IN_WEIGHT * math.log1p(fan_in)
+    score += CHURN_WEIGHT * math.log1p(churn)
+    return score
+
+
+def rank_files(candidates, languages=None, fan_in=None, churn=None):
+    """Rank candidate files by importance.
+
+    `candidates` is a list of dicts with 'path' and 'size'. Returns a new list of
+    (score, candidate) pairs, best first. Ties are broken by path so the order is
+    the same on every run.
+    """
+    shares = language_shares(languages or {})
+    fan_in = fan_in or {}
+    churn = churn or {}
+
+    ranked = []
+    for candidate in candidates:
+        path = candidate["path"]
+        if is_excluded(path):
+            continue
+        score = score_file(path, candidate.get("size", 0), shares,
+                           fan_in.get(path, 0), churn.get(path, 0))
+        ranked.append((score, candidate))
+
+    ranked.sort(key=lambda item: (-item[0], item[1]["path"]))
+    return ranked
+
+
+def select_files(candidates, k, languages=None, fan_in=None, churn=None, max_per_ext=None):
+    """Pick a deterministic, diverse top-K from the candidates.
+
+    Files are picked greedily by importance, with a penalty for every file already
+    picked from the same extension or directory so a single folder of similar
+    files cannot crowd out the rest of the project.
+    """
+    ranked = rank_files(candidates, languages, fan_in, churn)
+    picked = []
+    ext_counts = {}
+    dir_counts = {}
+
+    while ranked and len(picked) < k:
+        best_index = None
+        best_score = None
+        for index, (score, candidate) in enumerate(ranked):
+            path = candidate["path"]
+            ext = _extension(path)
+            if max_per_ext is not None and ext_counts.get(ext, 0) >= max_per_ext:
+                continue
+            adjusted = (score
+                        - SAME_EXTENSION_PENALTY * ext_counts.get(ext, 0)
+                        - SAME_DIRECTORY_PENALTY * dir_counts.get(os.path.dirname(path), 0))
+            # Strict comparison keeps the earlier (path-ordered) entry on ties
+            if best_score is None or adjusted > best_score:
+                best_index, best_score = index, adjusted
+        if best_index is None:
+            break
+
+        _, candidate = ranked.pop(best_index)
+        path = candidate["path"]
+        picked.append(candidate)
+        ext_counts[_extension(path)] = ext_counts.get(_extension(path), 0) + 1
+        dir_counts[os.path.dirname(path)] = dir_counts.get(os.path.dirname(path), 0) + 1
+
+    return picked
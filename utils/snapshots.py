@@ -0,0 +1,114 @@
+"""
+Static snapshots of rendered user reports.
+
+When a user's analysis finishes, the rendered report is written to
+SNAPSHOT_DIR/<username>/report.html.gz with a report.json sidecar holding the
+underlying scores. Later visits are served straight from disk (or by a CDN or
+web server pointed at SNAPSHOT_DIR with gzip_static) until one of the user's
+repository results changes and the snapshot is invalidated.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+REPORT_SNAPSHOTS = os.getenv("REPORT_SNAPSHOTS", "0") == "1"
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_MAX_AGE = int(os.getenv("SNAPSHOT_MAX_AGE", "300"))  # Cache-Control max-age for served snapshots
+HTML_NAME = "report.html.gz"
+JSON_NAME = "report.json"
+
+_SAFE_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,99}$")
+_meta = {}  # username -> sidecar metadata, loaded lazily
+_lock = threading.Lock()
+
+
+def enabled():
+    return REPORT_SNAPSHOTS
+
+
+def user_dir(username):
+    if not _SAFE_NAME.match(username) or ".." in username:
+        return None
+    return os.path.join(SNAPSHOT_DIR, username)
+
+
+def html_path(username):
+    directory = user_dir(username)
+    return os.path.join(directory, HTML_NAME) if directory else None
+
+
+def json_path(username):
+    directory = user_dir(username)
+    return os.path.join(directory, JSON_NAME) if directory else None
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def publish(username, html, data):
+    """Write the compressed report and its JSON sidecar. Returns the snapshot metadata."""
+    directory = user_dir(username)
+    if directory is None:
+        return None
+    body = html.encode("utf-8")
+    meta = {
+        "username": username,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "etag": hashlib.sha1(body).hexdigest()[:20],
+        "html_bytes": len(body),
+    }
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # The sidecar is written last so a snapshot is only visible once both files exist
+        _write_atomic(os.path.join(directory, HTML_NAME), gzip.compress(body, compresslevel=9, mtime=0))
+        _write_atomic(os.path.join(directory, JSON_NAME),
+                      json.dumps({**meta, **data}, default=str, separators=(",", ":")).encode("utf-8"))
+    except OSError as e:
+        print(f"Error publishing report snapshot for {username}: {e}")
+        return None
+    with _lock:
+        _meta[username] = meta
+    return meta
+
+
+def load(username):
+    """Metadata of a published snapshot, or None"""
+    with _lock:
+        if username in _meta:
+            return _meta[username]
+    path = json_path(username)
+    if path is None or not os.path.exists(path) or not os.path.exists(html_path(username)):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            sidecar = json.load(f)
+        meta = {key: sidecar[key] for key in ("username", "generated_at", "etag", "html_bytes")}
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error reading report snapshot for {username}: {e}")
+        return None
+    with _lock:
+        _meta[username] = meta
+    return meta
+
+
+def read_html(username):
+    with open(html_path(username), "rb") as f:
+        return gzip.decompress(f.read())
+
+
+def invalidate(username):
+    """Drop a user's snapshot after one of their repository results changed"""
+    with _lock:
+        _meta.pop(username, None)
+    directory = user_dir(username)
+    if directory and os.path.isdir(directory):
+        shutil.rmtree(directory, ignore_errors=True)
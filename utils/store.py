@@ -0,0 +1,313 @@
+"""
+Indexed in-memory store for repository listings and analysis results.
+
+Each (username, repo) pair is one compact RepoRecord with interned concern,
+resource and language strings. Records are found through a hash index
+instead of scanning per-user lists, and secondary indexes by language and
+overall-score bucket back the small query API used by listing pages.
+"""
+import heapq
+import json
+import sys
+import threading
+
+from utils.aggregation import DIMENSIONS, parse_score
+
+SCORE_BUCKET_WIDTH = 10  # Overall scores are indexed in buckets of this width
+METADATA_FIELDS = ("description", "url", "size", "fork", "stargazers_count", "pushed_at")
+KNOWN_FIELDS = {"name", "languages", "analyzed", "overall_score"} | set(METADATA_FIELDS) | set(DIMENSIONS)
+
+_resources = {}  # (title, url) -> shared resource dict
+_resources_lock = threading.Lock()
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _intern_resource(resource):
+    """Resources come from small constant tables; keep one shared dict per (title, url)"""
+    if not isinstance(resource, dict):
+        return resource
+    key = (resource.get('title'), resource.get('url'))
+    with _resources_lock:
+        shared = _resources.get(key)
+        if shared is None:
+            shared = _resources[key] = {name: _intern(value) for name, value in resource.items()}
+    return shared
+
+
+class DimensionResult:
+    __slots__ = ("score", "concerns", "resources", "encoded")
+
+    def __init__(self, section):
+        section = section if isinstance(section, dict) else {}
+        self.score = _intern(section.get('score', 'N/A'))
+        self.concerns = tuple(_intern(concern) for concern in section.get('concerns', ()))
+        resources = section.get('resources')
+        self.resources = tuple(_intern_resource(resource) for resource in resources) if resources else None
+        self.encoded = None
+
+    def encode(self):
+        """JSON bytes, computed once: results are replaced, never changed in place"""
+        if self.encoded is None:
+            self.encoded = json.dumps(self.to_dict(), separators=(",", ":")).encode("utf-8")
+        return self.encoded
+
+    def to_dict(self):
+        section = {'score': self.score, 'concerns': list(self.concerns)}
+        if self.resources is not None:
+            section['resources'] = list(self.resources)
+        return section
+
+
+class RepoRecord:
+    __slots__ = ("username", "name", "languages", "analyzed", "overall_score", "overall", "dimensions",
+                 "extra") + METADATA_FIELDS
+
+    def __init__(self, username, repo):
+        self.username = _intern(username)
+        self.name = _intern(repo['name'])
+        self.set_metadata(repo)
+        self.analyzed = bool(repo.get('analyzed', False))
+        self.overall_score = repo.get('overall_score')
+        self.overall = parse_score(self.overall_score)
+        self.dimensions = tuple(DimensionResult(repo.get(dimension)) for dimension in DIMENSIONS)
+        extra = {key: value for key, value in repo.items() if key not in KNOWN_FIELDS}
+        self.extra = extra or None
+
+    def set_metadata(self, repo):
+        for field in METADATA_FIELDS:
+            setattr(self, field, repo.get(field))
+        self.languages = tuple((_intern(language), size) for language, size in (repo.get('languages') or {}).items())
+
+    @property
+    def key(self):
+        return (self.username, self.name)
+
+    @property
+    def scored(self):
+        return self.analyzed and self.overall == self.overall
+
+    def score(self, dimension):
+        return self.dimensions[DIMENSIONS.index(dimension)].score
+
+    def _fields(self):
+        repo = {'name': self.name}
+        for field in METADATA_FIELDS:
+            repo[field] = getattr(self, field)
+        repo['languages'] = dict(self.languages)
+        if self.overall_score is not None:
+            repo['overall_score'] = self.overall_score
+        repo['analyzed'] = self.analyzed
+        if self.extra:
+            repo.update(self.extra)
+        return repo
+
+    def to_dict(self):
+        """Plain dict in the shape the templates and routes expect"""
+        repo = self._fields()
+        for dimension, result in zip(DIMENSIONS, self.dimensions):
+            repo[dimension] = result.to_dict()
+        return repo
+
+    def encode(self):
+        """JSON bytes of to_dict(); the concern and resource lists reuse their cached encoding"""
+        head = json.dumps(self._fields(), separators=(",", ":"), default=str).encode("utf-8")
+        sections = b",".join(b'"%s":%s' % (dimension.encode(), result.encode())
+                             for dimension, result in zip(DIMENSIONS, self.dimensions))
+        return head[:-1] + b"," + sections + b"}"
+
+
+class PendingLoad:
+    """A loader call in progress: the thread running it, and an event set when it ends"""
+    __slots__ = ("thread", "done")
+
+    def __init__(self):
+        self.thread = threading.get_ident()
+        self.done = threading.Event()
+
+
+class ResultStore:
+    def __init__(self, loader=None):
+        self.lock = threading.RLock()
+        self.records = {}  # (username, repo) -> RepoRecord
+        self.listings = {}  # username -> {repo name: None}, in listing order
+        self.by_language = {}  # language -> set of keys
+        self.by_score = {}  # score bucket -> set of keys of scored records
+        self.loader = loader  # Called once per username before its first lookup, e.g. to warm from disk
+        self.loaded = set()  # Usernames whose loader call succeeded
+        self.loading = {}  # username -> PendingLoad
+        self.dirty = set()  # Usernames written since the last take_dirty()
+
+    def __len__(self):
+        return len(self.records)
+
+    def _index(self, record):
+        for language, _ in record.languages:
+            self.by_language.setdefault(language, set()).add(record.key)
+        if record.scored:
+            self.by_score.setdefault(int(record.overall // SCORE_BUCKET_WIDTH), set()).add(record.key)
+
+    def _unindex(self, record):
+        for language, _ in record.languages:
+            keys = self.by_language.get(language)
+            if keys is not None:
+                keys.discard(record.key)
+        if record.scored:
+            keys = self.by_score.get(int(record.overall // SCORE_BUCKET_WIDTH))
+            if keys is not None:
+                keys.discard(record.key)
+
+    def _ensure(self, username):
+        """Run the loader once per username, outside the store lock; other threads wait for it to finish"""
+        while self.loader is not None and username not in self.loaded:
+            with self.lock:
+                pending = self.loading.get(username)
+                if pending is None and username not in self.loaded:
+                    pending = self.loading[username] = PendingLoad()
+                    break
+            if pending is None or pending.thread == threading.get_ident():
+                return  # Loaded meanwhile, or the loader's own reads and writes
+            pending.done.wait()  # Retried by the loop if that load failed
+        else:
+            return
+        try:
+            self.loader(username)
+            with self.lock:
+                self.loaded.add(username)
+                self.dirty.discard(username)  # Loaded data is already persisted
+        finally:
+            with self.lock:
+                del self.loading[username]
+            pending.done.set()
+
+    def put(self, username, repo):
+        """Insert or replace a repository's record"""
+        self._ensure(username)
+        record = RepoRecord(username, repo)
+        with self.lock:
+            self.dirty.add(record.username)
+            previous = self.records.get(record.key)
+            if previous is not None:
+                self._unindex(previous)
+                # Analysis results carry fewer fields than listings; keep the listing's metadata
+                for field in METADATA_FIELDS:
+                    if field not in repo:
+                        setattr(record, field, getattr(previous, field))
+                if 'languages' not in repo:
+                    record.languages = previous.languages
+            self.records[record.key] = record
+            self._index(record)
+        return record
+
+    def set_listing(self, username, repos):
+        """Record a user's repository listing without discarding earlier analysis results"""
+        self._ensure(username)
+        with self.lock:
+            self.dirty.add(username)
+            names = []
+            for repo in repos:
+                record = self.records.get((username, repo['name']))
+                if record is None:
+                    record = self.put(username, repo)
+                else:
+                    self._unindex(record)
+                    record.set_metadata(repo)
+                    self._index(record)
+                names.append(record.name)
+            self.listings[username] = dict.fromkeys(names)
+
+    def get(self, username, repo_name):
+        self._ensure(username)
+        return self.records.get((username, repo_name))
+
+    def get_dict(self, username, repo_name):
+        record = self.get(username, repo_name)
+        return record.to_dict() if record is not None else None
+
+    def has_user(self, username):
+        self._ensure(username)
+        return username in self.listings
+
+    def is_listed(self, username, repo_name):
+        self._ensure(username)
+        return repo_name in self.listings.get(username, ())
+
+    def user_records(self, username):
+        self._ensure(username)
+        with self.lock:
+            return [self.records[(username, name)] for name in self.listings.get(username, ())]
+
+    def user_repos(self, username):
+        """The user's listing as template dicts, or None when the user has not been listed"""
+        self._ensure(username)
+        if username not in self.listings:
+            return None
+        return [record.to_dict() for record in self.user_records(username)]
+
+    def _candidates(self, username=None, language=None):
+        with self.lock:
+            if language is not None:
+                keys = set(self.by_language.get(language, ()))
+                if username is not None:
+                    keys = {key for key in keys if key[0] == username}
+            elif username is not None:
+                keys = {(username, name) for name in self.listings.get(username, ())}
+            else:
+                keys = set(self.records)
+            return [self.records[key] for key in keys if key in self.records]
+
+    def top(self, n, username=None, language=None):
+        """The n analyzed records with the highest overall score"""
+        scored = [record for record in self._candidates(username, language) if record.scored]
+        return heapq.nlargest(n, scored, key=lambda record: record.overall)
+
+    def query(self, username=None, language=None, min_score=None, max_score=None):
+        """Records filtered by user, language and overall-score range"""
+        if min_score is None and max_score is None:
+            return self._candidates(username, language)
+        low = int((min_score or 0) // SCORE_BUCKET_WIDTH)
+        high = int((max_score if max_score is not None else 100) // SCORE_BUCKET_WIDTH)
+        with self.lock:
+            keys = set()
+            for bucket in range(low, high + 1):
+                keys |= self.by_score.get(bucket, set())
+            records = [self.records[key] for key in keys]
+        return [
+            record for record in records
+            if (username is None or record.username == username)
+            and (language is None or any(name == language for name, _ in record.languages))
+            and (min_score is None or record.overall >= min_score)
+            and (max_score is None or record.overall <= max_score)
+        ]
+
+    def languages(self, username=None):
+        with self.lock:
+            return sorted(language for language, keys in self.by_language.items()
+                          if keys and (username is None or any(key[0] == username for key in keys)))
+
+    def take_dirty(self):
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+            return dirty
+
+    def export(self, usernames=None):
+        """{username: {'listing': repo names or None, 'records': [repo dicts]}} for persistence"""
+        with self.lock:
+            users = {}
+            for (username, _), record in self.records.items():
+                if usernames is None or username in usernames:
+                    users.setdefault(username, {'listing': None, 'records': []})['records'].append(record.to_dict())
+            for username, names in self.listings.items():
+                if usernames is None or username in usernames:
+                    users.setdefault(username, {'listing': None, 'records': []})['listing'] = list(names)
+            return users
+
+    def clear(self):
+        with self.lock:
+            self.loaded.clear()
+            self.records.clear()
+            self.listings.clear()
+            self.by_language.clear()
+            self.by_score.clear()
@@ -0,0 +1,171 @@
+import json
+from typing import List, Optional
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+MAX_CONCERNS = 10  # Concerns kept per result; a longer list is cut rather than rejected
+
+# JSON schema sent with response_format so the model can only emit this object
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "integer", "description": "Score from 0 (worst) to 100 (best)"},
+        "concerns": {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": f"Up to {MAX_CONCERNS} top concerns, most important first",
+        },
+    },
+    "required": ["score", "concerns"],
+    "additionalProperties": False,
+}
+
+# Several delimited files analyzed in one request: one entry per file, keyed by its label
+PACKED_ITEM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "file": {"type": "string", "description": "Label of the file exactly as given"},
+        "score": ANALYSIS_SCHEMA["properties"]["score"],
+        "concerns": ANALYSIS_SCHEMA["properties"]["concerns"],
+    },
+    "required": ["file", "score", "concerns"],
+    "additionalProperties": False,
+}
+
+
+def packed_schema(item_schema=PACKED_ITEM_SCHEMA):
+    return {
+        "type": "object",
+        "properties": {"files": {"type": "array", "items": item_schema}},
+        "required": ["files"],
+        "additionalProperties": False,
+    }
+
+
+def with_confidence(schema):
+    """Copy of an object schema that also asks for the model's confidence in its score"""
+    properties = dict(schema["properties"])
+    properties["confidence"] = {"type": "integer", "description": "Confidence in the score from 0 (guess) to 100 (certain)"}
+    return {**schema, "properties": properties, "required": schema["required"] + ["confidence"]}
+
+
+PACKED_SCHEMA = packed_schema()
+# Cheap-tier requests also report confidence, which decides whether the file is escalated
+CONFIDENT_ANALYSIS_SCHEMA = with_confidence(ANALYSIS_SCHEMA)
+CONFIDENT_PACKED_SCHEMA = packed_schema(with_confidence(PACKED_ITEM_SCHEMA))
+
+
+class AnalysisResult(BaseModel):
+    """Validated result of a single analyzer call"""
+    score: int = Field(ge=0, le=100)
+    concerns: List[str] = Field(default_factory=list)
+    confidence: Optional[int] = Field(default=None, ge=0, le=100)  # Only requested from the cheap tier
+
+    @field_validator("concerns", mode="before")
+    @classmethod
+    def _most_important_concerns(cls, concerns):
+        # The response schema only asks for at most MAX_CONCERNS, so longer lists are cut here
+        return concerns[:MAX_CONCERNS] if isinstance(concerns, list) else concerns
+
+
+class SchemaViolation(Exception):
+    """The model returned something that is not a valid AnalysisResult"""
+    pass
+
+
+def response_format(name="code_analysis", schema=ANALYSIS_SCHEMA):
+    """Build the response_format argument for a strict JSON schema response"""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "strict": True, "schema": schema},
+    }
+
+
+class IncrementalJSONObject:
+    """Incremental parser that detects when the top-level JSON object is complete.
+
+    Text is fed chunk by chunk as it streams in. feed() returns True as soon as the
+    closing brace of the first top-level object arrives, so the caller can stop
+    reading the stream instead of waiting for trailing tokens.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.depth = 0
+        self.started = False
+        self.complete = False
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text):
+        if self.complete:
+            return True
+        if not self.started:
+            # Skip anything before the opening brace
+            start = text.find("{")
+            if start < 0:
+                return False
+            self.started = True
+            text = text[start:]
+        return self._scan(text)
+
+    def _scan(self, text):
+        for index, char in enumerate(text):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == "{" or char == "[":
+                self.depth += 1
+            elif char == "}" or char == "]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.parts.append(text[:index + 1])
+                    self.complete = True
+                    return True
+        self.parts.append(text)
+        return False
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+
+def parse_analysis(text):
+    """Validate a JSON object string into an AnalysisResult"""
+    try:
+        return AnalysisResult.model_validate(json.loads(text))
+    except (ValueError, ValidationError) as e:
+        raise SchemaViolation(f"Invalid analysis response: {e}") from e
+
+
+class PackedFileResult(AnalysisResult):
+    file: str
+
+
+class PackedAnalysis(BaseModel):
+    files: List[PackedFileResult]
+
+
+def parse_packed(text):
+    """Validate a packed response into {file label: AnalysisResult}. Entries that fail validation are dropped."""
+    try:
+        data = json.loads(text)
+        entries = data["files"] if isinstance(data, dict) else None
+        if not isinstance(entries, list):
+            raise ValueError("missing files array")
+    except (ValueError, KeyError) as e:
+        raise SchemaViolation(f"Invalid packed analysis response: {e}") from e
+    results = {}
+    for entry in entries:
+        try:
+            parsed = PackedFileResult.model_validate(entry)
+        except ValidationError:
+            continue
+        results[parsed.file] = AnalysisResult(score=parsed.score, concerns=parsed.concerns,
+                                              confidence=parsed.confidence)
+    return results
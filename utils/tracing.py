@@ -0,0 +1,249 @@
+"""
+Lightweight per-request tracing for the analysis pipeline.
+
+Each sampled request gets a trace of nested spans (GitHub listing, tree walk,
+file fetches, analyzer calls, retries, sleeps, aggregation). Finished traces
+are kept in memory for the /debug/traces waterfall and can be appended to an
+OTLP/JSON lines file. Unsampled requests only pay for a ContextVar lookup per
+instrumented call.
+"""
+import contextvars
+import functools
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from utils import deadlines
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))  # Fraction of requests traced
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH")  # OTLP/JSON lines file, disabled when unset
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))  # Finished traces kept for /debug/traces
+TRACE_MAX_SPANS = 5000  # Spans kept per trace; later spans are dropped and counted
+
+_current_span = contextvars.ContextVar("gitgud_current_span", default=None)
+_recent_traces = deque(maxlen=TRACE_BUFFER_SIZE)
+_recent_lock = threading.Lock()
+_export_lock = threading.Lock()
+
+
+class Trace:
+    __slots__ = ("trace_id", "name", "wall_start", "spans", "dropped", "lock", "root")
+
+    def __init__(self, name):
+        self.trace_id = os.urandom(16).hex()
+        self.name = name
+        self.wall_start = time.time()
+        self.spans = []
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.root = None
+
+    def add(self, span):
+        with self.lock:
+            if len(self.spans) < TRACE_MAX_SPANS:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    @property
+    def duration(self):
+        return self.root.duration if self.root else 0.0
+
+    @property
+    def started(self):
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.wall_start))
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start", "end", "attributes", "status")
+
+    def __init__(self, trace, name, parent_id=None, attributes=None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.perf_counter()
+        self.end = None
+        self.attributes = attributes or {}
+        self.status = "ok"
+
+    @property
+    def duration(self):
+        return (self.end or time.perf_counter()) - self.start
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, error):
+        self.status = "error"
+        self.attributes["error"] = str(error)[:500]
+
+
+def current_span():
+    return _current_span.get()
+
+
+def start_trace(name, force=False, **attributes):
+    """Start a trace for a request. Returns a handle for finish_trace, or None when not sampled."""
+    if not force and random.random() >= TRACE_SAMPLE_RATE:
+        return None
+    trace = Trace(name)
+    root = Span(trace, name, attributes=attributes)
+    trace.root = root
+    return root, _current_span.set(root)
+
+
+def finish_trace(handle, **attributes):
+    if handle is None:
+        return None
+    root, token = handle
+    root.end = time.perf_counter()
+    root.set(**attributes)
+    _current_span.reset(token)
+    trace = root.trace
+    trace.add(root)
+    with _recent_lock:
+        _recent_traces.append(trace)
+    if TRACE_EXPORT_PATH:
+        export(trace, TRACE_EXPORT_PATH)
+    return trace
+
+
+@contextmanager
+def span(name, **attributes):
+    """Record a nested span when the current request is being traced"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.fail(e)
+        raise
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+        parent.trace.add(child)
+
+
+def traced(name):
+    """Decorator wrapping every call of a function in a span"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def sleep(seconds, reason):
+    """time.sleep that shows up in the waterfall, cut short by the request's deadline"""
+    seconds = deadlines.cap(seconds)
+    if seconds <= 0:
+        return
+    with span("sleep", reason=reason, seconds=seconds):
+        time.sleep(seconds)
+
+
+def retry_sleep(seconds):
+    """Sleep hook for tenacity so retry waits are traced"""
+    sleep(seconds, "retry_wait")
+
+
+def recent_traces(limit=50, min_duration=0.0):
+    """Recent finished traces, slowest first"""
+    with _recent_lock:
+        traces = [trace for trace in _recent_traces if trace.duration >= min_duration]
+    traces.sort(key=lambda trace: trace.duration, reverse=True)
+    return traces[:limit]
+
+
+def find_trace(trace_id):
+    with _recent_lock:
+        return next((trace for trace in _recent_traces if trace.trace_id == trace_id), None)
+
+
+def waterfall(trace):
+    """Flatten a trace into rows for rendering: depth, offsets and bar positions"""
+    with trace.lock:
+        spans = list(trace.spans)
+    root = trace.root
+    total = max(root.duration, 1e-9)
+    children = {}
+    for item in spans:
+        children.setdefault(item.parent_id, []).append(item)
+
+    rows = []
+    stack = [(root, 0)]
+    while stack:
+        item, depth = stack.pop()
+        offset = item.start - root.start
+        rows.append({
+            "name": item.name,
+            "depth": depth,
+            "offset_ms": round(offset * 1000, 1),
+            "duration_ms": round(item.duration * 1000, 1),
+            "left_pct": round(100 * offset / total, 2),
+            "width_pct": max(round(100 * item.duration / total, 2), 0.2),
+            "status": item.status,
+            "attributes": item.attributes,
+        })
+        for child in sorted(children.get(item.span_id, []), key=lambda child: child.start, reverse=True):
+            stack.append((child, depth + 1))
+    return rows
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(trace):
+    """Convert a trace to the OTLP/JSON ExportTraceServiceRequest shape"""
+    # Spans use perf_counter; anchor them to the wall clock at the root's start
+    anchor = trace.wall_start - trace.root.start
+    with trace.lock:
+        spans = list(trace.spans)
+    otlp_spans = []
+    for item in spans:
+        otlp_span = {
+            "traceId": trace.trace_id,
+            "spanId": item.span_id,
+            "name": item.name,
+            "kind": 1,
+            "startTimeUnixNano": str(int((anchor + item.start) * 1e9)),
+            "endTimeUnixNano": str(int((anchor + (item.end or item.start)) * 1e9)),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in item.attributes.items()],
+            "status": {"code": 2 if item.status == "error" else 1},
+        }
+        if item.parent_id:
+            otlp_span["parentSpanId"] = item.parent_id
+        otlp_spans.append(otlp_span)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "gitgud"}}]},
+        "scopeSpans": [{"scope": {"name": "gitgud.tracing"}, "spans": otlp_spans}],
+    }]}
+
+
+def export(trace, path):
+    line = json.dumps(to_otlp(trace))
+    try:
+        with _export_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        print(f"Error exporting trace {trace.trace_id}: {e}")